@@ -0,0 +1,119 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import text, select
+from sqlalchemy.orm import joinedload
+from database import SessionLocal
+from models import Assignment, Submission
+from utils import calculate_letter_grade, percentage
+import gradebook
+
+def seed(db, submissions: int, assignments: int):
+    # Rows are generated server-side so seeding 1M submissions takes seconds, not minutes.
+    tag = uuid.uuid4().hex[:8]
+    students = -(-submissions // assignments)
+    instructor_id = db.scalar(text(
+        "INSERT INTO users (full_name, email, role, is_active) "
+        "VALUES ('Bench Instructor', :email, 'INSTRUCTOR', true) RETURNING id"
+    ), {"email": f"bench-{tag}@bench.local"})
+    course_id = db.scalar(text(
+        "INSERT INTO courses (title, price, instructor_id) VALUES ('Gradebook bench', 0, :instructor) RETURNING id"
+    ), {"instructor": instructor_id})
+    db.execute(text(
+        "INSERT INTO users (full_name, email, role, is_active) "
+        "SELECT 'Bench Student ' || i, 'bench-' || :tag || '-' || i || '@bench.local', 'STUDENT', true "
+        "FROM generate_series(1, :students) AS i"
+    ), {"tag": tag, "students": students})
+    db.execute(text(
+        "INSERT INTO assignments (course_id, title, max_score) "
+        "SELECT :course, 'Bench ' || i, (ARRAY[10, 20, 50, 100])[1 + i % 4] FROM generate_series(1, :assignments) AS i"
+    ), {"course": course_id, "assignments": assignments})
+    db.execute(text(
+        "INSERT INTO submissions (assignment_id, student_id, score) "
+        "SELECT a.id, u.id, floor(random() * (a.max_score + 1))::int "
+        "FROM assignments a CROSS JOIN LATERAL ("
+        "  SELECT id FROM users WHERE email LIKE 'bench-' || :tag || '-%' ORDER BY id LIMIT :students"
+        ") u WHERE a.course_id = :course LIMIT :submissions"
+    ), {"tag": tag, "course": course_id, "students": students, "submissions": submissions})
+    db.commit()
+    for table in ("users", "assignments", "submissions"):
+        db.execute(text(f"ANALYZE {table}"))
+    db.commit()
+    return course_id, tag
+
+def cleanup(db, course_id: int, tag: str):
+    db.execute(text("DELETE FROM submissions WHERE assignment_id IN (SELECT id FROM assignments WHERE course_id = :course)"), {"course": course_id})
+    db.execute(text("DELETE FROM assignments WHERE course_id = :course"), {"course": course_id})
+    db.execute(text("DELETE FROM courses WHERE id = :course"), {"course": course_id})
+    db.execute(text("DELETE FROM users WHERE email LIKE 'bench-' || :tag || '%'"), {"tag": tag})
+    db.commit()
+
+def orm_gradebook(db, course_id: int):
+    # The approach the gradebook replaces: iterate ORM objects and compute in Python.
+    by_assignment = {}
+    submissions = db.scalars(
+        select(Submission).join(Submission.assignment)
+        .options(joinedload(Submission.assignment))
+        .where(Assignment.course_id == course_id, Submission.score.isnot(None))
+    )
+    for submission in submissions:
+        by_assignment.setdefault(submission.assignment_id, []).append(
+            (submission.id, percentage(submission.score, submission.assignment.max_score))
+        )
+
+    def describe(rows):
+        scores = sorted(p for _, p in rows)
+        q1, _, q3 = statistics.quantiles(scores, n=4, method="inclusive")
+        spread = 1.5 * (q3 - q1)
+        letters = {}
+        for score in scores:
+            letter = calculate_letter_grade(score)
+            letters[letter] = letters.get(letter, 0) + 1
+        return {
+            "count": len(scores),
+            "mean": statistics.fmean(scores),
+            "std": statistics.pstdev(scores),
+            "percentiles": statistics.quantiles(scores, n=10, method="inclusive"),
+            "letter_grades": letters,
+            "outliers": [i for i, p in rows if p < q1 - spread or p > q3 + spread],
+        }
+
+    everything = [row for rows in by_assignment.values() for row in rows]
+    return {"overall": describe(everything), "assignments": [describe(rows) for rows in by_assignment.values()]}
+
+def timed(label: str, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {elapsed:8.2f}s")
+    return result, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the NumPy gradebook with row-by-row ORM iteration.")
+    parser.add_argument("--submissions", type=int, default=1_000_000)
+    parser.add_argument("--assignments", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    course_id, tag = seed(db, args.submissions, args.assignments)
+    try:
+        print(f"{args.submissions} submissions across {args.assignments} assignments")
+        orm, orm_seconds = timed("orm", orm_gradebook, db, course_id)
+        db.expunge_all()
+        vectorized, numpy_seconds = timed("numpy", gradebook.get_course_gradebook, db, course_id)
+        assert orm["overall"]["count"] == vectorized["overall"]["count"]
+        assert orm["overall"]["letter_grades"] == {k: v for k, v in vectorized["overall"]["letter_grades"].items() if v}
+        print(f"speedup      {orm_seconds / numpy_seconds:8.1f}x")
+    finally:
+        db.rollback()
+        cleanup(db, course_id, tag)
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from dataclasses import replace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import select
+from database import Database, get_settings
+from models import User, Course
+from repositories.user_repository import UserRepository, AsyncUserRepository
+from repositories.course_repository import CourseRepository, AsyncCourseRepository
+
+# Read-only: runs against whatever is in DATABASE_URL, e.g. after benchmarks/generate_data.py.
+# The read-through cache is off, so every call reaches the database.
+
+def repositories(user_class, course_class):
+    users, courses = user_class(), course_class()
+    users.cache_namespace = courses.cache_namespace = None
+    return users, courses
+
+def rebuilt_lookups(users, courses):
+    # How the lookups were issued before: a new statement per call, built and cache-keyed every time.
+    return {
+        "user get_by_id": lambda r, ids: (users.select().where(User.id == r(ids["users"])), None),
+        "course get_by_id": lambda r, ids: (courses.select().where(Course.id == r(ids["courses"])), None),
+        "get_by_email": lambda r, ids: (users.select().where(User.email == r(ids["emails"])), None),
+        "get_expensive_courses": lambda r, ids: (courses.select().where(Course.price >= 4990), None),
+    }
+
+def cached_lookups(users, courses):
+    return {
+        "user get_by_id": lambda r, ids: (users.by_id_statement(), {"id": r(ids["users"])}),
+        "course get_by_id": lambda r, ids: (courses.by_id_statement(), {"id": r(ids["courses"])}),
+        "get_by_email": lambda r, ids: (users.by_email_statement(), {"email": r(ids["emails"])}),
+        "get_expensive_courses": lambda r, ids: (courses.expensive_courses_statement(), {"min_price": 4990}),
+    }
+
+def load_ids(db, sample: int) -> dict:
+    return {
+        "users": db.scalars(select(User.id).order_by(User.id).limit(sample)).all(),
+        "courses": db.scalars(select(Course.id).order_by(Course.id).limit(sample)).all(),
+        "emails": db.scalars(select(User.email).order_by(User.id).limit(sample)).all(),
+    }
+
+def picker():
+    counter = iter(range(10**12))
+    return lambda values: values[next(counter) % len(values)]
+
+def run_sync(database, lookup, ids, calls: int) -> float:
+    pick = picker()
+    with database.sessions() as db:
+        for _ in range(min(calls, 200)):
+            db.scalars(*lookup(pick, ids)).all()
+        started = time.perf_counter()
+        for _ in range(calls):
+            db.scalars(*lookup(pick, ids)).all()
+            db.expunge_all()
+        return (time.perf_counter() - started) / calls
+
+async def run_async(database, lookup, ids, calls: int) -> float:
+    pick = picker()
+    async with database.async_sessions() as db:
+        for _ in range(min(calls, 200)):
+            (await db.scalars(*lookup(pick, ids))).all()
+        started = time.perf_counter()
+        for _ in range(calls):
+            (await db.scalars(*lookup(pick, ids))).all()
+            db.expunge_all()
+        return (time.perf_counter() - started) / calls
+
+def report(title: str, variants: dict[str, dict[str, float]]):
+    names = list(variants)
+    print(title)
+    print(f"  {'method':<24}" + "".join(f"{name:>20}" for name in names) + f"{'speedup':>10}")
+    for method in variants[names[0]]:
+        times = [variants[name][method] for name in names]
+        print(f"  {method:<24}" + "".join(f"{t * 1e6:18.0f}us" for t in times) + f"{times[0] / times[-1]:9.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-method latency of repository lookups: statements rebuilt "
+                                                 "per call vs cached, and asyncpg with vs without prepared statements.")
+    parser.add_argument("--calls", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sample", type=int, default=1000, help="distinct ids and emails to cycle through")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    database = Database(settings)
+    with database.sessions() as db:
+        ids = load_ids(db, args.sample)
+
+    sync_repos = repositories(UserRepository, CourseRepository)
+    sync_results = {"rebuilt": {}, "cached": {}}
+    for name, lookups in (("rebuilt", rebuilt_lookups(*sync_repos)), ("cached", cached_lookups(*sync_repos))):
+        for method, lookup in lookups.items():
+            sync_results[name][method] = statistics.median(run_sync(database, lookup, ids, args.calls)
+                                                           for _ in range(args.repeat))
+    report(f"psycopg2, median of {args.repeat} x {args.calls} calls", sync_results)
+
+    async def run_async_variants():
+        async_repos = repositories(AsyncUserRepository, AsyncCourseRepository)
+        variants = (
+            ("rebuilt", rebuilt_lookups(*async_repos), 100),
+            ("cached, unprepared", cached_lookups(*async_repos), 0),
+            ("cached, prepared", cached_lookups(*async_repos), 100),
+        )
+        results = {}
+        for name, lookups, prepared in variants:
+            variant_db = Database(replace(settings, prepared_statement_cache_size=prepared))
+            try:
+                results[name] = {
+                    method: statistics.median([await run_async(variant_db, lookup, ids, args.calls)
+                                               for _ in range(args.repeat)])
+                    for method, lookup in lookups.items()
+                }
+            finally:
+                await variant_db.dispose()
+        return results
+
+    report(f"asyncpg, median of {args.repeat} x {args.calls} calls", asyncio.run(run_async_variants()))
+    database.engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from typing import List
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select, text
+from database import SessionLocal
+from models import Course
+from responses import FastJSONResponse, records, orjson
+import schemas
+
+FIELDS = tuple(schemas.CourseResponse.model_fields)
+
+def seed(db, courses: int):
+    tag = uuid.uuid4().hex[:8]
+    instructor_id = db.scalar(text(
+        "INSERT INTO users (full_name, email, role, is_active) "
+        "VALUES ('Bench Instructor', :email, 'INSTRUCTOR', true) RETURNING id"
+    ), {"email": f"bench-{tag}@bench.local"})
+    db.execute(text(
+        "INSERT INTO courses (title, description, price, instructor_id) "
+        "SELECT 'Serialization bench ' || i, 'A synthetic course used to time response encoding, number ' || i, "
+        "i % 5000, :instructor FROM generate_series(1, :courses) AS i"
+    ), {"instructor": instructor_id, "courses": courses})
+    db.commit()
+    db.execute(text("ANALYZE courses"))
+    db.commit()
+    return instructor_id
+
+def cleanup(db, instructor_id: int):
+    db.execute(text("DELETE FROM courses WHERE instructor_id = :instructor"), {"instructor": instructor_id})
+    db.execute(text("DELETE FROM users WHERE id = :instructor"), {"instructor": instructor_id})
+    db.commit()
+
+def model_path(db, instructor_id: int):
+    # What a response_model route does: hydrate ORM objects, validate each, encode with the default encoder.
+    adapter = TypeAdapter(List[schemas.CourseResponse])
+    started = time.perf_counter()
+    courses = db.scalars(select(Course).where(Course.instructor_id == instructor_id).order_by(Course.id)).all()
+    queried = time.perf_counter()
+    body = JSONResponse(adapter.dump_python(adapter.validate_python(courses, from_attributes=True), mode="json")).body
+    return queried - started, time.perf_counter() - queried, body
+
+def fast_path(db, instructor_id: int):
+    columns = [getattr(Course, name) for name in FIELDS]
+    started = time.perf_counter()
+    rows = db.execute(select(*columns).where(Course.instructor_id == instructor_id).order_by(Course.id)).all()
+    queried = time.perf_counter()
+    body = FastJSONResponse(records(rows, FIELDS)).body
+    return queried - started, time.perf_counter() - queried, body
+
+def measure(label: str, fn, db, instructor_id: int, repeat: int):
+    query_times, encode_times = [], []
+    for _ in range(repeat):
+        db.expunge_all()
+        query_seconds, encode_seconds, body = fn(db, instructor_id)
+        query_times.append(query_seconds)
+        encode_times.append(encode_seconds)
+    query, encode = statistics.median(query_times), statistics.median(encode_times)
+    print(f"{label:<8} query {query * 1000:8.1f}ms  serialize {encode * 1000:8.1f}ms  total {(query + encode) * 1000:8.1f}ms")
+    return query + encode, body
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare response_model serialization with the row + orjson fast path.")
+    parser.add_argument("--courses", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    instructor_id = seed(db, args.courses)
+    try:
+        print(f"{args.courses} courses, median of {args.repeat} runs, encoder: {'orjson' if orjson else 'json'}")
+        model_seconds, model_body = measure("model", model_path, db, instructor_id, args.repeat)
+        fast_seconds, fast_body = measure("fast", fast_path, db, instructor_id, args.repeat)
+        assert len(model_body) == len(fast_body)
+        print(f"speedup  {model_seconds / fast_seconds:8.1f}x")
+    finally:
+        db.rollback()
+        cleanup(db, instructor_id)
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Runs in a fresh interpreter per sample, so module imports and compiled-SQL caches start cold.
+PROBE = """
+import json, time
+started = time.perf_counter()
+import main_api
+imported = time.perf_counter()
+app = main_api.create_app()
+created = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    ready = time.perf_counter()
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        client.get(PATH).raise_for_status()
+        timings.append(time.perf_counter() - start)
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "lifespan_ms": (ready - created) * 1000,
+    "first_request_ms": timings[0] * 1000,
+    "second_request_ms": timings[1] * 1000,
+    "third_request_ms": timings[2] * 1000,
+}))
+"""
+
+def probe(path: str, prewarm: int) -> dict:
+    env = dict(os.environ, DB_PREWARM_CONNECTIONS=str(prewarm))
+    output = subprocess.run(
+        [sys.executable, "-c", f"PATH = {path!r}\n{PROBE}"],
+        cwd=SRC, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Time API import, startup and first requests, with and without pool prewarming.")
+    parser.add_argument("--path", default="/courses/?min_price=0&max_price=100&limit=20")
+    parser.add_argument("--prewarm", type=int, default=5, help="DB_PREWARM_CONNECTIONS for the prewarmed runs")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for prewarm in (0, args.prewarm):
+        samples = [probe(args.path, prewarm) for _ in range(args.repeat)]
+        print(f"DB_PREWARM_CONNECTIONS={prewarm} (median of {args.repeat})")
+        for key in samples[0]:
+            print(f"  {key:<18} {statistics.median(s[key] for s in samples):8.1f}")
+
+if __name__ == "__main__":
+    main()
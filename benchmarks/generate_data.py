@@ -0,0 +1,216 @@
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from database import engine, SessionLocal
+from models import Base
+import analytics
+import partitions
+
+# Loaded in dependency order; truncation runs in reverse through CASCADE.
+TABLES = ("users", "courses", "modules", "assignments", "enrollments", "submissions")
+
+class CsvStream(io.TextIOBase):
+    # File-like view over a row generator, so COPY reads rows as they are produced
+    # instead of the whole table being rendered into memory first.
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = ""
+        self.out = io.StringIO()
+        self.writer = csv.writer(self.out)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = []
+            for row in self.rows:
+                chunk.append(row)
+                if len(chunk) >= 1000:
+                    break
+            if not chunk:
+                break
+            self.writer.writerows(chunk)
+            self.buffer += self.out.getvalue()
+            self.out.seek(0)
+            self.out.truncate()
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+def copy_rows(connection, table: str, columns: tuple[str, ...], rows) -> float:
+    started = time.perf_counter()
+    cursor = connection.cursor()
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", CsvStream(rows))
+    cursor.close()
+    return time.perf_counter() - started
+
+def next_ids(connection) -> dict:
+    cursor = connection.cursor()
+    ids = {}
+    for table in TABLES:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+        ids[table] = cursor.fetchone()[0]
+    cursor.close()
+    return ids
+
+def generate(args):
+    rng = random.Random(args.seed)
+    raw = engine.raw_connection()
+    connection = raw.dbapi_connection
+    try:
+        if args.truncate:
+            cursor = connection.cursor()
+            cursor.execute(f"TRUNCATE submission_contents, {', '.join(reversed(TABLES))} RESTART IDENTITY CASCADE")
+            cursor.close()
+
+        start = next_ids(connection)
+        instructors = max(1, int(args.users * args.instructor_ratio))
+        user_ids = range(start["users"], start["users"] + args.users)
+        instructor_ids = user_ids[:instructors]
+        student_ids = user_ids[instructors:]
+        course_ids = range(start["courses"], start["courses"] + args.courses)
+
+        def users():
+            for n, user_id in enumerate(user_ids):
+                role = "INSTRUCTOR" if n < instructors else "STUDENT"
+                yield (user_id, f"{role.title()} {user_id}", f"user{user_id}@{args.email_domain}", role, "true")
+
+        def courses():
+            for course_id in course_ids:
+                yield (course_id, f"Course {course_id}", f"Synthetic course {course_id}",
+                       rng.randrange(0, 5000, 10), rng.choice(instructor_ids))
+
+        def modules():
+            module_id = start["modules"]
+            for course_id in course_ids:
+                for index in range(1, args.modules_per_course + 1):
+                    yield (module_id, course_id, f"Module {index}", f"Content of module {index} in course {course_id}", index)
+                    module_id += 1
+
+        # Assignments are laid out contiguously per course so submissions can pick one arithmetically.
+        max_scores = [rng.choice((10, 20, 50, 100)) for _ in range(args.courses * args.assignments_per_course)]
+
+        # Due dates spread around the load time, so dashboards see both past and upcoming work.
+        loaded_at = datetime.now(timezone.utc)
+
+        def assignments():
+            for n, max_score in enumerate(max_scores):
+                course_id = course_ids[n // args.assignments_per_course]
+                due_date = loaded_at + timedelta(days=rng.uniform(-args.due_days, args.due_days))
+                yield (start["assignments"] + n, course_id, f"Assignment {n % args.assignments_per_course + 1}", max_score,
+                       due_date.isoformat())
+
+        enrollment_pairs = []
+
+        def enrollments():
+            enrollment_id = start["enrollments"]
+            per_student = min(args.enrollments_per_student, args.courses)
+            for student_id in student_ids:
+                for course_id in rng.sample(course_ids, per_student):
+                    enrollment_pairs.append((student_id, course_id))
+                    status = rng.choices(("ACTIVE", "COMPLETED", "DROPPED"), (80, 15, 5))[0]
+                    yield (enrollment_id, student_id, course_id, status)
+                    enrollment_id += 1
+
+        def submissions():
+            for n in range(args.submissions):
+                student_id, course_id = enrollment_pairs[rng.randrange(len(enrollment_pairs))]
+                slot = (course_id - course_ids[0]) * args.assignments_per_course + rng.randrange(args.assignments_per_course)
+                graded = rng.random() >= args.ungraded_ratio
+                score = rng.randint(0, max_scores[slot]) if graded else ""
+                submitted_at = loaded_at - timedelta(days=rng.uniform(0, args.history_days))
+                yield (start["submissions"] + n, start["assignments"] + slot, student_id, score, submitted_at.isoformat())
+
+        plan = [
+            ("users", ("id", "full_name", "email", "role", "is_active"), users),
+            ("courses", ("id", "title", "description", "price", "instructor_id"), courses),
+            ("modules", ("id", "course_id", "title", "content", "order_index"), modules),
+            ("assignments", ("id", "course_id", "title", "max_score", "due_date"), assignments),
+            ("enrollments", ("id", "user_id", "course_id", "status"), enrollments),
+            ("submissions", ("id", "assignment_id", "student_id", "score", "submitted_at"), submissions),
+        ]
+        for table, columns, rows in plan:
+            if table == "submissions" and not enrollment_pairs:
+                print("No enrollments, skipping submissions.")
+                continue
+            seconds = copy_rows(connection, table, columns, rows())
+            print(f"{table:<12} loaded in {seconds:7.2f}s")
+
+        if enrollment_pairs and args.submissions:
+            started = time.perf_counter()
+            cursor = connection.cursor()
+            cursor.execute(
+                "INSERT INTO submission_contents (submission_id, submitted_at, content) "
+                "SELECT id, submitted_at, 'synthetic answer' FROM submissions WHERE id >= %s",
+                (start["submissions"],),
+            )
+            cursor.close()
+            print(f"{'contents':<12} loaded in {time.perf_counter() - started:7.2f}s")
+
+        cursor = connection.cursor()
+        for table in TABLES:
+            # Explicit ids were loaded, so move each sequence past them.
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}")
+        cursor.close()
+        connection.commit()
+
+        connection.autocommit = True
+        cursor = connection.cursor()
+        for table in (*TABLES, "submission_contents"):
+            cursor.execute(f"ANALYZE {table}")
+        cursor.close()
+        connection.autocommit = False
+    finally:
+        raw.close()
+
+    db = SessionLocal()
+    try:
+        analytics.refresh_all(db)
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the LMS schema with synthetic data using COPY.")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--instructor-ratio", type=float, default=0.01)
+    parser.add_argument("--courses", type=int, default=2_000)
+    parser.add_argument("--modules-per-course", type=int, default=8)
+    parser.add_argument("--assignments-per-course", type=int, default=10)
+    parser.add_argument("--enrollments-per-student", type=int, default=5)
+    parser.add_argument("--submissions", type=int, default=10_000_000)
+    parser.add_argument("--ungraded-ratio", type=float, default=0.1)
+    parser.add_argument("--due-days", type=float, default=60, help="assignments are due within +/- this many days")
+    parser.add_argument("--history-days", type=float, default=365, help="submissions spread over this many past days")
+    parser.add_argument("--email-domain", default="synthetic.lms")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="empty the LMS tables first")
+    parser.add_argument("--create-schema", action="store_true", help="create missing tables before loading")
+    args = parser.parse_args(argv)
+    if args.submissions and args.assignments_per_course < 1:
+        parser.error("--assignments-per-course must be at least 1 to generate submissions")
+
+    if args.create_schema:
+        Base.metadata.create_all(bind=engine)
+    # Monthly partitions for the whole history up front; rows would otherwise pile into the default partition.
+    db = SessionLocal()
+    try:
+        partitions.ensure_partitions(db, since=(datetime.now(timezone.utc) - timedelta(days=args.history_days)).date())
+    finally:
+        db.close()
+    started = time.perf_counter()
+    generate(args)
+    print(f"Done in {time.perf_counter() - started:.1f}s.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
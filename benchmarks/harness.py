@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import httpx
+from sqlalchemy import text
+from database import SessionLocal
+import services
+import analytics
+import gradebook
+import dashboard
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SCALE_TABLES = ("users", "courses", "modules", "assignments", "enrollments", "submissions")
+SAMPLE_SIZE = 200
+
+def sample_ids(db) -> dict:
+    def ids(sql):
+        return list(db.scalars(text(sql), {"n": SAMPLE_SIZE})) or [0]
+
+    students = ids("SELECT id FROM users WHERE role = 'STUDENT' ORDER BY random() LIMIT :n")
+    assignment_id = db.scalar(text(
+        "SELECT assignment_id FROM submissions GROUP BY assignment_id ORDER BY count(*) DESC LIMIT 1"
+    )) or 0
+    return {
+        "students": students,
+        "emails": list(db.scalars(text("SELECT email FROM users ORDER BY random() LIMIT :n"), {"n": SAMPLE_SIZE})),
+        "courses": ids("SELECT id FROM courses ORDER BY random() LIMIT :n"),
+        "assignments": ids("SELECT id FROM assignments ORDER BY random() LIMIT :n"),
+        "graded_assignment": assignment_id,
+        "grades": [
+            {"submission_id": submission_id, "score": score}
+            for submission_id, score in db.execute(text(
+                "SELECT s.id, COALESCE(s.score, 0) FROM submissions s WHERE s.assignment_id = :a LIMIT 20"
+            ), {"a": assignment_id})
+        ],
+    }
+
+def table_scale(db) -> dict:
+    rows = db.execute(text(
+        "SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(:tables) AND relkind IN ('r', 'p')"
+    ), {"tables": list(SCALE_TABLES)})
+    return dict(rows.all())
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Each HTTP scenario takes (client, rng, ids, state) and returns the response.
+HTTP_SCENARIOS = {
+    "GET /": lambda c, r, ids, s: c.get("/"),
+    "GET /courses/": lambda c, r, ids, s: c.get("/courses/"),
+    "GET /courses/ next page": lambda c, r, ids, s: c.get("/courses/", params={"cursor": s["cursor"]} if s.get("cursor") else None),
+    "GET /courses/ If-None-Match": lambda c, r, ids, s: c.get("/courses/", headers={"If-None-Match": s.get("etag", "")}),
+    "GET /courses/{id}": lambda c, r, ids, s: c.get(f"/courses/{r.choice(ids['courses'])}"),
+    "GET /users/{id}": lambda c, r, ids, s: c.get(f"/users/{r.choice(ids['students'])}"),
+    "GET /users/{id}/dashboard": lambda c, r, ids, s: c.get(f"/users/{r.choice(ids['students'])}/dashboard"),
+    "GET /analytics/student-performance": lambda c, r, ids, s: c.get("/analytics/student-performance"),
+    "GET /analytics/instructor-revenue": lambda c, r, ids, s: c.get("/analytics/instructor-revenue"),
+    "GET /analytics/courses/{id}/gradebook": lambda c, r, ids, s: c.get(f"/analytics/courses/{r.choice(ids['courses'])}/gradebook"),
+    "GET /analytics/assignments/{id}/gradebook": lambda c, r, ids, s: c.get(f"/analytics/assignments/{r.choice(ids['assignments'])}/gradebook"),
+    "GET /exports/enrollments": lambda c, r, ids, s: c.get("/exports/enrollments", params={"course_id": r.choice(ids["courses"])}),
+    "GET /jobs/{id}": lambda c, r, ids, s: c.get(f"/jobs/{s.get('job_id', 0)}"),
+    "GET /health": lambda c, r, ids, s: c.get("/health"),
+    "GET /metrics": lambda c, r, ids, s: c.get("/metrics"),
+}
+
+WRITE_SCENARIOS = {
+    "POST /users/": lambda c, r, ids, s: c.post("/users/", json={
+        "email": f"bench-{uuid.uuid4().hex}@bench.local", "full_name": "Bench User", "role": "student",
+    }),
+    "POST /users/bulk": lambda c, r, ids, s: c.post("/users/bulk", json=[
+        {"email": f"bench-{uuid.uuid4().hex}@bench.local", "full_name": "Bench Bulk"} for _ in range(10)
+    ]),
+    "POST /courses/": lambda c, r, ids, s: c.post("/courses/", json={"title": "Bench Course", "price": r.randrange(0, 5000)}),
+    "POST /courses/{id}/enrollments/bulk": lambda c, r, ids, s: c.post(
+        f"/courses/{r.choice(ids['courses'])}/enrollments/bulk", json={"student_ids": r.sample(ids["students"], min(10, len(ids["students"])))}
+    ),
+    "POST /assignments/{id}/grades": lambda c, r, ids, s: c.post(
+        f"/assignments/{ids['graded_assignment']}/grades", json={"grades": ids["grades"]}
+    ),
+    "POST /jobs": lambda c, r, ids, s: c.post("/jobs", json={"kind": "course_gradebook", "payload": {"course_id": r.choice(ids["courses"])}}),
+}
+
+# Each service scenario takes (db, rng, ids) and runs one services-level query.
+SERVICE_SCENARIOS = {
+    "services.get_courses_by_price_range": lambda db, r, ids: services.get_courses_by_price_range(db, 1000, 2000),
+    "services.get_course_catalog_page": lambda db, r, ids: services.get_course_catalog_page(db, 0, 100000),
+    "services.get_course": lambda db, r, ids: services.get_course(db, r.choice(ids["courses"])),
+    "services.get_student_average_scores": lambda db, r, ids: services.get_student_average_scores(db),
+    "services.get_instructor_revenue": lambda db, r, ids: services.get_instructor_revenue(db),
+    "user_repo.get_by_id": lambda db, r, ids: services.user_repo.get_by_id(db, r.choice(ids["students"])),
+    "user_repo.get_by_email": lambda db, r, ids: services.user_repo.get_by_email(db, r.choice(ids["emails"] or ["none"])),
+    "course_repo.get_expensive_courses": lambda db, r, ids: services.course_repo.get_expensive_courses(db, 4500),
+    "analytics.get_student_performance": lambda db, r, ids: analytics.get_student_performance(db),
+    "analytics.get_instructor_revenue": lambda db, r, ids: analytics.get_instructor_revenue(db),
+    "gradebook.get_course_gradebook": lambda db, r, ids: gradebook.get_course_gradebook(db, r.choice(ids["courses"])),
+    # The query and assembly behind a dashboard cache miss.
+    "dashboard.build_dashboard": lambda db, r, ids: dashboard.build_dashboard(
+        0, db.execute(dashboard.dashboard_statement(r.choice(ids["students"]))).all()
+    ),
+}
+
+def summarize(latencies: list[float], errors: int, wall_seconds: float, kind: str) -> dict:
+    ms = sorted(seconds * 1000 for seconds in latencies)
+    if len(ms) >= 2:
+        cuts = statistics.quantiles(ms, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ms[0] if ms else None
+    return {
+        "kind": kind,
+        "count": len(ms),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else None,
+        "p50_ms": round(p50, 3) if p50 is not None else None,
+        "p95_ms": round(p95, 3) if p95 is not None else None,
+        "p99_ms": round(p99, 3) if p99 is not None else None,
+        "rps": round(len(ms) / wall_seconds, 2) if wall_seconds else None,
+    }
+
+def run_scenario(call, make_resource, close_resource, requests: int, warmup: int, concurrency: int, seed: int):
+    local = threading.local()
+    resources = []
+    lock = threading.Lock()
+
+    def resource():
+        if not hasattr(local, "resource"):
+            local.resource = make_resource()
+            local.rng = random.Random(seed + threading.get_ident())
+            with lock:
+                resources.append(local.resource)
+        return local.resource, local.rng
+
+    def one(_):
+        target, rng = resource()
+        started = time.perf_counter()
+        try:
+            ok = call(target, rng)
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(warmup)))
+            started = time.perf_counter()
+            outcomes = list(pool.map(one, range(requests)))
+            wall = time.perf_counter() - started
+    finally:
+        for item in resources:
+            close_resource(item)
+
+    latencies = [seconds for seconds, ok in outcomes if ok]
+    return latencies, len(outcomes) - len(latencies), wall
+
+def http_call(scenario, ids, state):
+    def call(client, rng):
+        response = scenario(client, rng, ids, state)
+        return response.status_code < 500
+    return call
+
+def service_call(scenario, ids):
+    def call(db, rng):
+        try:
+            scenario(db, rng, ids)
+            return True
+        finally:
+            db.rollback()
+            db.expunge_all()
+    return call
+
+def prepare_state(base_url: str, ids: dict) -> dict:
+    state = {}
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        first = client.get("/courses/", params={"limit": 20})
+        state["cursor"] = first.headers.get("x-next-cursor")
+        state["etag"] = first.headers.get("etag", "")
+        job = client.post("/jobs", json={"kind": "course_gradebook", "payload": {"course_id": ids["courses"][0]}})
+        if job.status_code == 202:
+            state["job_id"] = job.json()["id"]
+    return state
+
+def run(args) -> dict:
+    db = SessionLocal()
+    try:
+        ids = sample_ids(db)
+        scale = table_scale(db)
+    finally:
+        db.close()
+
+    selected = set(args.only.split(",")) if args.only else None
+    def wanted(name):
+        return selected is None or name in selected
+
+    results = {}
+    if not args.skip_http:
+        state = prepare_state(args.base_url, ids)
+        scenarios = dict(HTTP_SCENARIOS)
+        if not args.skip_writes:
+            scenarios.update(WRITE_SCENARIOS)
+        for name, scenario in scenarios.items():
+            if not wanted(name):
+                continue
+            latencies, errors, wall = run_scenario(
+                http_call(scenario, ids, state),
+                lambda: httpx.Client(base_url=args.base_url, timeout=60),
+                lambda client: client.close(),
+                args.requests, args.warmup, args.concurrency, args.seed,
+            )
+            results[name] = summarize(latencies, errors, wall, "http")
+            print(format_row(name, results[name]))
+
+    if not args.skip_services:
+        for name, scenario in SERVICE_SCENARIOS.items():
+            if not wanted(name):
+                continue
+            latencies, errors, wall = run_scenario(
+                service_call(scenario, ids), SessionLocal, lambda session: session.close(),
+                args.requests, args.warmup, args.concurrency, args.seed,
+            )
+            results[name] = summarize(latencies, errors, wall, "service")
+            print(format_row(name, results[name]))
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "base_url": None if args.skip_http else args.base_url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "cache_backend": os.getenv("CACHE_BACKEND", "memory"),
+            "scale": scale,
+        },
+        "results": results,
+    }
+
+def format_row(name: str, row: dict) -> str:
+    def ms(value):
+        return f"{value:9.2f}" if value is not None else f"{'-':>9}"
+    return f"{name:<45} p50 {ms(row['p50_ms'])}  p95 {ms(row['p95_ms'])}  p99 {ms(row['p99_ms'])}  rps {row['rps'] or 0:9.1f}  errors {row['errors']}"
+
+def compare(base: dict, head: dict, threshold: float) -> int:
+    regressions = 0
+    print(f"{'scenario':<45} {'base p95':>10} {'head p95':>10} {'change':>8}")
+    for name in sorted(set(base["results"]) | set(head["results"])):
+        old, new = base["results"].get(name), head["results"].get(name)
+        if not old or not new or not old["p95_ms"] or new["p95_ms"] is None:
+            print(f"{name:<45} {'-':>10} {'-':>10} {'n/a':>8}")
+            continue
+        change = new["p95_ms"] / old["p95_ms"] - 1
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:<45} {old['p95_ms']:10.2f} {new['p95_ms']:10.2f} {change:+8.1%}{flag}")
+    print(f"{regressions} regression(s) above {threshold:.0%} ({base['meta'].get('commit')} -> {head['meta'].get('commit')}).")
+    return 1 if regressions else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency / throughput benchmarks for the API and services.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and save a results file")
+    run_parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://localhost:8000"))
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--requests", type=int, default=200, help="timed calls per scenario")
+    run_parser.add_argument("--warmup", type=int, default=20)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--only", help="comma-separated scenario names")
+    run_parser.add_argument("--skip-http", action="store_true")
+    run_parser.add_argument("--skip-services", action="store_true")
+    run_parser.add_argument("--skip-writes", action="store_true")
+    run_parser.add_argument("--output", help="results path; defaults to benchmarks/results/<timestamp>-<commit>.json")
+
+    compare_parser = subparsers.add_parser("compare", help="compare two results files by p95 latency")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="allowed p95 increase, e.g. 0.10 = 10%%")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.base) as f_base, open(args.head) as f_head:
+            return compare(json.load(f_base), json.load(f_head), args.threshold)
+
+    report = run(args)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['meta']['commit'] or 'nogit'}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
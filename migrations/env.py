@@ -13,7 +13,7 @@ env_path = os.path.join(current_dir, "..", ".env")
 load_dotenv(env_path)
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
-from models import Base
+from models import Base, DDL_MANAGED_INDEXES, is_partition
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -32,6 +32,12 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and reflected and is_partition(name):
+        return False
+    return not (type_ == "index" and name in DDL_MANAGED_INDEXES)
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -56,6 +62,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -77,7 +84,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
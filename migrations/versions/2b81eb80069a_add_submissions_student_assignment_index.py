@@ -0,0 +1,31 @@
+"""add submissions student assignment index
+
+Revision ID: 2b81eb80069a
+Revises: 447805f72003
+Create Date: 2026-10-18 18:22:47.913091
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b81eb80069a'
+down_revision: Union[str, None] = '447805f72003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently like the foreign key indexes; see a3f9d2c81b47 for recovering from a failed build.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_submissions_student_assignment', 'submissions', ['student_id', 'assignment_id', 'submitted_at'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_submissions_student_assignment', table_name='submissions',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,39 @@
+"""unique enrollments
+
+Revision ID: 5d0c8e2a7b94
+Revises: 9e2b7d4c1a63
+Create Date: 2026-10-18 22:40:13.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0c8e2a7b94'
+down_revision: Union[str, None] = '9e2b7d4c1a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keeps the earliest of any duplicate enrollments; the next analytics refresh corrects
+    # course_sales_stats, which counted the duplicates.
+    op.execute("""
+    DELETE FROM enrollments e
+    USING enrollments earlier
+    WHERE earlier.user_id = e.user_id AND earlier.course_id = e.course_id AND earlier.id < e.id
+    """)
+    # Built concurrently, like the other indexes on live tables. A failed build leaves an INVALID
+    # index: drop it and re-run the upgrade.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_enrollments_user_course', 'enrollments', ['user_id', 'course_id'], unique=True,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_enrollments_user_course', table_name='enrollments',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,34 @@
+"""add composite (price, id) index for catalog keyset pagination
+
+Revision ID: 7c1e4a9b2f60
+Revises: 51425cb01035
+Create Date: 2026-10-18 10:12:41.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e4a9b2f60'
+down_revision: Union[str, None] = '51425cb01035'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 51425cb01035 was meant to add the price index but shipped empty and is
+    # already stamped on existing databases, so the index is created here.
+    # (price, id) also serves plain price filters, so a single-column
+    # ix_courses_price is dropped if some database created it by hand.
+    op.drop_index('ix_courses_price', table_name='courses', if_exists=True)
+    op.create_index('ix_courses_price_id', 'courses', ['price', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    # Puts back the single-column index upgrade() may have dropped, so plain
+    # price filters keep an index after the downgrade.
+    op.create_index('ix_courses_price', 'courses', ['price'], unique=False, if_not_exists=True)
+    op.drop_index('ix_courses_price_id', table_name='courses')
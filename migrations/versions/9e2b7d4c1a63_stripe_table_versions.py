@@ -0,0 +1,67 @@
+"""stripe table versions
+
+Revision ID: 9e2b7d4c1a63
+Revises: f87d83e45e41
+Create Date: 2026-10-18 21:12:08.604317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e2b7d4c1a63'
+down_revision: Union[str, None] = 'f87d83e45e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE_VERSION_SLOTS = 16
+
+
+def upgrade() -> None:
+    op.add_column('table_versions', sa.Column('slot', sa.SmallInteger(), server_default='0', nullable=False))
+    op.alter_column('table_versions', 'slot', server_default=None)
+    op.drop_constraint('table_versions_pkey', 'table_versions', type_='primary')
+    op.create_primary_key('table_versions_pkey', 'table_versions', ['table_name', 'slot'])
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO table_versions (table_name, slot, version, updated_at)
+        VALUES (TG_TABLE_NAME, mod(pg_backend_pid(), {TABLE_VERSION_SLOTS}), 1, clock_timestamp())
+        ON CONFLICT (table_name, slot) DO UPDATE
+        SET version = table_versions.version + 1, updated_at = EXCLUDED.updated_at;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+    CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO table_versions (table_name, version, updated_at)
+        VALUES (TG_TABLE_NAME, 1, clock_timestamp())
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = table_versions.version + 1, updated_at = EXCLUDED.updated_at;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+    UPDATE table_versions t SET version = s.version, updated_at = s.updated_at
+    FROM (SELECT table_name, sum(version) AS version, max(updated_at) AS updated_at
+          FROM table_versions GROUP BY table_name) s
+    WHERE t.table_name = s.table_name AND t.slot = 0
+    """)
+    op.execute("""
+    INSERT INTO table_versions (table_name, slot, version, updated_at)
+    SELECT table_name, 0, sum(version), max(updated_at) FROM table_versions
+    GROUP BY table_name HAVING bool_and(slot <> 0)
+    """)
+    op.execute("DELETE FROM table_versions WHERE slot <> 0")
+    op.drop_constraint('table_versions_pkey', 'table_versions', type_='primary')
+    op.create_primary_key('table_versions_pkey', 'table_versions', ['table_name'])
+    op.drop_column('table_versions', 'slot')
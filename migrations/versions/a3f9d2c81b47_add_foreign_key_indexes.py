@@ -0,0 +1,44 @@
+"""add indexes on foreign key columns
+
+Revision ID: a3f9d2c81b47
+Revises: 7c1e4a9b2f60
+Create Date: 2026-10-18 11:02:17.518630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f9d2c81b47'
+down_revision: Union[str, None] = '7c1e4a9b2f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FK_INDEXES = [
+    ('ix_courses_instructor_id', 'courses', ['instructor_id']),
+    ('ix_modules_course_id', 'modules', ['course_id']),
+    ('ix_assignments_course_id', 'assignments', ['course_id']),
+    ('ix_enrollments_user_id', 'enrollments', ['user_id']),
+    ('ix_enrollments_course_id', 'enrollments', ['course_id']),
+    ('ix_submissions_assignment_id', 'submissions', ['assignment_id']),
+    ('ix_submissions_student_id', 'submissions', ['student_id']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block. If a build
+    # fails it leaves an INVALID index behind: drop it and re-run the upgrade
+    # (src/schema_lint.py reports invalid indexes).
+    with op.get_context().autocommit_block():
+        for name, table, columns in FK_INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(FK_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,65 @@
+"""add analytics summary tables
+
+Revision ID: b81e0f4c9d23
+Revises: a3f9d2c81b47
+Create Date: 2026-10-18 11:47:52.094316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81e0f4c9d23'
+down_revision: Union[str, None] = 'a3f9d2c81b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('student_score_stats',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('submissions_count', sa.Integer(), nullable=False),
+    sa.Column('graded_count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.BigInteger(), nullable=False),
+    sa.Column('best_score', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('student_id')
+    )
+    op.create_table('course_sales_stats',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('enrollments_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+    op.create_table('analytics_refreshes',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    op.execute("""
+        INSERT INTO student_score_stats (student_id, submissions_count, graded_count, score_sum, best_score)
+        SELECT student_id, COUNT(id), COUNT(score), COALESCE(SUM(score), 0), MAX(score)
+        FROM submissions
+        WHERE student_id IS NOT NULL
+        GROUP BY student_id
+    """)
+    op.execute("""
+        INSERT INTO course_sales_stats (course_id, enrollments_count)
+        SELECT course_id, COUNT(id)
+        FROM enrollments
+        WHERE course_id IS NOT NULL
+        GROUP BY course_id
+    """)
+    op.execute("INSERT INTO analytics_refreshes (name, refreshed_at) VALUES ('summaries', now())")
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_refreshes')
+    op.drop_table('course_sales_stats')
+    op.drop_table('student_score_stats')
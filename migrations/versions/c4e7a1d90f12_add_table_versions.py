@@ -0,0 +1,54 @@
+"""add table versions
+
+Revision ID: c4e7a1d90f12
+Revises: b81e0f4c9d23
+Create Date: 2026-10-18 13:05:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a1d90f12'
+down_revision: Union[str, None] = 'b81e0f4c9d23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('users', 'courses', 'modules', 'assignments')
+
+
+def upgrade() -> None:
+    op.create_table('table_versions',
+    sa.Column('table_name', sa.String(length=63), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute("""
+    CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO table_versions (table_name, version, updated_at)
+        VALUES (TG_TABLE_NAME, 1, clock_timestamp())
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = table_versions.version + 1, updated_at = EXCLUDED.updated_at;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    for table in VERSIONED_TABLES:
+        op.execute(f"INSERT INTO table_versions (table_name, version) VALUES ('{table}', 1)")
+        op.execute(
+            f"CREATE TRIGGER {table}_bump_version "
+            f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()"
+        )
+
+
+def downgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_bump_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS bump_table_version()")
+    op.drop_table('table_versions')
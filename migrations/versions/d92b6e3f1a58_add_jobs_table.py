@@ -0,0 +1,49 @@
+"""add jobs table
+
+Revision ID: d92b6e3f1a58
+Revises: c4e7a1d90f12
+Create Date: 2026-10-18 14:21:09.553102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd92b6e3f1a58'
+down_revision: Union[str, None] = 'c4e7a1d90f12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=100), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED', name='jobstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_id'), 'jobs', ['id'], unique=False)
+    op.create_index('ix_jobs_queued_run_at', 'jobs', ['run_at', 'id'], unique=False, postgresql_where=sa.text("status = 'QUEUED'"))
+    op.create_index('ix_jobs_running_locked_at', 'jobs', ['locked_at'], unique=False, postgresql_where=sa.text("status = 'RUNNING'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_running_locked_at', table_name='jobs', postgresql_where=sa.text("status = 'RUNNING'"))
+    op.drop_index('ix_jobs_queued_run_at', table_name='jobs', postgresql_where=sa.text("status = 'QUEUED'"))
+    op.drop_index(op.f('ix_jobs_id'), table_name='jobs')
+    op.drop_table('jobs')
+    sa.Enum(name='jobstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,90 @@
+"""add course search
+
+Revision ID: e5a8c2f7b3d1
+Revises: d92b6e3f1a58
+Create Date: 2026-10-18 15:02:37.840215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a8c2f7b3d1'
+down_revision: Union[str, None] = 'd92b6e3f1a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('courses', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute("""
+    CREATE OR REPLACE FUNCTION courses_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT string_agg(title, ' ' ORDER BY order_index) FROM modules WHERE course_id = NEW.id), ''
+            )), 'C');
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION modules_refresh_course_search() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE courses SET title = title WHERE id IN (SELECT course_id FROM new_modules);
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE courses SET title = title WHERE id IN (SELECT course_id FROM old_modules);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute(
+        "CREATE TRIGGER courses_search_vector BEFORE INSERT OR UPDATE OF title, description ON courses "
+        "FOR EACH ROW EXECUTE FUNCTION courses_search_vector_update()"
+    )
+    op.execute(
+        "CREATE TRIGGER modules_search_insert AFTER INSERT ON modules "
+        "REFERENCING NEW TABLE AS new_modules FOR EACH STATEMENT EXECUTE FUNCTION modules_refresh_course_search()"
+    )
+    op.execute(
+        "CREATE TRIGGER modules_search_update AFTER UPDATE ON modules "
+        "REFERENCING OLD TABLE AS old_modules NEW TABLE AS new_modules FOR EACH STATEMENT EXECUTE FUNCTION modules_refresh_course_search()"
+    )
+    op.execute(
+        "CREATE TRIGGER modules_search_delete AFTER DELETE ON modules "
+        "REFERENCING OLD TABLE AS old_modules FOR EACH STATEMENT EXECUTE FUNCTION modules_refresh_course_search()"
+    )
+    # Backfill through the trigger.
+    op.execute("UPDATE courses SET title = title")
+    op.create_index('ix_courses_search_vector', 'courses', ['search_vector'], unique=False, postgresql_using='gin')
+    # Fuzzy matching needs pg_trgm from contrib; skipped where the extension is not available.
+    op.execute("""
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            CREATE INDEX IF NOT EXISTS ix_courses_title_trgm ON courses USING gin (title gin_trgm_ops);
+        END IF;
+    END
+    $$
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_courses_title_trgm")
+    op.drop_index('ix_courses_search_vector', table_name='courses', postgresql_using='gin')
+    for trigger in ('modules_search_insert', 'modules_search_update', 'modules_search_delete'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON modules")
+    op.execute("DROP TRIGGER IF EXISTS courses_search_vector ON courses")
+    op.execute("DROP FUNCTION IF EXISTS modules_refresh_course_search()")
+    op.execute("DROP FUNCTION IF EXISTS courses_search_vector_update()")
+    op.drop_column('courses', 'search_vector')
@@ -0,0 +1,129 @@
+"""partition submissions
+
+Revision ID: f87d83e45e41
+Revises: 2b81eb80069a
+Create Date: 2026-10-18 18:35:41.550756
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f87d83e45e41'
+down_revision: Union[str, None] = '2b81eb80069a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+INDEXES = (
+    ('ix_submissions_assignment_id', ['assignment_id']),
+    ('ix_submissions_student_id', ['student_id']),
+    ('ix_submissions_student_assignment', ['student_id', 'assignment_id', 'submitted_at']),
+)
+
+
+def month_range(first: date, last: date):
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        upper = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        yield month, upper
+        month = upper
+
+
+def create_partitions(table: str, months):
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    for lower, upper in months:
+        op.execute(f"CREATE TABLE {table}_p{lower:%Y%m} PARTITION OF {table} "
+                   f"FOR VALUES FROM ('{lower} 00:00:00+00') TO ('{upper} 00:00:00+00')")
+
+
+def upgrade() -> None:
+    # Rewrites the table: every row is copied into its monthly partition and content moves to
+    # submission_contents. Run it in a maintenance window; submissions are locked throughout.
+    op.execute("LOCK TABLE submissions IN EXCLUSIVE MODE")
+    op.execute("ALTER TABLE submissions RENAME TO submissions_unpartitioned")
+    for name in ('ix_submissions_id', *(name for name, _ in INDEXES)):
+        op.drop_index(name, table_name='submissions_unpartitioned', if_exists=True)
+    op.execute("ALTER TABLE submissions_unpartitioned DROP CONSTRAINT submissions_pkey")
+
+    op.create_table('submissions',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('submissions_id_seq')"), nullable=False),
+    sa.Column('assignment_id', sa.Integer(), nullable=True),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.Column('score', sa.Integer(), nullable=True),
+    sa.Column('submitted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint('score >= 0', name='check_score_positive'),
+    postgresql_partition_by='RANGE (submitted_at)'
+    )
+    op.execute("ALTER SEQUENCE submissions_id_seq OWNED BY submissions.id")
+    op.create_table('submission_contents',
+    sa.Column('submission_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('submitted_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    postgresql_partition_by='RANGE (submitted_at)'
+    )
+
+    first = op.get_bind().scalar(sa.text("SELECT min(submitted_at) FROM submissions_unpartitioned"))
+    today = datetime.now(timezone.utc).date()
+    last = date(today.year + (today.month + MONTHS_AHEAD - 1) // 12, (today.month + MONTHS_AHEAD - 1) % 12 + 1, 1)
+    months = list(month_range(min(first.astimezone(timezone.utc).date(), today) if first else today, last))
+    create_partitions('submissions', months)
+    create_partitions('submission_contents', months)
+
+    # Keys and indexes are built after the copy, which is several times faster than maintaining them row by row.
+    op.execute("""
+        INSERT INTO submissions (id, assignment_id, student_id, score, submitted_at)
+        SELECT id, assignment_id, student_id, score, COALESCE(submitted_at, now()) FROM submissions_unpartitioned
+    """)
+    op.execute("""
+        INSERT INTO submission_contents (submission_id, submitted_at, content)
+        SELECT id, COALESCE(submitted_at, now()), content FROM submissions_unpartitioned WHERE content IS NOT NULL
+    """)
+    op.drop_table('submissions_unpartitioned')
+
+    op.create_primary_key('submissions_pkey', 'submissions', ['id', 'submitted_at'])
+    op.create_primary_key('submission_contents_pkey', 'submission_contents', ['submission_id', 'submitted_at'])
+    op.create_foreign_key('submissions_assignment_id_fkey', 'submissions', 'assignments', ['assignment_id'], ['id'])
+    op.create_foreign_key('submissions_student_id_fkey', 'submissions', 'users', ['student_id'], ['id'])
+    for name, columns in INDEXES:
+        op.create_index(name, 'submissions', columns, unique=False)
+    # Autovacuum analyzes partitions but never the partitioned parents.
+    op.execute("ANALYZE submissions, submission_contents")
+
+
+def downgrade() -> None:
+    # Archived (detached) partitions are not brought back; reattach them first to keep their rows.
+    op.execute("LOCK TABLE submissions IN EXCLUSIVE MODE")
+    op.execute("ALTER TABLE submissions RENAME TO submissions_partitioned")
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='submissions_partitioned')
+
+    op.create_table('submissions',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('submissions_id_seq')"), nullable=False),
+    sa.Column('assignment_id', sa.Integer(), nullable=True),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('score', sa.Integer(), nullable=True),
+    sa.Column('submitted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.CheckConstraint('score >= 0', name='check_score_positive'),
+    )
+    op.execute("ALTER SEQUENCE submissions_id_seq OWNED BY submissions.id")
+    op.execute("""
+        INSERT INTO submissions (id, assignment_id, student_id, content, score, submitted_at)
+        SELECT s.id, s.assignment_id, s.student_id, c.content, s.score, s.submitted_at
+        FROM submissions_partitioned s
+        LEFT JOIN submission_contents c ON c.submission_id = s.id AND c.submitted_at = s.submitted_at
+    """)
+    op.drop_table('submissions_partitioned')
+    op.drop_table('submission_contents')
+
+    op.create_primary_key('submissions_pkey', 'submissions', ['id'])
+    op.create_foreign_key('submissions_assignment_id_fkey', 'submissions', 'assignments', ['assignment_id'], ['id'])
+    op.create_foreign_key('submissions_student_id_fkey', 'submissions', 'users', ['student_id'], ['id'])
+    op.create_index('ix_submissions_id', 'submissions', ['id'], unique=False)
+    for name, columns in INDEXES:
+        op.create_index(name, 'submissions', columns, unique=False)
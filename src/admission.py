@@ -0,0 +1,323 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from config import DatabaseSettings, env_bool, env_int, env_float
+import metrics
+
+# Never queued or limited, so health checks and scrapes still answer while the API sheds load.
+EXEMPT_ROUTES = ("/health", "/metrics")
+OUTCOMES = ("admitted", "queued", "rate_limited", "shed_queue_full", "shed_timeout")
+
+def parse_route_limits(value: str) -> tuple[tuple[str, float, int], ...]:
+    # "/analytics=10:20,/exports=1:2": route prefix = requests per second : burst.
+    limits = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        prefix, _, limit = item.partition("=")
+        rate, _, burst = limit.partition(":")
+        limits.append((prefix.strip(), float(rate), int(burst or max(1, math.ceil(float(rate))))))
+    return tuple(limits)
+
+@dataclass(frozen=True)
+class AdmissionSettings:
+    enabled: bool = True
+    # Requests allowed to run at once. Defaults to the database pool (pool_size + max_overflow): past that,
+    # requests only wait for a connection while holding everything else they have taken.
+    max_in_flight: int = 15
+    # Share of max_in_flight heavy routes may use, so analytics and exports cannot starve cheap reads.
+    heavy_share: float = 0.5
+    heavy_routes: tuple[str, ...] = ("/analytics", "/exports")
+    max_queue: int = 100
+    queue_timeout: float = 10.0
+    retry_after: int = 1
+    # Token buckets; a rate of 0 turns the limit off.
+    client_rate: float = 0.0
+    client_burst: int = 0
+    route_limits: tuple[tuple[str, float, int], ...] = ()
+    trust_forwarded: bool = False
+    backend: str = "memory"
+
+    @classmethod
+    def from_env(cls, database: DatabaseSettings | None = None, env=None):
+        env = os.environ if env is None else env
+        pool = database.pool_size + database.max_overflow if database is not None else 15
+        client_rate = env_float(env, "ADMISSION_CLIENT_RATE", 0.0)
+        return cls(
+            enabled=env_bool(env, "ADMISSION_ENABLED", True),
+            max_in_flight=env_int(env, "ADMISSION_MAX_IN_FLIGHT", pool),
+            heavy_share=env_float(env, "ADMISSION_HEAVY_SHARE", 0.5),
+            heavy_routes=tuple(filter(None, env.get("ADMISSION_HEAVY_ROUTES", "/analytics,/exports").split(","))),
+            max_queue=env_int(env, "ADMISSION_MAX_QUEUE", 100),
+            queue_timeout=env_float(env, "ADMISSION_QUEUE_TIMEOUT", 10.0),
+            retry_after=env_int(env, "ADMISSION_RETRY_AFTER", 1),
+            client_rate=client_rate,
+            client_burst=env_int(env, "ADMISSION_CLIENT_BURST", max(1, math.ceil(client_rate * 2))),
+            route_limits=parse_route_limits(env.get("ADMISSION_ROUTE_LIMITS", "")),
+            trust_forwarded=env_bool(env, "ADMISSION_TRUST_FORWARDED", False),
+            backend=env.get("ADMISSION_BACKEND", "memory"),
+        )
+
+    @property
+    def heavy_limit(self) -> int:
+        return max(1, int(self.max_in_flight * self.heavy_share))
+
+def gcra(tat: float | None, now: float, rate: float, burst: int) -> tuple[float, float]:
+    # A token bucket of `burst` tokens refilled at `rate` per second, stored as a single timestamp: the
+    # theoretical arrival time of the next request (GCRA). Returns (new tat, seconds to wait; 0 = allowed).
+    interval = 1 / rate
+    tat = max(tat or now, now)
+    allow_at = tat - (burst - 1) * interval
+    if now < allow_at:
+        return tat, allow_at - now
+    return tat + interval, 0.0
+
+class MemoryRateLimiter:
+    name = "memory"
+
+    # Buckets of one process; with several workers each one enforces the limits on its own share of traffic.
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.tats = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, burst: int, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            tat, retry_after = gcra(self.tats.get(key), now, rate, burst)
+            if not retry_after:
+                self.tats[key] = tat
+                self.tats.move_to_end(key)
+                while len(self.tats) > self.max_keys:
+                    self.tats.popitem(last=False)
+            return retry_after
+
+# The same algorithm in one atomic round-trip. The clock is the server's, so nodes need not agree on time;
+# the result is a string because Redis truncates Lua numbers to integers.
+GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local interval = 1 / tonumber(ARGV[1])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+local allow_at = tat - (tonumber(ARGV[2]) - 1) * interval
+if now < allow_at then
+    return tostring(allow_at - now)
+end
+redis.call('SET', KEYS[1], tostring(tat + interval), 'PX', math.ceil((tat + interval - now) * 1000))
+return '0'
+"""
+
+class RedisRateLimiter:
+    name = "redis"
+
+    # Shared by every worker and node. Takes a redis.asyncio client (or any with an awaitable eval), so the
+    # round-trip does not block the event loop the middleware runs on.
+    def __init__(self, client, prefix: str = "lms:rate:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def acquire(self, key: str, rate: float, burst: int, now: float | None = None) -> float:
+        return float(await self.client.eval(GCRA_SCRIPT, 1, self.prefix + key, rate, burst))
+
+def limiter_from_env(settings: AdmissionSettings, env=None):
+    env = os.environ if env is None else env
+    if settings.backend == "memory":
+        return MemoryRateLimiter()
+    if settings.backend == "redis":
+        import redis.asyncio as redis
+
+        client = redis.Redis.from_url(env.get("REDIS_URL", "redis://localhost:6379/0"))
+        return RedisRateLimiter(client, prefix=env.get("ADMISSION_PREFIX", "lms:rate:"))
+    raise ValueError("ADMISSION_BACKEND must be one of: memory, redis")
+
+class AdmissionStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {(outcome, priority): 0 for outcome in OUTCOMES for priority in ("cheap", "heavy")}
+        self.queue_wait_seconds_total = 0.0
+        self.limiter_errors = 0
+
+    def incr(self, outcome: str, heavy: bool):
+        with self.lock:
+            self.counts[(outcome, "heavy" if heavy else "cheap")] += 1
+
+    def observe_wait(self, seconds: float):
+        with self.lock:
+            self.queue_wait_seconds_total += seconds
+
+    def limiter_error(self):
+        with self.lock:
+            self.limiter_errors += 1
+
+class AdmissionController:
+    # In-flight slots live in this process and its event loop: they stand for this process's DB pool.
+    # Rate limits go through the limiter backend, which may be shared.
+    def __init__(self, settings: AdmissionSettings, limiter=None):
+        self.settings = settings
+        self.limiter = limiter or MemoryRateLimiter()
+        self.stats = AdmissionStats()
+        self.in_flight = {False: 0, True: 0}
+        self.waiters = {False: deque(), True: deque()}
+        self.queued = 0
+
+    @classmethod
+    def from_env(cls, database: DatabaseSettings | None = None, env=None):
+        settings = AdmissionSettings.from_env(database, env)
+        return cls(settings, limiter_from_env(settings, env))
+
+    def is_heavy(self, route: str) -> bool:
+        return route.startswith(self.settings.heavy_routes)
+
+    def route_limit(self, route: str):
+        for prefix, rate, burst in self.settings.route_limits:
+            if route.startswith(prefix):
+                return rate, burst
+        return None
+
+    async def check_rate(self, client: str, route: str) -> float:
+        # Seconds until the request would be allowed; 0 when it is.
+        settings = self.settings
+        retry_after = 0.0
+        if settings.client_rate > 0:
+            retry_after = await self.limiter.acquire(f"client:{client}", settings.client_rate, settings.client_burst)
+        limit = self.route_limit(route)
+        if not retry_after and limit is not None:
+            retry_after = await self.limiter.acquire(f"route:{route}", *limit)
+        return retry_after
+
+    def can_run(self, heavy: bool) -> bool:
+        if self.in_flight[False] + self.in_flight[True] >= self.settings.max_in_flight:
+            return False
+        return not heavy or self.in_flight[True] < self.settings.heavy_limit
+
+    def take(self, heavy: bool):
+        self.in_flight[heavy] += 1
+
+    async def acquire(self, heavy: bool) -> bool:
+        # Cheap requests never wait behind heavy ones; within a class the queue is first come, first served.
+        ahead = self.waiters[False] or (heavy and self.waiters[True])
+        if not ahead and self.can_run(heavy):
+            self.take(heavy)
+            self.stats.incr("admitted", heavy)
+            return True
+        if self.queued >= self.settings.max_queue:
+            self.stats.incr("shed_queue_full", heavy)
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[heavy].append(waiter)
+        self.queued += 1
+        self.stats.incr("queued", heavy)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.settings.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats.incr("shed_timeout", heavy)
+            return False
+        except asyncio.CancelledError:
+            # The client went away; hand back a slot that was granted just before.
+            if waiter.done() and not waiter.cancelled():
+                self.release(heavy)
+            raise
+        finally:
+            self.queued -= 1
+            self.stats.observe_wait(time.monotonic() - started)
+        self.stats.incr("admitted", heavy)
+        return True
+
+    def release(self, heavy: bool):
+        self.in_flight[heavy] -= 1
+        for priority in (False, True):
+            waiters = self.waiters[priority]
+            while waiters and self.can_run(priority):
+                waiter = waiters.popleft()
+                # Timed-out waiters are cancelled and stay in the deque until they reach the front.
+                if not waiter.done():
+                    self.take(priority)
+                    waiter.set_result(True)
+
+def route_template(scope, routes) -> str:
+    # Routing has not run yet at this point; match the route here so limits use the template, not the path.
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+    return "unmatched"
+
+def client_key(scope, trust_forwarded: bool = False) -> str:
+    if trust_forwarded:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def reject(status_code: int, retry_after: float, detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+class AdmissionMiddleware:
+    # Plain ASGI rather than @app.middleware("http"): the slot is held until the whole body is sent,
+    # which for streamed exports and content is long after the endpoint returned.
+    def __init__(self, app, routes=()):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        controller = get_controller()
+        if scope["type"] != "http" or controller is None or not controller.settings.enabled:
+            return await self.app(scope, receive, send)
+        route = route_template(scope, self.routes)
+        if route in EXEMPT_ROUTES:
+            return await self.app(scope, receive, send)
+
+        heavy = controller.is_heavy(route)
+        try:
+            retry_after = await controller.check_rate(client_key(scope, controller.settings.trust_forwarded), route)
+        except Exception:
+            # Fails open: a shared limiter that is down or slow must not take every route down with it.
+            # Concurrency limits below still apply.
+            controller.stats.limiter_error()
+            retry_after = 0.0
+        if retry_after:
+            controller.stats.incr("rate_limited", heavy)
+            return await reject(429, retry_after, "Too many requests")(scope, receive, send)
+        if not await controller.acquire(heavy):
+            return await reject(503, controller.settings.retry_after, "Server is busy, retry later")(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(heavy)
+
+_controller: AdmissionController | None = None
+
+def get_controller() -> AdmissionController | None:
+    return _controller
+
+def set_controller(controller: AdmissionController | None):
+    global _controller
+    _controller = controller
+    return controller
+
+@metrics.register
+def collect_admission_metrics():
+    requests = metrics.Metric("lms_admission_requests_total", "counter",
+                              "Admission decisions; queued requests are also counted as admitted or shed.")
+    in_flight = metrics.Metric("lms_admission_in_flight", "gauge", "Requests holding an admission slot.")
+    queue = metrics.Metric("lms_admission_queue_length", "gauge", "Requests waiting for a slot.")
+    wait = metrics.Metric("lms_admission_queue_wait_seconds_total", "counter", "Total time requests spent queued.")
+    limiter_errors = metrics.Metric("lms_admission_limiter_errors_total", "counter",
+                                    "Rate limit checks that failed; the request was admitted unchecked.")
+    controller = _controller
+    if controller is not None:
+        for (outcome, priority), count in controller.stats.counts.items():
+            requests.add(count, outcome=outcome, priority=priority)
+        in_flight.add(controller.in_flight[False], priority="cheap")
+        in_flight.add(controller.in_flight[True], priority="heavy")
+        queue.add(controller.queued)
+        wait.add(round(controller.stats.queue_wait_seconds_total, 6))
+        limiter_errors.add(controller.stats.limiter_errors, backend=controller.limiter.name)
+    return [requests, in_flight, queue, wait, limiter_errors]
@@ -0,0 +1,194 @@
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+from sqlalchemy import select, delete, insert, func, desc, text, cast, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from models import User, UserRole, Course, Enrollment, Submission, StudentScoreStats, CourseSalesStats, AnalyticsRefresh
+import routing
+
+# Summary tables are kept current by the write services; the periodic full refresh only
+# repairs drift from writes that bypass them (raw SQL, restores). This bounds that drift.
+DEFAULT_MAX_STALENESS = int(os.getenv("ANALYTICS_MAX_STALENESS_SECONDS", "3600"))
+# Floor for caller-supplied staleness, so a request cannot force a rebuild on every call.
+MIN_STALENESS = int(os.getenv("ANALYTICS_MIN_STALENESS_SECONDS", "300"))
+REFRESH_NAME = "summaries"
+REFRESH_LOCK_ID = 7_301_001
+
+def student_stats_source(student_ids: list[int] | None = None):
+    stmt = select(
+        Submission.student_id,
+        func.count(Submission.id),
+        func.count(Submission.score),
+        func.coalesce(func.sum(Submission.score), 0),
+        func.max(Submission.score),
+    ).where(Submission.student_id.isnot(None)).group_by(Submission.student_id)
+    if student_ids is not None:
+        stmt = stmt.where(Submission.student_id.in_(student_ids))
+    return stmt
+
+def course_stats_source():
+    return select(Enrollment.course_id, func.count(Enrollment.id))\
+        .where(Enrollment.course_id.isnot(None))\
+        .group_by(Enrollment.course_id)
+
+STUDENT_STATS_COLUMNS = ["student_id", "submissions_count", "graded_count", "score_sum", "best_score"]
+
+def record_submission(db: Session, student_id: int):
+    stmt = pg_insert(StudentScoreStats).values(student_id=student_id, submissions_count=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[StudentScoreStats.student_id],
+        set_={
+            "submissions_count": StudentScoreStats.submissions_count + 1,
+            "updated_at": func.now(),
+        },
+    ))
+
+def record_grade(db: Session, student_id: int, old_score: int | None, new_score: int):
+    if old_score is not None and new_score < old_score:
+        # A lowered grade may have been the best score, which cannot be derived incrementally.
+        refresh_student(db, student_id)
+        return
+
+    stmt = pg_insert(StudentScoreStats).values(
+        student_id=student_id,
+        submissions_count=0,
+        graded_count=1 if old_score is None else 0,
+        score_sum=new_score - (old_score or 0),
+        best_score=new_score,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[StudentScoreStats.student_id],
+        set_={
+            "graded_count": StudentScoreStats.graded_count + stmt.excluded.graded_count,
+            "score_sum": StudentScoreStats.score_sum + stmt.excluded.score_sum,
+            "best_score": func.greatest(StudentScoreStats.best_score, stmt.excluded.best_score),
+            "updated_at": func.now(),
+        },
+    ))
+
+def record_enrollments(db: Session, course_id: int, count: int = 1):
+    if count <= 0:
+        return
+    stmt = pg_insert(CourseSalesStats).values(course_id=course_id, enrollments_count=count)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[CourseSalesStats.course_id],
+        set_={
+            "enrollments_count": CourseSalesStats.enrollments_count + stmt.excluded.enrollments_count,
+            "updated_at": func.now(),
+        },
+    ))
+
+def refresh_student(db: Session, student_id: int):
+    refresh_students(db, [student_id])
+
+def refresh_students(db: Session, student_ids: list[int]):
+    if not student_ids:
+        return
+    db.flush()
+    db.execute(delete(StudentScoreStats).where(StudentScoreStats.student_id.in_(student_ids)))
+    db.execute(insert(StudentScoreStats).from_select(STUDENT_STATS_COLUMNS, student_stats_source(student_ids)))
+
+def get_refreshed_at(db: Session) -> datetime | None:
+    return db.scalar(select(AnalyticsRefresh.refreshed_at).where(AnalyticsRefresh.name == REFRESH_NAME))
+
+def is_stale(refreshed_at: datetime | None, max_staleness: int) -> bool:
+    return refreshed_at is None or (datetime.now(timezone.utc) - refreshed_at).total_seconds() > max_staleness
+
+def refresh_all(db: Session, max_staleness: int | None = None, wait: bool = False) -> bool:
+    # The lock and the staleness re-check are SELECTs; on a read session they must not go to the replica.
+    routing.pin_to_primary(db)
+    # One rebuild at a time: a concurrent caller skips instead of queueing behind the table lock,
+    # unless there is nothing to serve yet.
+    if wait:
+        db.execute(select(func.pg_advisory_xact_lock(REFRESH_LOCK_ID)))
+    elif not db.scalar(select(func.pg_try_advisory_xact_lock(REFRESH_LOCK_ID))):
+        print("Analytics refresh already running, skipped.")
+        return False
+    if max_staleness is not None and not is_stale(get_refreshed_at(db), max_staleness):
+        # Another rebuild committed between the staleness check and the lock.
+        return False
+
+    # EXCLUSIVE still lets readers in but holds back incremental upserts until the rebuild commits.
+    db.execute(text("LOCK TABLE student_score_stats, course_sales_stats IN EXCLUSIVE MODE"))
+
+    db.execute(delete(StudentScoreStats))
+    db.execute(insert(StudentScoreStats).from_select(STUDENT_STATS_COLUMNS, student_stats_source()))
+
+    db.execute(delete(CourseSalesStats))
+    db.execute(insert(CourseSalesStats).from_select(["course_id", "enrollments_count"], course_stats_source()))
+
+    stmt = pg_insert(AnalyticsRefresh).values(name=REFRESH_NAME, refreshed_at=func.now())
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[AnalyticsRefresh.name],
+        set_={"refreshed_at": stmt.excluded.refreshed_at},
+    ))
+    db.commit()
+    print("Analytics summaries refreshed.")
+    return True
+
+def ensure_fresh(db: Session, max_staleness: int = DEFAULT_MAX_STALENESS) -> datetime:
+    refreshed_at = get_refreshed_at(db)
+    if is_stale(refreshed_at, max_staleness):
+        # When skipped, the current rows are served until the running rebuild commits.
+        refresh_all(db, max_staleness, wait=refreshed_at is None)
+        refreshed_at = get_refreshed_at(db)
+    return refreshed_at
+
+# Same columns and filters as "Student Performance Report" in docs/queries.md.
+def student_performance_statement():
+    average_score = func.round(
+        cast(StudentScoreStats.score_sum, Numeric) / func.nullif(StudentScoreStats.graded_count, 0), 2
+    ).label("average_score")
+    return select(
+        User.full_name.label("student_name"),
+        User.email,
+        StudentScoreStats.submissions_count.label("submitted_works_count"),
+        average_score,
+        StudentScoreStats.best_score,
+    ).join(User, User.id == StudentScoreStats.student_id)\
+     .where(User.role == UserRole.STUDENT, StudentScoreStats.submissions_count > 0)\
+     .order_by(desc("average_score"))
+
+# Same columns and filters as "Instructor Revenue" in docs/queries.md.
+def instructor_revenue_statement():
+    total_revenue = func.sum(CourseSalesStats.enrollments_count * Course.price).label("total_revenue")
+    return select(
+        User.full_name.label("instructor_name"),
+        func.count(Course.id).label("courses_created"),
+        func.sum(CourseSalesStats.enrollments_count).label("total_enrollments"),
+        total_revenue,
+    ).join(Course, Course.id == CourseSalesStats.course_id)\
+     .join(User, User.id == Course.instructor_id)\
+     .where(User.role == UserRole.INSTRUCTOR, CourseSalesStats.enrollments_count > 0)\
+     .group_by(User.id, User.full_name)\
+     .order_by(desc("total_revenue"))
+
+def get_student_performance(db: Session, max_staleness: int = DEFAULT_MAX_STALENESS):
+    refreshed_at = ensure_fresh(db, max_staleness)
+    return db.execute(student_performance_statement()).all(), refreshed_at
+
+def get_instructor_revenue(db: Session, max_staleness: int = DEFAULT_MAX_STALENESS):
+    refreshed_at = ensure_fresh(db, max_staleness)
+    return db.execute(instructor_revenue_statement()).all(), refreshed_at
+
+def main(argv=None):
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the analytics summary tables.")
+    parser.add_argument("--every", type=int, default=0, help="repeat every N seconds (0 = run once)")
+    args = parser.parse_args(argv)
+
+    while True:
+        db = SessionLocal()
+        try:
+            refresh_all(db)
+        finally:
+            db.close()
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
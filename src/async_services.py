@@ -0,0 +1,73 @@
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import UserRole
+from repositories.user_repository import async_user_repo
+from repositories.course_repository import async_course_repo
+import services
+from services import catalog_page_size, search_page_size, student_average_scores_statement, instructor_revenue_statement
+
+async def create_user(db: AsyncSession, full_name: str, email: str, role: UserRole):
+    return await async_user_repo.create(db, {
+        "full_name": full_name,
+        "email": email,
+        "role": role
+    })
+
+async def create_course(db: AsyncSession, instructor_id: int, title: str, price: int, modules: list = (),
+                        description: str | None = None, assignments: list[dict] = (), idempotency_key: str | None = None):
+    return await db.run_sync(
+        services.create_course, instructor_id, title, price, modules, description, assignments, idempotency_key
+    )
+
+async def create_course_with_modules(db: AsyncSession, instructor_id: int, title: str, price: int, module_titles: list[str]):
+    return (await create_course(db, instructor_id, title, price, module_titles))[0]
+
+async def enroll_student(db: AsyncSession, student_id: int, course_id: int):
+    enrollment = await db.run_sync(services.enroll_student, student_id, course_id)
+    if enrollment is not None:
+        # Async sessions do not expire on commit, so server defaults are loaded here rather than lazily.
+        await db.refresh(enrollment)
+    return enrollment
+
+async def create_assignment(db: AsyncSession, course_id: int, title: str, max_score: int):
+    return await db.run_sync(services.create_assignment, course_id, title, max_score)
+
+async def submit_homework(db: AsyncSession, assignment_id: int, student_id: int, content: str):
+    return await db.run_sync(services.submit_homework, assignment_id, student_id, content)
+
+async def grade_submission(db: AsyncSession, submission_id: int, score: int):
+    return await db.run_sync(services.grade_submission, submission_id, score)
+
+async def soft_delete_user(db: AsyncSession, user_id: int):
+    return await db.run_sync(services.soft_delete_user, user_id)
+
+async def hard_delete_module(db: AsyncSession, module_id: int):
+    return await db.run_sync(services.hard_delete_module, module_id)
+
+async def get_course(db: AsyncSession, course_id: int, plan: str | None = "with_modules_and_assignments"):
+    return await async_course_repo.get_by_id(db, course_id, plan)
+
+async def get_course_modules(db: AsyncSession, course_id: int):
+    return await db.run_sync(services.get_course_modules, course_id)
+
+async def get_courses_by_price_range(db: AsyncSession, min_price: int, max_price: int, plan: str | None = None):
+    return await async_course_repo.get_by_price_range(db, min_price, max_price, plan)
+
+async def get_course_catalog_page(db: AsyncSession, min_price: int, max_price: int, limit: int | None = None,
+                                  cursor: str | None = None, sort: str = "price_asc", plan: str | None = None):
+    limit = catalog_page_size(min_price, max_price, limit)
+    return await async_course_repo.get_catalog_page(db, min_price, max_price, limit, cursor, sort, plan)
+
+async def get_course_catalog_rows(db: AsyncSession, min_price: int, max_price: int, columns: tuple[str, ...],
+                                  limit: int | None = None, cursor: str | None = None, sort: str = "price_asc"):
+    limit = catalog_page_size(min_price, max_price, limit)
+    return await async_course_repo.get_catalog_rows(db, min_price, max_price, limit, columns, cursor, sort)
+
+async def search_courses(db: AsyncSession, q: str, limit: int | None = None, cursor: str | None = None):
+    return await async_course_repo.search(db, q, search_page_size(q, limit), cursor)
+
+async def get_student_average_scores(db: AsyncSession, since: datetime | None = None):
+    return (await db.execute(student_average_scores_statement(since))).all()
+
+async def get_instructor_revenue(db: AsyncSession):
+    return (await db.execute(instructor_revenue_statement())).all()
@@ -0,0 +1,197 @@
+import enum
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from models import UserRole, EnrollmentStatus, JobStatus
+import metrics
+
+class CacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def incr(self, counter: str, amount: int = 1):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+class NullCache:
+    name = "none"
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, value, ttl: int | None = None):
+        pass
+
+    def delete(self, *keys: str):
+        pass
+
+    def clear(self):
+        pass
+
+class MemoryCache:
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000, ttl: int = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self.entries[key]
+                self.stats.evictions += 1
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value, ttl: int | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            self.stats.sets += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, *keys: str):
+        with self.lock:
+            for key in keys:
+                if self.entries.pop(key, None) is not None:
+                    self.stats.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# Redis is shared, so what comes back from it is decoded as data, never unpickled. Cached values are column
+# snapshots and plain dicts and lists; the types JSON lacks are tagged, enums only from this list.
+CACHED_ENUMS = {cls.__name__: cls for cls in (UserRole, EnrollmentStatus, JobStatus)}
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, enum.Enum) and CACHED_ENUMS.get(type(value).__name__) is type(value):
+        return {"__enum__": type(value).__name__, "value": value.value}
+    raise TypeError(f"Cannot cache a value of type {type(value).__name__}")
+
+def decode_object(data: dict):
+    if len(data) == 1:
+        if "__datetime__" in data:
+            return datetime.fromisoformat(data["__datetime__"])
+        if "__date__" in data:
+            return date.fromisoformat(data["__date__"])
+        if "__decimal__" in data:
+            return Decimal(data["__decimal__"])
+    if len(data) == 2 and "__enum__" in data:
+        return CACHED_ENUMS[data["__enum__"]](data["value"])
+    return data
+
+def dumps(value) -> bytes:
+    return json.dumps(value, default=encode_value, separators=(",", ":")).encode()
+
+def loads(raw: bytes):
+    return json.loads(raw, object_hook=decode_object)
+
+class RedisCache:
+    name = "redis"
+
+    # Works with any redis-py compatible client: get, set(ex=...), delete, scan_iter.
+    def __init__(self, client, ttl: int = 300, prefix: str = "lms:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.stats.incr("misses")
+            return None
+        self.stats.incr("hits")
+        return loads(raw)
+
+    def set(self, key: str, value, ttl: int | None = None):
+        self.client.set(self.prefix + key, dumps(value), ex=self.ttl if ttl is None else ttl)
+        self.stats.incr("sets")
+
+    def delete(self, *keys: str):
+        if keys:
+            deleted = self.client.delete(*(self.prefix + key for key in keys))
+            self.stats.incr("invalidations", deleted or 0)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+def cache_from_env(env=None):
+    env = os.environ if env is None else env
+    backend = env.get("CACHE_BACKEND", "memory")
+    ttl = int(env.get("CACHE_TTL_SECONDS", "300"))
+
+    if backend == "none":
+        return NullCache()
+    if backend == "memory":
+        return MemoryCache(max_entries=int(env.get("CACHE_MAX_ENTRIES", "10000")), ttl=ttl)
+    if backend == "redis":
+        import redis
+
+        client = redis.Redis.from_url(env.get("REDIS_URL", "redis://localhost:6379/0"))
+        return RedisCache(client, ttl=ttl, prefix=env.get("CACHE_PREFIX", "lms:"))
+    raise ValueError("CACHE_BACKEND must be one of: none, memory, redis")
+
+# The in-process backend only sees invalidations from its own worker, so with several
+# workers entries can be stale for up to CACHE_TTL_SECONDS. Use redis to share them.
+# Built on first use, so importing this module neither reads the environment nor connects.
+_cache = None
+_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = cache_from_env()
+    return _cache
+
+def set_cache(backend):
+    global _cache
+    _cache = backend
+    return backend
+
+@metrics.register
+def collect_cache_metrics():
+    backend = get_cache()
+    stats = backend.stats
+    return [
+        metrics.Metric("lms_cache_hits_total", "counter", "Cache lookups served from the cache.").add(stats.hits, backend=backend.name),
+        metrics.Metric("lms_cache_misses_total", "counter", "Cache lookups that fell through to the database.").add(stats.misses, backend=backend.name),
+        metrics.Metric("lms_cache_sets_total", "counter", "Entries written to the cache.").add(stats.sets, backend=backend.name),
+        metrics.Metric("lms_cache_evictions_total", "counter", "Entries dropped for size or TTL.").add(stats.evictions, backend=backend.name),
+        metrics.Metric("lms_cache_invalidations_total", "counter", "Entries removed after writes.").add(stats.invalidations, backend=backend.name),
+    ]
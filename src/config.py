@@ -0,0 +1,123 @@
+import os
+from dataclasses import dataclass, replace
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env")
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+POOL_MODES = ("queue", "external")
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+def env_bool(env, name: str, default: bool) -> bool:
+    value = env.get(name)
+    if value is None or value == "":
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+def env_int(env, name: str, default: int | None) -> int | None:
+    value = env.get(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+def env_float(env, name: str, default: float) -> float:
+    value = env.get(name)
+    if value is None or value == "":
+        return default
+    return float(value)
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    url: str
+    async_url: str
+    # "queue": a QueuePool per engine; "external": NullPool for PgBouncer in transaction mode.
+    pool_mode: str = "queue"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_timeout_ms: int | None = None
+    echo: bool = False
+    # Optional read replica; see routing.py. Without it every session uses the primary.
+    replica_url: str | None = None
+    replica_async_url: str | None = None
+    replica_max_lag_seconds: float = 5.0
+    replica_check_seconds: float = 5.0
+    replica_connect_timeout: int = 2
+    # Connections the API opens at startup instead of on its first requests; see Database.prewarm.
+    prewarm_connections: int = 0
+    # Statements asyncpg keeps prepared per connection; psycopg2 has no server-side prepare.
+    prepared_statement_cache_size: int = 100
+
+    @classmethod
+    def from_env(cls, env=None):
+        env = os.environ if env is None else env
+        url = env.get("DATABASE_URL")
+        if not url:
+            raise ValueError("DATABASE_URL is not set")
+
+        pool_mode = env.get("DB_POOL_MODE", "queue")
+        if pool_mode not in POOL_MODES:
+            raise ValueError(f"DB_POOL_MODE must be one of: {', '.join(POOL_MODES)}")
+
+        pool_size, max_overflow = cls.process_pool_budget(env)
+        replica_url = env.get("DATABASE_REPLICA_URL") or None
+
+        return cls(
+            url=url,
+            async_url=env.get("ASYNC_DATABASE_URL") or to_async_url(url),
+            pool_mode=pool_mode,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=env_int(env, "DB_POOL_TIMEOUT", 30),
+            pool_recycle=env_int(env, "DB_POOL_RECYCLE", 1800),
+            pool_pre_ping=env_bool(env, "DB_POOL_PRE_PING", True),
+            statement_timeout_ms=env_int(env, "DB_STATEMENT_TIMEOUT_MS", None),
+            echo=env_bool(env, "DB_ECHO", False),
+            replica_url=replica_url,
+            replica_async_url=env.get("ASYNC_DATABASE_REPLICA_URL") or (to_async_url(replica_url) if replica_url else None),
+            replica_max_lag_seconds=env_float(env, "DB_REPLICA_MAX_LAG_SECONDS", 5.0),
+            replica_check_seconds=env_float(env, "DB_REPLICA_CHECK_SECONDS", 5.0),
+            replica_connect_timeout=env_int(env, "DB_REPLICA_CONNECT_TIMEOUT", 2),
+            prewarm_connections=env_int(env, "DB_PREWARM_CONNECTIONS", 0),
+            prepared_statement_cache_size=env_int(env, "DB_PREPARED_STATEMENT_CACHE_SIZE", 100),
+        )
+
+    def replica(self):
+        # The replica shares the primary's pool settings; only the URLs differ.
+        if self.replica_url is None:
+            return None
+        return replace(self, url=self.replica_url, async_url=self.replica_async_url, replica_url=None, replica_async_url=None)
+
+    @staticmethod
+    def process_pool_budget(env) -> tuple[int, int]:
+        # Explicit sizes win. Otherwise split DB_MAX_CONNECTIONS (the share of the server's
+        # max_connections this app may use) across WEB_CONCURRENCY worker processes.
+        pool_size = env_int(env, "DB_POOL_SIZE", None)
+        max_overflow = env_int(env, "DB_MAX_OVERFLOW", None)
+        budget = env_int(env, "DB_MAX_CONNECTIONS", None)
+
+        if budget is not None:
+            workers = max(1, env_int(env, "WEB_CONCURRENCY", 1))
+            per_process = max(1, budget // workers)
+            if pool_size is None:
+                pool_size = max(1, per_process * 2 // 3)
+            if max_overflow is None:
+                max_overflow = max(0, per_process - pool_size)
+
+        return (5 if pool_size is None else pool_size, 10 if max_overflow is None else max_overflow)
+
+def load_settings(env_file: str = ENV_FILE) -> DatabaseSettings:
+    load_dotenv(env_file)
+    return DatabaseSettings.from_env()
@@ -0,0 +1,175 @@
+import os
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import select, case, cast, null, literal, func, union_all, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import User, Course, Enrollment, Assignment, Submission
+from utils import calculate_letter_grade
+import cache
+
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+DASHBOARD_UPCOMING_LIMIT = int(os.getenv("DASHBOARD_UPCOMING_LIMIT", "10"))
+DASHBOARD_RECENT_SCORES_LIMIT = int(os.getenv("DASHBOARD_RECENT_SCORES_LIMIT", "10"))
+
+# A student's own writes delete their entry; a new assignment can appear on any number of dashboards,
+# so it swaps the version token instead, the same way the course catalog is invalidated.
+def dashboard_version() -> str:
+    version = cache.get_cache().get("dashboard:version")
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.get_cache().set("dashboard:version", version)
+    return version
+
+def dashboard_key(user_id: int) -> str:
+    return f"dashboard:{dashboard_version()}:{user_id}"
+
+def invalidate(*user_ids: int):
+    if user_ids:
+        cache.get_cache().delete(*(dashboard_key(user_id) for user_id in user_ids))
+
+def invalidate_all():
+    cache.get_cache().set("dashboard:version", uuid.uuid4().hex)
+
+def dashboard_statement(user_id: int, upcoming_limit: int | None = None, scores_limit: int | None = None):
+    # The items CTE has one row per (enrolled course, assignment), joined to the student's latest submission
+    # per assignment. That comes from one DISTINCT ON pass over the student's own submissions, which costs an
+    # index probe per partition of submissions; a per-assignment lateral lookup would pay that for every
+    # assignment. Aggregating and ranking also happen in the database: about 70 rows come back for a student
+    # with 50 courses, instead of every assignment row.
+    latest = select(Submission.assignment_id, Submission.id, Submission.score, Submission.submitted_at)\
+        .where(Submission.student_id == user_id)\
+        .distinct(Submission.assignment_id)\
+        .order_by(Submission.assignment_id, Submission.submitted_at.desc(), Submission.id.desc())\
+        .subquery("latest")
+    # Same integer floor as utils.percentage.
+    percent = case(
+        (latest.c.score.is_(None), None),
+        (Assignment.max_score > 0, latest.c.score * 100 // Assignment.max_score),
+        else_=100,
+    )
+    items = select(
+        Enrollment.course_id,
+        Course.title.label("course_title"),
+        Enrollment.status,
+        Enrollment.enrolled_at,
+        Assignment.id.label("assignment_id"),
+        Assignment.title.label("assignment_title"),
+        Assignment.max_score,
+        Assignment.due_date,
+        latest.c.id.label("submission_id"),
+        latest.c.score,
+        latest.c.submitted_at,
+        percent.label("percent"),
+    ).join(Course, Course.id == Enrollment.course_id)\
+     .outerjoin(Assignment, Assignment.course_id == Enrollment.course_id)\
+     .outerjoin(latest, latest.c.assignment_id == Assignment.id)\
+     .where(Enrollment.user_id == user_id)\
+     .cte("items")
+
+    def nulls(*columns):
+        return [cast(null(), column.type).label(column.name) for column in columns]
+
+    item_columns = (items.c.assignment_id, items.c.assignment_title, items.c.max_score, items.c.due_date,
+                    items.c.submission_id, items.c.score, items.c.submitted_at, items.c.percent)
+    count_columns = (
+        func.count(items.c.assignment_id).label("assignments_count"),
+        func.count(items.c.submission_id).label("submitted_count"),
+        func.count(items.c.score).label("graded_count"),
+        cast(func.round(func.avg(items.c.percent), 1), Float).label("average_percent"),
+    )
+    course_columns = (items.c.course_id, items.c.course_title)
+
+    courses = select(literal("course").label("kind"), *course_columns, items.c.status, items.c.enrolled_at,
+                     *count_columns, *nulls(*item_columns))\
+        .group_by(items.c.course_id, items.c.course_title, items.c.status, items.c.enrolled_at)
+    upcoming = select(literal("upcoming"), *course_columns, *nulls(items.c.status, items.c.enrolled_at, *count_columns),
+                      *item_columns)\
+        .where(items.c.submission_id.is_(None), items.c.due_date >= func.now())\
+        .order_by(items.c.due_date, items.c.assignment_id)\
+        .limit(upcoming_limit or DASHBOARD_UPCOMING_LIMIT)
+    scores = select(literal("score"), *course_columns, *nulls(items.c.status, items.c.enrolled_at, *count_columns),
+                    *item_columns)\
+        .where(items.c.score.isnot(None))\
+        .order_by(items.c.submitted_at.desc(), items.c.submission_id.desc())\
+        .limit(scores_limit or DASHBOARD_RECENT_SCORES_LIMIT)
+    return union_all(courses, upcoming, scores)
+
+def build_dashboard(user_id: int, rows) -> dict:
+    dashboard = {"user_id": user_id, "courses": [], "upcoming": [], "recent_scores": []}
+    for (kind, course_id, course_title, status, enrolled_at, assignments_count, submitted_count, graded_count,
+         average_percent, assignment_id, assignment_title, max_score, due_date, submission_id, score, submitted_at,
+         percent) in rows:
+        if kind == "course":
+            dashboard["courses"].append({
+                "course_id": course_id,
+                "title": course_title,
+                "status": getattr(status, "value", status),
+                "enrolled_at": enrolled_at,
+                "assignments_count": assignments_count,
+                "submitted_count": submitted_count,
+                "graded_count": graded_count,
+                "progress": round(100 * submitted_count / assignments_count, 1) if assignments_count else 0.0,
+                "average_percent": average_percent,
+            })
+        elif kind == "upcoming":
+            dashboard["upcoming"].append({
+                "assignment_id": assignment_id,
+                "course_id": course_id,
+                "course_title": course_title,
+                "title": assignment_title,
+                "max_score": max_score,
+                "due_date": due_date,
+            })
+        else:
+            dashboard["recent_scores"].append({
+                "submission_id": submission_id,
+                "assignment_id": assignment_id,
+                "course_id": course_id,
+                "title": assignment_title,
+                "score": score,
+                "max_score": max_score,
+                "percent": percent,
+                "letter_grade": calculate_letter_grade(percent),
+                "submitted_at": submitted_at,
+            })
+    # UNION ALL keeps no order across its branches.
+    dashboard["courses"].sort(key=lambda c: (c["enrolled_at"], c["course_id"]))
+    dashboard["upcoming"].sort(key=lambda a: (a["due_date"], a["assignment_id"]))
+    dashboard["recent_scores"].sort(key=lambda s: (s["submitted_at"], s["submission_id"]), reverse=True)
+    return dashboard
+
+def cache_ttl(dashboard: dict, now: datetime | None = None) -> int:
+    # An upcoming assignment drops off once its due date passes, so the entry must not outlive it.
+    ttl = DASHBOARD_CACHE_TTL
+    if dashboard["upcoming"]:
+        now = now or datetime.now(timezone.utc)
+        ttl = min(ttl, int((dashboard["upcoming"][0]["due_date"] - now).total_seconds()))
+    return ttl
+
+def store(key: str, dashboard: dict) -> dict:
+    ttl = cache_ttl(dashboard)
+    if ttl > 0:
+        cache.get_cache().set(key, dashboard, ttl=ttl)
+    return dashboard
+
+def get_dashboard(db: Session, user_id: int):
+    key = dashboard_key(user_id)
+    cached = cache.get_cache().get(key)
+    if cached is not None:
+        return cached
+    rows = db.execute(dashboard_statement(user_id)).all()
+    # Only a student without enrollments needs a second round-trip, to tell them apart from a missing user.
+    if not rows and db.get(User, user_id) is None:
+        return None
+    return store(key, build_dashboard(user_id, rows))
+
+async def get_async_dashboard(db: AsyncSession, user_id: int):
+    key = dashboard_key(user_id)
+    cached = cache.get_cache().get(key)
+    if cached is not None:
+        return cached
+    rows = (await db.execute(dashboard_statement(user_id))).all()
+    if not rows and await db.get(User, user_id) is None:
+        return None
+    return store(key, build_dashboard(user_id, rows))
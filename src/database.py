@@ -1,28 +1,214 @@
-import os
+import asyncio
+import threading
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
 from models.base import Base
-from dotenv import load_dotenv
+from config import DatabaseSettings, load_settings
+from instrumentation import instrument_queries, instrument_orm
+from routing import RoutingSession, ReplicaMonitor
+from pooling import (
+    instrument_engine,
+    InstrumentedQueuePool,
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedNullPool,
+)
 
-current_dir = os.path.dirname(os.path.abspath(__file__))
-env_path = os.path.join(current_dir, "..", ".env")
+def pool_options(settings: DatabaseSettings, name: str, queue_pool_class) -> dict:
+    options = {
+        "echo": settings.echo,
+        "pool_pre_ping": settings.pool_pre_ping,
+        "pool_logging_name": name,
+    }
+    if settings.pool_mode == "external":
+        options["poolclass"] = InstrumentedNullPool
+    else:
+        options.update(
+            poolclass=queue_pool_class,
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+        )
+    return options
 
-load_dotenv(env_path)
+def is_postgres(url: str) -> bool:
+    return make_url(url).get_backend_name() == "postgresql"
 
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+def create_db_engine(settings: DatabaseSettings, name: str = "primary", connect_timeout: int | None = None):
+    connect_args = {}
+    # PgBouncer rejects startup options, so in external mode set statement_timeout on the role instead.
+    if settings.statement_timeout_ms and settings.pool_mode != "external" and is_postgres(settings.url):
+        connect_args["options"] = f"-c statement_timeout={settings.statement_timeout_ms}"
+    if connect_timeout and is_postgres(settings.url):
+        connect_args["connect_timeout"] = connect_timeout
 
-if not SQLALCHEMY_DATABASE_URL:
-    raise ValueError("DATABASE_URL is not set")
+    engine = create_engine(
+        settings.url,
+        connect_args=connect_args,
+        **pool_options(settings, name, InstrumentedQueuePool),
+    )
+    instrument_queries(engine, name)
+    return instrument_engine(engine, name)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def create_async_db_engine(settings: DatabaseSettings, name: str = "primary_async", connect_timeout: int | None = None):
+    connect_args = {}
+    if connect_timeout and is_postgres(settings.async_url):
+        connect_args["timeout"] = connect_timeout
+    if is_postgres(settings.async_url):
+        if settings.pool_mode == "external":
+            # Prepared statements do not survive PgBouncer transaction pooling.
+            connect_args.update(statement_cache_size=0, prepared_statement_cache_size=0)
+        else:
+            connect_args["prepared_statement_cache_size"] = settings.prepared_statement_cache_size
+            if settings.statement_timeout_ms:
+                connect_args["server_settings"] = {"statement_timeout": str(settings.statement_timeout_ms)}
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine = create_async_engine(
+        settings.async_url,
+        connect_args=connect_args,
+        **pool_options(settings, name, InstrumentedAsyncAdaptedQueuePool),
+    )
+    instrument_queries(engine.sync_engine, name)
+    instrument_engine(engine.sync_engine, name)
+    return engine
 
-Base = declarative_base()
+instrument_orm(Base)
+
+class Database:
+    # Engines and session factories for one DatabaseSettings. Building them opens no connections;
+    # the pools connect on first use, or up front through prewarm().
+    def __init__(self, settings: DatabaseSettings):
+        self.settings = settings
+        self.engine = create_db_engine(settings)
+        self.sessions = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_engine = create_async_db_engine(settings)
+        # Objects are serialized after commit in async routes, where an implicit refresh cannot run.
+        self.async_sessions = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+
+        # Read sessions send plain SELECTs to DATABASE_REPLICA_URL when one is configured and healthy,
+        # and behave exactly like the sessions above when it is not.
+        replica_settings = settings.replica()
+        self.replica_engine = self.async_replica_engine = replica_monitor = async_replica_monitor = None
+        if replica_settings is not None:
+            self.replica_engine = create_db_engine(replica_settings, "replica", settings.replica_connect_timeout)
+            self.async_replica_engine = create_async_db_engine(
+                replica_settings, "replica_async", settings.replica_connect_timeout
+            )
+            replica_monitor = ReplicaMonitor(
+                self.replica_engine, "replica", settings.replica_max_lag_seconds, settings.replica_check_seconds
+            )
+            async_replica_monitor = ReplicaMonitor(
+                self.async_replica_engine.sync_engine, "replica_async",
+                settings.replica_max_lag_seconds, settings.replica_check_seconds,
+            )
+
+        self.read_sessions = sessionmaker(
+            class_=RoutingSession, autocommit=False, autoflush=False,
+            primary=self.engine, replica=self.replica_engine, monitor=replica_monitor,
+        )
+        self.async_read_sessions = async_sessionmaker(
+            sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False,
+            primary=self.async_engine.sync_engine,
+            replica=self.async_replica_engine.sync_engine if self.async_replica_engine is not None else None,
+            monitor=async_replica_monitor,
+        )
+
+    async def prewarm(self, connections: int, statements=()) -> int:
+        # Opens the connections concurrently and runs every statement on each, so the first requests find
+        # established connections, compiled SQL and asyncpg's per-connection prepared statements.
+        # Without a pool of our own (PgBouncer mode) connections are not kept, so one is enough to compile.
+        count = 1 if self.settings.pool_mode == "external" else min(connections, self.settings.pool_size)
+        opened = [self.async_engine.connect() for _ in range(count)]
+        try:
+            await asyncio.gather(*(connection.start() for connection in opened))
+            await asyncio.gather(*(run_statements(connection, statements) for connection in opened))
+        finally:
+            await asyncio.gather(*(connection.close() for connection in opened))
+        return count
+
+    async def dispose(self):
+        self.engine.dispose()
+        await self.async_engine.dispose()
+        if self.replica_engine is not None:
+            self.replica_engine.dispose()
+            await self.async_replica_engine.dispose()
+
+async def run_statements(connection, statements):
+    # Through a session, so ORM statements hit the same compiled-cache entries as in the routes.
+    async with AsyncSession(bind=connection) as db:
+        for statement in statements:
+            await db.execute(statement)
+        await db.rollback()
+
+_settings = None
+_database = None
+_lock = threading.Lock()
+
+def get_settings() -> DatabaseSettings:
+    global _settings
+    if _settings is None:
+        _settings = load_settings()
+    return _settings
+
+def get_database() -> Database:
+    global _database
+    if _database is None:
+        with _lock:
+            if _database is None:
+                _database = Database(get_settings())
+    return _database
+
+def set_database(database: Database | None):
+    global _database
+    _database = database
+    return database
+
+# Names the rest of the code imports from here. They resolve on first access, so importing this
+# module neither reads DATABASE_URL nor creates engines.
+LAZY_ATTRIBUTES = {
+    "engine": "engine",
+    "SessionLocal": "sessions",
+    "async_engine": "async_engine",
+    "AsyncSessionLocal": "async_sessions",
+    "ReadSessionLocal": "read_sessions",
+    "AsyncReadSessionLocal": "async_read_sessions",
+}
+
+def __getattr__(name: str):
+    if name == "settings":
+        return get_settings()
+    if name == "SQLALCHEMY_DATABASE_URL":
+        return get_settings().url
+    if name == "ASYNC_DATABASE_URL":
+        return get_settings().async_url
+    if name in LAZY_ATTRIBUTES:
+        return getattr(get_database(), LAZY_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_db():
-    db = SessionLocal()
+    db = get_database().sessions()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with get_database().async_sessions() as db:
+        yield db
+
+def get_read_db():
+    db = get_database().read_sessions()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_read_db():
+    async with get_database().async_read_sessions() as db:
+        yield db
+
+async def dispose_engines():
+    if _database is not None:
+        await _database.dispose()
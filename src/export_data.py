@@ -0,0 +1,36 @@
+import argparse
+import sys
+from datetime import datetime
+from database import SessionLocal
+import exports
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream users, enrollments, submissions or grades to CSV / NDJSON.")
+    parser.add_argument("dataset", choices=list(exports.EXPORTS))
+    parser.add_argument("--format", choices=list(exports.EXPORT_FORMATS), default="csv")
+    parser.add_argument("--course-id", type=int)
+    parser.add_argument("--since", type=datetime.fromisoformat, help="inclusive, ISO 8601")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="exclusive, ISO 8601")
+    parser.add_argument("--status")
+    parser.add_argument("--output", help="file path, defaults to stdout")
+    args = parser.parse_args(argv)
+
+    filters = {"course_id": args.course_id, "since": args.since, "until": args.until, "status": args.status}
+    try:
+        exports.export_statement(args.dataset, **filters)
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    db = SessionLocal()
+    try:
+        for chunk in exports.stream_export(db, args.dataset, args.format, **filters):
+            out.write(chunk)
+    finally:
+        db.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
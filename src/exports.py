@@ -0,0 +1,127 @@
+import csv
+import enum
+import io
+import json
+import os
+from datetime import datetime
+from sqlalchemy import select, exists
+from models import User, Enrollment, EnrollmentStatus, Assignment, Submission, SubmissionContent
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+SUBMISSION_STATUSES = ("graded", "ungraded")
+USER_STATUSES = ("active", "inactive")
+
+def users_statement(course_id=None, since=None, until=None, status=None):
+    stmt = select(User.id, User.full_name, User.email, User.role, User.is_active, User.created_at).order_by(User.id)
+    if course_id is not None:
+        stmt = stmt.where(exists().where(Enrollment.user_id == User.id, Enrollment.course_id == course_id))
+    if status is not None:
+        if status not in USER_STATUSES:
+            raise ValueError(f"Invalid status for users. Use: {', '.join(USER_STATUSES)}")
+        stmt = stmt.where(User.is_active.is_(status == "active"))
+    return date_range(stmt, User.created_at, since, until)
+
+def enrollments_statement(course_id=None, since=None, until=None, status=None):
+    stmt = select(Enrollment.id, Enrollment.user_id, Enrollment.course_id, Enrollment.status, Enrollment.enrolled_at)\
+        .order_by(Enrollment.id)
+    if course_id is not None:
+        stmt = stmt.where(Enrollment.course_id == course_id)
+    if status is not None:
+        try:
+            stmt = stmt.where(Enrollment.status == EnrollmentStatus(status))
+        except ValueError:
+            raise ValueError(f"Invalid status for enrollments. Use: {', '.join(s.value for s in EnrollmentStatus)}")
+    return date_range(stmt, Enrollment.enrolled_at, since, until)
+
+def submissions_statement(course_id=None, since=None, until=None, status=None):
+    stmt = select(
+        Submission.id, Submission.assignment_id, Assignment.course_id, Submission.student_id,
+        Submission.score, Submission.submitted_at, SubmissionContent.content,
+    ).join(Assignment, Assignment.id == Submission.assignment_id)\
+        .outerjoin(Submission.body)\
+        .order_by(Submission.id)
+    if course_id is not None:
+        stmt = stmt.where(Assignment.course_id == course_id)
+    if status is not None:
+        if status not in SUBMISSION_STATUSES:
+            raise ValueError(f"Invalid status for submissions. Use: {', '.join(SUBMISSION_STATUSES)}")
+        stmt = stmt.where(Submission.score.isnot(None) if status == "graded" else Submission.score.is_(None))
+    return date_range(stmt, Submission.submitted_at, since, until)
+
+def grades_statement(course_id=None, since=None, until=None, status=None):
+    if status is not None:
+        raise ValueError("Grades cannot be filtered by status")
+    stmt = select(
+        Submission.id.label("submission_id"), Submission.student_id, User.email.label("student_email"),
+        Assignment.course_id, Submission.assignment_id, Assignment.title.label("assignment_title"),
+        Submission.score, Assignment.max_score, Submission.submitted_at,
+    ).join(Assignment, Assignment.id == Submission.assignment_id)\
+        .join(User, User.id == Submission.student_id)\
+        .where(Submission.score.isnot(None))\
+        .order_by(Submission.id)
+    if course_id is not None:
+        stmt = stmt.where(Assignment.course_id == course_id)
+    return date_range(stmt, Submission.submitted_at, since, until)
+
+def date_range(stmt, column, since: datetime | None, until: datetime | None):
+    if since is not None:
+        stmt = stmt.where(column >= since)
+    if until is not None:
+        stmt = stmt.where(column < until)
+    return stmt
+
+EXPORTS = {
+    "users": users_statement,
+    "enrollments": enrollments_statement,
+    "submissions": submissions_statement,
+    "grades": grades_statement,
+}
+
+def export_statement(dataset: str, course_id=None, since=None, until=None, status=None):
+    if dataset not in EXPORTS:
+        raise ValueError(f"Unknown export '{dataset}'. Use: {', '.join(EXPORTS)}")
+    # yield_per makes the driver use a server-side cursor and fetch in batches instead of buffering the result.
+    return EXPORTS[dataset](course_id, since, until, status).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+def check_format(fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Use: {', '.join(EXPORT_FORMATS)}")
+
+def plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def encode_batch(fmt: str, columns, rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(columns)
+        writer.writerows([plain(value) for value in row] for row in rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps({column: plain(value) for column, value in zip(columns, row)}))
+            buffer.write("\n")
+    return buffer.getvalue()
+
+def stream_export(db, dataset: str, fmt: str = "csv", **filters):
+    check_format(fmt)
+    result = db.execute(export_statement(dataset, **filters))
+    columns = list(result.keys())
+    if fmt == "csv":
+        yield encode_batch(fmt, columns, [], header=True)
+    for rows in result.partitions():
+        yield encode_batch(fmt, columns, rows)
+
+async def stream_export_async(db, dataset: str, fmt: str = "csv", **filters):
+    check_format(fmt)
+    result = await db.stream(export_statement(dataset, **filters))
+    columns = list(result.keys())
+    if fmt == "csv":
+        yield encode_batch(fmt, columns, [], header=True)
+    async for rows in result.partitions():
+        yield encode_batch(fmt, columns, rows)
@@ -0,0 +1,57 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from sqlalchemy import select, func, cast, BigInteger
+from models import TableVersion
+
+def cache_control(route: str, default: str) -> str:
+    return os.getenv(f"CACHE_CONTROL_{route.upper()}", default)
+
+def versions_statement(tables: tuple[str, ...]):
+    return select(TableVersion.table_name,
+                  cast(func.sum(TableVersion.version), BigInteger),
+                  func.max(TableVersion.updated_at))\
+        .where(TableVersion.table_name.in_(tables))\
+        .group_by(TableVersion.table_name)
+
+@dataclass(frozen=True)
+class Validators:
+    etag: str
+    last_modified: datetime | None
+
+    def headers(self, cache_control: str | None = None) -> dict:
+        headers = {"ETag": self.etag}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified.replace(microsecond=0), usegmt=True)
+        if cache_control:
+            headers["Cache-Control"] = cache_control
+        return headers
+
+    def matches(self, if_none_match: str | None, if_modified_since: str | None = None) -> bool:
+        if if_none_match is not None:
+            # Weak comparison (RFC 9110 13.1.2): the W/ prefix is ignored on both sides.
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag.removeprefix("W/") in tags
+        if if_modified_since is not None and self.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return since.tzinfo is not None and self.last_modified.replace(microsecond=0) <= since
+        return False
+
+def build_validators(tables: tuple[str, ...], rows, *parts) -> Validators:
+    # A table that has never been written has no row yet; it counts as version 0.
+    versions = {name: (version, updated_at) for name, version, updated_at in rows}
+    digest = hashlib.sha1()
+    for name in sorted(tables):
+        digest.update(f"{name}={versions.get(name, (0,))[0]};".encode())
+    for part in parts:
+        digest.update(f"{part};".encode())
+    stamps = [updated_at for _, updated_at in versions.values()]
+    return Validators(f'W/"{digest.hexdigest()[:20]}"', max(stamps) if stamps else None)
+
+async def get_async_validators(db, tables: tuple[str, ...], *parts) -> Validators:
+    return build_validators(tables, (await db.execute(versions_statement(tables))).all(), *parts)
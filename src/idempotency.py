@@ -0,0 +1,51 @@
+import hashlib
+import json
+import os
+from datetime import timedelta
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from models import IdempotencyKey
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+def fingerprint(payload) -> str:
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def claim_statement(scope: str, key: str, digest: str):
+    return insert(IdempotencyKey)\
+        .values(scope=scope, key=key, fingerprint=digest)\
+        .on_conflict_do_nothing()\
+        .returning(IdempotencyKey.key)
+
+def previous_statement(scope: str, key: str):
+    return select(IdempotencyKey.fingerprint, IdempotencyKey.resource_id)\
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+
+# The claim row is written in the caller's transaction. A concurrent request with the same key blocks on
+# the primary key until that transaction ends, then either sees the committed row or claims the key itself,
+# so a half-finished request is never visible.
+def claim(db: Session, scope: str, key: str, digest: str) -> int | None:
+    while db.scalar(claim_statement(scope, key, digest)) is None:
+        previous = db.execute(previous_statement(scope, key)).first()
+        if previous is None:
+            continue  # purged between the conflict and the read
+        if previous.fingerprint != digest:
+            raise ValueError("Idempotency-Key was already used with a different request")
+        return previous.resource_id
+    return None
+
+def record(db: Session, scope: str, key: str, resource_id: int):
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        .values(resource_id=resource_id)
+    )
+
+def purge(db: Session, ttl: int = IDEMPOTENCY_TTL_SECONDS) -> int:
+    result = db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.created_at < func.now() - timedelta(seconds=ttl))
+    )
+    db.commit()
+    return result.rowcount
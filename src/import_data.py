@@ -0,0 +1,142 @@
+import argparse
+import codecs
+import csv
+import json
+import os
+import re
+import sys
+import services
+
+# A JSON array element that has not been closed within this many characters is treated as malformed,
+# so a broken body fails its row instead of being buffered whole.
+MAX_ROW_CHARS = int(os.getenv("IMPORT_MAX_ROW_CHARS", str(64 * 1024)))
+
+def parse_line(line: str):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return services.InvalidRow(f"Invalid JSON: {e.msg}")
+
+def read_rows(path: str):
+    # Rows are yielded one at a time so arbitrarily large files are imported in constant memory.
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if extension in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield parse_line(line)
+        else:
+            yield from csv.DictReader(f)
+
+def row_field(row, name: str):
+    if isinstance(row, services.InvalidRow):
+        return row
+    if not isinstance(row, dict):
+        return services.InvalidRow("Row must be an object")
+    return row.get(name)
+
+class JsonRowParser:
+    # Parses a JSON array of rows, or newline-delimited JSON, from body chunks as they arrive.
+    # feed() returns the rows completed so far; malformed rows come back as InvalidRow.
+    WHITESPACE = re.compile(r"[ \t\r\n]*")
+    SEPARATORS = re.compile(r"[ \t\r\n,]*")
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.buffer = ""
+        self.pos = 0
+        self.array = None
+        self.done = False
+
+    def feed(self, data: bytes, final: bool = False) -> list:
+        self.buffer = self.buffer[self.pos:] + self.text.decode(data, final)
+        self.pos = 0
+        rows = []
+        while not self.done:
+            row = self.next_row(final)
+            if row is None:
+                break
+            rows.append(row)
+        return rows
+
+    def close(self) -> list:
+        return self.feed(b"", final=True)
+
+    def next_row(self, final: bool):
+        self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+        if self.array is None:
+            if self.pos == len(self.buffer):
+                self.done = final
+                return None
+            self.array = self.buffer[self.pos] == "["
+            self.pos += self.array
+        return self.next_array_row(final) if self.array else self.next_line(final)
+
+    def next_line(self, final: bool):
+        if self.pos == len(self.buffer):
+            self.done = final
+            return None
+        end = self.buffer.find("\n", self.pos)
+        if end == -1:
+            if not final:
+                return None
+            end = len(self.buffer)
+        line, self.pos = self.buffer[self.pos:end], end
+        return parse_line(line)
+
+    def next_array_row(self, final: bool):
+        self.pos = self.SEPARATORS.match(self.buffer, self.pos).end()
+        if self.buffer.startswith("]", self.pos):
+            self.done = True
+            return None
+        try:
+            row, end = self.decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError as e:
+            if final or len(self.buffer) - self.pos > MAX_ROW_CHARS:
+                # Nothing after a malformed element can be located reliably, so parsing stops here.
+                self.done = True
+                return services.InvalidRow(f"Invalid JSON: {e.msg}")
+            return None
+        if end == len(self.buffer) and not final:
+            # A number or literal at the very end may still continue in the next chunk.
+            return None
+        self.pos = end
+        return row
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import users or enrollments from CSV / JSONL files.")
+    subparsers = parser.add_subparsers(dest="entity", required=True)
+
+    users = subparsers.add_parser("users", help="columns: full_name, email, role")
+    users.add_argument("path")
+
+    enrollments = subparsers.add_parser("enrollments", help="column: student_id")
+    enrollments.add_argument("path")
+    enrollments.add_argument("--course-id", type=int, required=True)
+
+    parser.add_argument("--chunk-size", type=int, default=services.BULK_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.entity == "users":
+            result = services.bulk_create_users(db, read_rows(args.path), args.chunk_size)
+        else:
+            student_ids = (row_field(row, "student_id") for row in read_rows(args.path))
+            result = services.bulk_enroll_students(db, args.course_id, student_ids, args.chunk_size)
+            if result is None:
+                print(f"Course {args.course_id} not found.", file=sys.stderr)
+                return 1
+    finally:
+        db.close()
+
+    for error in result["errors"]:
+        print(json.dumps(error), file=sys.stderr)
+    print(f"Imported {result['created']} {args.entity}, rejected {len(result['errors'])}.")
+    return 0 if not result["errors"] else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
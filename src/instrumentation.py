@@ -0,0 +1,191 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import event
+import metrics
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+SLOWEST_STATEMENTS = 5
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+logger = logging.getLogger("lms.requests")
+slow_logger = logging.getLogger("lms.slow_queries")
+
+def configure_logging(level: str = os.getenv("LOG_LEVEL", "INFO")):
+    # Log records are already JSON documents, so the handler writes the bare message, one per line.
+    root = logging.getLogger("lms")
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        root.addHandler(handler)
+    root.setLevel(level)
+
+@dataclass
+class RequestStats:
+    started: float = field(default_factory=time.perf_counter)
+    query_count: int = 0
+    db_seconds: float = 0.0
+    rows_loaded: int = 0
+    slowest: list = field(default_factory=list)
+
+    def observe(self, seconds: float, statement: str):
+        self.query_count += 1
+        self.db_seconds += seconds
+        entry = (seconds, self.query_count, statement)
+        if len(self.slowest) < SLOWEST_STATEMENTS:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def slowest_statements(self) -> list[dict]:
+        return [
+            {"ms": round(seconds * 1000, 2), "statement": " ".join(statement.split())[:300]}
+            for seconds, _, statement in sorted(self.slowest, reverse=True)
+        ]
+
+    def server_timing(self, total_seconds: float) -> str:
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.query_count} queries", '
+            f"app;dur={(total_seconds - self.db_seconds) * 1000:.1f}, "
+            f"total;dur={total_seconds * 1000:.1f}"
+        )
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+class QueryTotals:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = {}
+        self.seconds = {}
+        self.slow = {}
+        self.rows_loaded = 0
+        self.requests = {}
+        self.request_seconds = {}
+
+    def add(self, counter: str, key, amount=1):
+        with self.lock:
+            values = getattr(self, counter)
+            values[key] = values.get(key, 0) + amount
+
+    def add_rows(self, amount: int = 1):
+        with self.lock:
+            self.rows_loaded += amount
+
+totals = QueryTotals()
+
+def explain(connection, statement: str, parameters):
+    if not SLOW_QUERY_EXPLAIN or not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    # Plain EXPLAIN only plans the statement, so it is safe for writes. It runs on the same
+    # DBAPI connection so it sees the same transaction and session settings, inside a savepoint
+    # so that a failing EXPLAIN does not abort the caller's transaction.
+    dbapi_connection = connection.connection.dbapi_connection
+    savepoint = not getattr(dbapi_connection, "autocommit", False)
+    cursor = dbapi_connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute("EXPLAIN " + statement, parameters)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        except Exception as e:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return f"EXPLAIN failed: {e}"
+        finally:
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        cursor.close()
+
+def instrument_queries(engine, name: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_start"].pop()
+        totals.add("queries", name)
+        totals.add("seconds", name, seconds)
+
+        stats = current_request.get()
+        if stats is not None:
+            stats.observe(seconds, statement)
+
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            totals.add("slow", name)
+            slow_logger.warning(json.dumps({
+                "event": "slow_query",
+                "engine": name,
+                "ms": round(seconds * 1000, 2),
+                "statement": statement,
+                "plan": None if executemany else explain(conn, statement, parameters),
+            }))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+    return engine
+
+def count_loaded(target, context):
+    totals.add_rows()
+    stats = current_request.get()
+    if stats is not None:
+        stats.rows_loaded += 1
+
+def instrument_orm(base):
+    event.listen(base, "load", count_loaded, propagate=True)
+
+def start_request() -> RequestStats:
+    stats = RequestStats()
+    current_request.set(stats)
+    return stats
+
+def finish_request(stats: RequestStats, method: str, route: str, status: int) -> float:
+    total = time.perf_counter() - stats.started
+    totals.add("requests", (method, route, status))
+    totals.add("request_seconds", (method, route), total)
+    logger.info(json.dumps({
+        "event": "request",
+        "method": method,
+        "route": route,
+        "status": status,
+        "ms": round(total * 1000, 2),
+        "db_ms": round(stats.db_seconds * 1000, 2),
+        "queries": stats.query_count,
+        "rows_loaded": stats.rows_loaded,
+        "slowest": stats.slowest_statements(),
+    }))
+    return total
+
+@metrics.register
+def collect_query_metrics():
+    queries = metrics.Metric("lms_db_queries_total", "counter", "SQL statements executed.")
+    seconds = metrics.Metric("lms_db_query_seconds_total", "counter", "Time spent executing SQL statements.")
+    slow = metrics.Metric("lms_db_slow_queries_total", "counter", "Statements slower than SLOW_QUERY_MS.")
+    rows = metrics.Metric("lms_orm_rows_loaded_total", "counter", "ORM instances hydrated from result rows.")
+    requests = metrics.Metric("lms_http_requests_total", "counter", "HTTP requests handled.")
+    request_seconds = metrics.Metric("lms_http_request_seconds_total", "counter", "Time spent handling HTTP requests.")
+    with totals.lock:
+        for name in sorted(totals.queries):
+            queries.add(totals.queries[name], engine=name)
+            seconds.add(round(totals.seconds[name], 6), engine=name)
+            slow.add(totals.slow.get(name, 0), engine=name)
+        rows.add(totals.rows_loaded)
+        for (method, route, status), count in sorted(totals.requests.items()):
+            requests.add(count, method=method, route=route, status=status)
+        for (method, route), total in sorted(totals.request_seconds.items()):
+            request_seconds.add(round(total, 6), method=method, route=route)
+    return [queries, seconds, slow, rows, requests, request_seconds]
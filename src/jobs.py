@@ -0,0 +1,296 @@
+import enum
+import inspect
+import os
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from sqlalchemy import select, update, func
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from models import Job, JobStatus, UserRole
+import services
+import analytics
+import gradebook
+import idempotency
+import partitions
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = int(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_RETRY_MAX_SECONDS = int(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+# A worker refreshes locked_at of the job it runs every JOB_HEARTBEAT_SECONDS. A running job whose
+# heartbeat has been missing for JOB_STALE_SECONDS is assumed lost with its worker and requeued.
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "120"))
+
+class JobError(Exception):
+    pass
+
+HANDLERS = {}
+
+def handler(kind: str):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+def jsonable(value):
+    if isinstance(value, Row):
+        return jsonable(dict(value._mapping))
+    if isinstance(value, dict):
+        return {key: jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(item) for item in value]
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+def backoff(attempts: int) -> int:
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_SECONDS)
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# What POST /jobs may enqueue. Maintenance handlers (partition archiving, analytics rebuilds, purges) are
+# for the CLI and scheduled workers only.
+API_JOB_KINDS = frozenset({
+    "create_course_with_modules",
+    "create_user",
+    "bulk_create_users",
+    "bulk_enroll_students",
+    "bulk_grade_submissions",
+    "student_performance_report",
+    "instructor_revenue_report",
+})
+
+def check_api_job(kind: str, payload: dict):
+    if kind not in API_JOB_KINDS:
+        raise ValueError(f"Job kind '{kind}' cannot be enqueued through the API. Use: {', '.join(sorted(API_JOB_KINDS))}")
+    # Same floor as the analytics routes, so a queued report cannot force a rebuild either.
+    max_staleness = payload.get("max_staleness", analytics.MIN_STALENESS)
+    if not isinstance(max_staleness, int) or max_staleness < analytics.MIN_STALENESS:
+        raise ValueError(f"max_staleness must be an integer of at least {analytics.MIN_STALENESS}")
+
+def enqueue(db: Session, kind: str, payload: dict | None = None, max_attempts: int | None = None, delay: int = 0):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'. Use: {', '.join(sorted(HANDLERS))}")
+    try:
+        inspect.signature(HANDLERS[kind]).bind(db, **(payload or {}))
+    except TypeError as e:
+        raise ValueError(f"Invalid payload for '{kind}': {e}")
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        status=JobStatus.QUEUED,
+        max_attempts=max_attempts or JOB_MAX_ATTEMPTS,
+        run_at=func.now() + timedelta(seconds=delay),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def get_job(db: Session, job_id: int):
+    return db.get(Job, job_id)
+
+def claim_statement(worker: str, limit: int = 1):
+    # SKIP LOCKED lets any number of workers poll the same table without blocking on each other's rows.
+    runnable = select(Job.id)\
+        .where(Job.status == JobStatus.QUEUED, Job.run_at <= func.now())\
+        .order_by(Job.run_at, Job.id)\
+        .limit(limit)\
+        .with_for_update(skip_locked=True)
+    return update(Job)\
+        .where(Job.id.in_(runnable.scalar_subquery()))\
+        .values(status=JobStatus.RUNNING, locked_at=func.now(), locked_by=worker, attempts=Job.attempts + 1)\
+        .returning(Job.id)
+
+def claim(db: Session, worker: str, limit: int = 1) -> list[int]:
+    # The claim commits straight away so no row lock is held while the job itself runs.
+    job_ids = sorted(db.scalars(claim_statement(worker, limit)).all())
+    db.commit()
+    return job_ids
+
+def backoff_interval(attempts):
+    # backoff() as SQL, for updates that reschedule many jobs at once.
+    seconds = func.least(JOB_RETRY_BASE_SECONDS * func.power(2, func.greatest(attempts - 1, 0)), JOB_RETRY_MAX_SECONDS)
+    return func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+
+def requeue_stale(db: Session, stale_seconds: int = JOB_STALE_SECONDS) -> int:
+    # A lost worker counts as a failed attempt: the job is retried with backoff, or failed once its attempts
+    # are used up, so a job that keeps killing its worker is not picked up forever.
+    stale = (Job.status == JobStatus.RUNNING, Job.locked_at < func.now() - timedelta(seconds=stale_seconds))
+    failed = db.execute(
+        update(Job)
+        .where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status=JobStatus.FAILED, locked_at=None, locked_by=None, finished_at=func.now(),
+                last_error="Worker lost; attempts exhausted")
+    )
+    requeued = db.execute(
+        update(Job)
+        .where(*stale)
+        .values(status=JobStatus.QUEUED, locked_at=None, locked_by=None, last_error="Worker lost; requeued",
+                run_at=func.now() + backoff_interval(Job.attempts))
+    )
+    db.commit()
+    return failed.rowcount + requeued.rowcount
+
+def touch(db: Session, job_id: int, worker: str) -> bool:
+    result = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.RUNNING, Job.locked_by == worker)
+        .values(locked_at=func.now())
+    )
+    db.commit()
+    return result.rowcount == 1
+
+@contextmanager
+def heartbeat(job_id: int, worker: str, session_factory, interval: float | None = None):
+    # Beats from its own thread and session, so a long handler or an open transaction in it cannot delay them.
+    interval = interval or JOB_HEARTBEAT_SECONDS
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(interval):
+            db = session_factory()
+            try:
+                touch(db, job_id, worker)
+            except SQLAlchemyError as e:
+                print(f"Heartbeat for job {job_id} failed: {e}")
+            finally:
+                db.close()
+
+    thread = threading.Thread(target=beat, name=f"job-{job_id}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+def finish(db: Session, job_id: int, worker: str, **values) -> bool:
+    # Only while the worker still owns the job: once requeue_stale has handed it to another worker,
+    # a late finish must not overwrite the new owner's state.
+    result = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.RUNNING, Job.locked_by == worker)
+        .values(locked_at=None, locked_by=None, **values)
+    )
+    db.commit()
+    if result.rowcount == 0:
+        print(f"Job {job_id} is no longer owned by {worker}; its outcome was discarded.")
+    return result.rowcount == 1
+
+def run_job(job_id: int, session_factory=None):
+    if session_factory is None:
+        from database import SessionLocal
+        session_factory = SessionLocal
+
+    db = session_factory()
+    try:
+        job = db.get(Job, job_id)
+        if job is None:
+            return False
+        kind, payload, attempts, max_attempts = job.kind, dict(job.payload), job.attempts, job.max_attempts
+        worker = job.locked_by
+        db.commit()
+        try:
+            if kind not in HANDLERS:
+                raise JobError(f"No handler for job kind '{kind}'")
+            with heartbeat(job_id, worker, session_factory):
+                result = jsonable(HANDLERS[kind](db, **payload))
+        except Exception as e:
+            db.rollback()
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            if attempts < max_attempts:
+                delay = backoff(attempts)
+                print(f"Job {job_id} ({kind}) failed on attempt {attempts}, retrying in {delay}s: {error}")
+                finish(db, job_id, worker, status=JobStatus.QUEUED, last_error=error,
+                       run_at=func.now() + timedelta(seconds=delay))
+            else:
+                print(f"Job {job_id} ({kind}) failed permanently after {attempts} attempts: {error}")
+                finish(db, job_id, worker, status=JobStatus.FAILED, last_error=error, finished_at=func.now())
+            return False
+
+        finish(db, job_id, worker, status=JobStatus.SUCCEEDED, result=result, finished_at=func.now())
+        print(f"Job {job_id} ({kind}) succeeded.")
+        return True
+    finally:
+        db.close()
+
+def run_pending(db: Session, limit: int = 100, session_factory=None) -> int:
+    ran = 0
+    for job_id in claim(db, worker_name(), limit):
+        run_job(job_id, session_factory)
+        ran += 1
+    return ran
+
+@handler("create_course_with_modules")
+def create_course_job(db: Session, instructor_id: int, title: str, price: int, module_titles: list[str] = ()):
+    course = services.create_course_with_modules(db, instructor_id, title, price, list(module_titles))
+    if course is None:
+        raise JobError("Course could not be created")
+    return {"course_id": course.id}
+
+@handler("create_user")
+def create_user_job(db: Session, full_name: str, email: str, role: str = "student"):
+    return {"user_id": services.create_user(db, full_name, email, UserRole(role)).id}
+
+@handler("bulk_create_users")
+def bulk_create_users_job(db: Session, users: list[dict]):
+    return services.bulk_create_users(db, users)
+
+@handler("bulk_enroll_students")
+def bulk_enroll_students_job(db: Session, course_id: int, student_ids: list):
+    result = services.bulk_enroll_students(db, course_id, student_ids)
+    if result is None:
+        raise JobError(f"Course {course_id} not found")
+    return result
+
+@handler("bulk_grade_submissions")
+def bulk_grade_submissions_job(db: Session, assignment_id: int, grades: list):
+    result = services.bulk_grade_submissions(db, assignment_id, grades)
+    if result is None:
+        raise JobError(f"Assignment {assignment_id} not found")
+    return result
+
+@handler("purge_idempotency_keys")
+def purge_idempotency_keys_job(db: Session, ttl: int = idempotency.IDEMPOTENCY_TTL_SECONDS):
+    return {"purged": idempotency.purge(db, ttl)}
+
+@handler("maintain_submission_partitions")
+def maintain_submission_partitions_job(db: Session, months_ahead: int = partitions.PARTITION_MONTHS_AHEAD):
+    return {"created": partitions.ensure_partitions(db, months_ahead)}
+
+@handler("archive_submission_partitions")
+def archive_submission_partitions_job(db: Session, keep_months: int = partitions.ARCHIVE_AFTER_MONTHS, drop: bool = False):
+    return {"archived": partitions.archive_partitions(db, partitions.retention_start(keep_months), drop)}
+
+@handler("refresh_analytics")
+def refresh_analytics_job(db: Session):
+    analytics.refresh_all(db)
+    return {"refreshed": True}
+
+@handler("student_performance_report")
+def student_performance_job(db: Session, max_staleness: int = analytics.DEFAULT_MAX_STALENESS):
+    rows, refreshed_at = analytics.get_student_performance(db, max_staleness)
+    return {"refreshed_at": refreshed_at, "items": rows}
+
+@handler("instructor_revenue_report")
+def instructor_revenue_job(db: Session, max_staleness: int = analytics.DEFAULT_MAX_STALENESS):
+    rows, refreshed_at = analytics.get_instructor_revenue(db, max_staleness)
+    return {"refreshed_at": refreshed_at, "items": rows}
+
+@handler("course_gradebook")
+def course_gradebook_job(db: Session, course_id: int):
+    result = gradebook.get_course_gradebook(db, course_id)
+    if result is None:
+        raise JobError(f"Course {course_id} not found")
+    return result
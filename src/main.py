@@ -1,3 +1,4 @@
+from sqlalchemy import select
 from database import engine, Base, get_db
 from models import UserRole, User, Course
 from models.lms import Enrollment, Assignment, Submission 
@@ -31,7 +32,7 @@ def main():
         student = services.create_user(db, "Oleg Student", "oleg@student.com", UserRole.STUDENT)
         print(f"Created Student: {student.full_name}")
 
-    if not student.enrollments:
+    if not db.scalar(select(Enrollment.id).where(Enrollment.user_id == student.id).limit(1)):
         services.enroll_student(db, student.id, course.id)
         
         assignment = services.create_assignment(db, course.id, "Final Project", 100)
@@ -1,44 +1,280 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request, Response, Query, Header
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from datetime import datetime
+import json
+import logging
 import os
+import time
 
-from database import get_db
+from config import DatabaseSettings
+from database import Database, get_database, get_settings, set_database, get_async_db, get_async_read_db, dispose_engines
+import admission
+import async_services
 import services
 import schemas
-from models import UserRole
+import metrics
+import pooling
+import analytics
+import http_cache
+import exports
+import import_data
+import contents
+import gradebook
+import dashboard
+import jobs
+import instrumentation
+from responses import FastJSONResponse, records
+from models import UserRole, Job
 
-app = FastAPI(title="LMS API System")
+logger = logging.getLogger("lms.startup")
 
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
 
-base_dir = os.path.dirname(os.path.abspath(__file__))
-templates = Jinja2Templates(directory=os.path.join(base_dir, "templates"))
+router = APIRouter()
 
-@app.get("/", response_class=HTMLResponse)
-def read_root(request: Request, db: Session = Depends(get_db)):
-    courses = services.get_courses_by_price_range(db, 0, 100000)
-    return templates.TemplateResponse(request=request, name="index.html", context={"courses": courses})
+# The statements behind the busiest routes, run on every pre-warmed connection. Parameters do not
+# matter: the compiled SQL and asyncpg's prepared statements are keyed on the statement shape.
+def warmup_statements():
+    return [
+        http_cache.versions_statement(("courses",)),
+        async_services.async_course_repo.catalog_page_statement(
+            0, 100000, services.CATALOG_DEFAULT_PAGE_SIZE, columns=COURSE_FIELDS
+        ),
+        async_services.async_course_repo.by_id_statement("with_modules_and_assignments").params(id=0),
+        async_services.async_user_repo.by_id_statement().params(id=0),
+        async_services.async_user_repo.by_email_statement().params(email=""),
+        dashboard.dashboard_statement(0),
+    ]
 
-@app.get("/courses/", response_model=List[schemas.CourseResponse])
-def get_courses(min_price: int = 0, max_price: int = 100000, db: Session = Depends(get_db)):
-    return services.get_courses_by_price_range(db, min_price, max_price)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database = get_database()
+    if database.settings.prewarm_connections:
+        started = time.perf_counter()
+        count = await database.prewarm(database.settings.prewarm_connections, warmup_statements())
+        app.state.templates.get_template("index.html")
+        logger.info(json.dumps({
+            "event": "prewarm",
+            "connections": count,
+            "ms": round((time.perf_counter() - started) * 1000, 2),
+        }))
+    yield
+    await dispose_engines()
 
-@app.post("/courses/", response_model=schemas.CourseResponse, status_code=status.HTTP_201_CREATED)
-def create_course(course: schemas.CourseCreate, db: Session = Depends(get_db)):
-    instructor_id = 1 
-    return services.create_course_with_modules(
-        db, 
-        instructor_id, 
-        course.title, 
-        course.price, 
-        []
+def create_app(settings: DatabaseSettings | None = None) -> FastAPI:
+    # Everything with a cost (settings, engines, templates, logging) is set up here or in the lifespan,
+    # not at import. Run with `uvicorn --factory main_api:create_app`; main_api:app still works.
+    if settings is not None:
+        set_database(Database(settings))
+    instrumentation.configure_logging()
+    app = FastAPI(title="LMS API System", lifespan=lifespan)
+    app.state.templates = Jinja2Templates(directory=TEMPLATES_DIR)
+    app.middleware("http")(instrument_requests)
+    # Outermost, so a shed request is answered before any other work is done for it.
+    admission.set_controller(admission.AdmissionController.from_env(settings or get_settings()))
+    app.add_middleware(admission.AdmissionMiddleware, routes=router.routes)
+    app.include_router(router)
+    return app
+
+_app = None
+
+def __getattr__(name: str):
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+async def instrument_requests(request: Request, call_next):
+    stats = instrumentation.start_request()
+    try:
+        response = await call_next(request)
+    except Exception:
+        instrumentation.finish_request(stats, request.method, route_path(request), 500)
+        raise
+    total = instrumentation.finish_request(stats, request.method, route_path(request), response.status_code)
+    response.headers["Server-Timing"] = stats.server_timing(total)
+    return response
+
+def route_path(request: Request) -> str:
+    # The route template, not the raw path, keeps metric label cardinality bounded.
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+# Cache-Control per route; each can be overridden with CACHE_CONTROL_<ROUTE>.
+CACHE_POLICIES = {
+    "home": http_cache.cache_control("home", "public, max-age=30"),
+    "catalog": http_cache.cache_control("catalog", "public, max-age=30, stale-while-revalidate=60"),
+    "user": http_cache.cache_control("user", "private, no-cache"),
+}
+
+async def check_not_modified(request: Request, db: AsyncSession, tables: tuple[str, ...]):
+    # Validators are read before the data, so a concurrent write can only make the ETag older than the body.
+    validators = await http_cache.get_async_validators(db, tables, request.url.path, request.url.query)
+    if validators.matches(request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return validators, True
+    return validators, False
+
+def not_modified(validators: http_cache.Validators, route: str):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers(CACHE_POLICIES[route]))
+
+# Routes on the fast path query exactly these columns and return FastJSONResponse directly.
+COURSE_FIELDS = tuple(schemas.CourseResponse.model_fields)
+STUDENT_PERFORMANCE_FIELDS = tuple(schemas.StudentPerformanceRow.model_fields)
+
+# Read-only routes take get_async_read_db: their SELECTs may be served by the replica, which can
+# trail the primary by up to DB_REPLICA_MAX_LAG_SECONDS. Routes that read what the caller just
+# wrote (users, dashboards, jobs) stay on get_async_db.
+@router.get("/", response_class=HTMLResponse)
+async def read_root(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    validators, fresh = await check_not_modified(request, db, ("courses", "users"))
+    if fresh:
+        return not_modified(validators, "home")
+    courses, _ = await async_services.get_course_catalog_page(db, 0, 100000, plan="catalog_with_instructor")
+    response = request.app.state.templates.TemplateResponse(request=request, name="index.html", context={"courses": courses})
+    response.headers.update(validators.headers(CACHE_POLICIES["home"]))
+    return response
+
+@router.get("/courses/", response_model=List[schemas.CourseResponse], response_class=FastJSONResponse)
+async def get_courses(
+    request: Request,
+    min_price: int = 0,
+    max_price: int = 100000,
+    limit: int = Query(services.CATALOG_DEFAULT_PAGE_SIZE, ge=1),
+    cursor: Optional[str] = None,
+    sort: str = "price_asc",
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    validators, fresh = await check_not_modified(request, db, ("courses",))
+    if fresh:
+        return not_modified(validators, "catalog")
+
+    try:
+        courses, next_cursor = await async_services.get_course_catalog_rows(
+            db, min_price, max_price, COURSE_FIELDS, limit, cursor, sort
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = validators.headers(CACHE_POLICIES["catalog"])
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return FastJSONResponse(courses, headers=headers)
+
+@router.get("/courses/search", response_model=List[schemas.CourseSearchResult])
+async def search_courses(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(services.SEARCH_DEFAULT_PAGE_SIZE, ge=1),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    try:
+        rows, next_cursor = await async_services.search_courses(db, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        schemas.CourseSearchResult(
+            **schemas.CourseResponse.model_validate(course).model_dump(),
+            rank=rank,
+            title_highlight=title_highlight,
+            description_highlight=description_highlight or None,
+        )
+        for course, rank, title_highlight, description_highlight in rows
+    ]
+
+@router.get("/courses/{course_id}", response_model=schemas.CourseDetailResponse)
+async def get_course(course_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    course = await async_services.get_course(db, course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return course
+
+@router.get("/courses/{course_id}/modules", response_model=List[schemas.ModuleResponse])
+async def get_course_modules(course_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    modules = await async_services.get_course_modules(db, course_id)
+    if modules is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return modules
+
+async def content_chunks(kind: str, id: int, start: int, end: int):
+    async with get_database().async_read_sessions() as db:
+        async for chunk in contents.stream_content(db, kind, id, start, end):
+            yield chunk
+
+async def content_response(request: Request, db: AsyncSession, kind: str, id: int):
+    size = await contents.get_content_size(db, kind, id)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    headers = {"Accept-Ranges": "bytes"}
+    try:
+        byte_range = contents.parse_range(request.headers.get("range"), size)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE, headers=headers)
+
+    start, end = byte_range or (0, size - 1)
+    status_code = status.HTTP_200_OK
+    if byte_range is not None:
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    # Small bodies come back in one query; big ones stream chunk by chunk instead of being held in memory.
+    if end - start + 1 <= contents.CONTENT_CHUNK_SIZE:
+        body = await contents.get_content_slice(db, kind, id, start, end) if size else b""
+        return Response(body, status_code, headers, media_type=contents.CONTENT_MEDIA_TYPE)
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        content_chunks(kind, id, start, end), status_code, headers, media_type=contents.CONTENT_MEDIA_TYPE
     )
 
-@app.post("/users/", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = services.user_repo.get_by_email(db, user.email)
+@router.get("/modules/{module_id}/content")
+async def get_module_content(module_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    return await content_response(request, db, "modules", module_id)
+
+@router.get("/submissions/{submission_id}/content")
+async def get_submission_content(submission_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    return await content_response(request, db, "submissions", submission_id)
+
+@router.post("/courses/", response_model=schemas.CourseDetailResponse, status_code=status.HTTP_201_CREATED)
+async def create_course(
+    course: schemas.CourseCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        new_course, created = await async_services.create_course(
+            db,
+            course.instructor_id,
+            course.title,
+            course.price,
+            [module.model_dump() for module in course.modules],
+            course.description,
+            [assignment.model_dump() for assignment in course.assignments],
+            idempotency_key,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if new_course is None:
+        raise HTTPException(status_code=400, detail="Course could not be created")
+    if not created:
+        response.headers["Idempotent-Replayed"] = "true"
+    return new_course
+
+@router.post("/users/", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await async_services.async_user_repo.get_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -47,11 +283,156 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     except ValueError:
          raise HTTPException(status_code=400, detail="Invalid role. Use: student, instructor, admin")
 
-    return services.create_user(db, user.full_name, user.email, role_enum)
+    return await async_services.create_user(db, user.full_name, user.email, role_enum)
+
+async def body_rows(request: Request):
+    parser = import_data.JsonRowParser()
+    async for data in request.stream():
+        for row in parser.feed(data):
+            yield row
+    for row in parser.close():
+        yield row
+
+async def body_row_chunks(request: Request, size: int):
+    chunk = []
+    index = 0
+    async for row in body_rows(request):
+        chunk.append((index, row))
+        index += 1
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+BULK_USERS_BODY = {
+    "required": True,
+    "content": {
+        "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+        "application/x-ndjson": {"schema": {"type": "object"}},
+    },
+}
+
+@router.post("/users/bulk", response_model=schemas.BulkResult, openapi_extra={"requestBody": BULK_USERS_BODY})
+async def create_users_bulk(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # The body is parsed as it arrives and imported a chunk at a time, so its size is not bounded by memory.
+    result = {"created": 0, "errors": []}
+    seen_emails = set()
+    async for chunk in body_row_chunks(request, services.BULK_CHUNK_SIZE):
+        await db.run_sync(services.import_user_chunk, chunk, seen_emails, result)
+    return result
 
-@app.get("/users/{user_id}", response_model=schemas.UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = services.user_repo.get_by_id(db, user_id)
+@router.post("/courses/{course_id}/enrollments/bulk", response_model=schemas.BulkResult)
+async def enroll_students_bulk(course_id: int, request: schemas.BulkEnrollmentRequest, db: AsyncSession = Depends(get_async_db)):
+    result = await db.run_sync(services.bulk_enroll_students, course_id, request.student_ids)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return result
+
+@router.post("/assignments/{assignment_id}/grades", response_model=schemas.BulkGradeResult)
+async def grade_submissions_bulk(assignment_id: int, request: schemas.BulkGradeRequest, db: AsyncSession = Depends(get_async_db)):
+    result = await db.run_sync(services.bulk_grade_submissions, assignment_id, request.grades)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    return result
+
+@router.get("/users/{user_id}", response_model=schemas.UserResponse)
+async def get_user(user_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    validators, fresh = await check_not_modified(request, db, ("users",))
+    if fresh:
+        return not_modified(validators, "user")
+
+    user = await async_services.async_user_repo.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
\ No newline at end of file
+    response.headers.update(validators.headers(CACHE_POLICIES["user"]))
+    return user
+
+@router.get("/users/{user_id}/dashboard", response_model=schemas.StudentDashboard)
+async def get_user_dashboard(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await dashboard.get_async_dashboard(db, user_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return result
+
+@router.get("/analytics/student-performance", response_model=schemas.StudentPerformanceReport, response_class=FastJSONResponse)
+async def get_student_performance(
+    max_staleness: int = Query(analytics.DEFAULT_MAX_STALENESS, ge=analytics.MIN_STALENESS),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    rows, refreshed_at = await db.run_sync(analytics.get_student_performance, max_staleness)
+    return FastJSONResponse({"refreshed_at": refreshed_at, "items": records(rows, STUDENT_PERFORMANCE_FIELDS)})
+
+@router.get("/analytics/instructor-revenue", response_model=schemas.InstructorRevenueReport)
+async def get_instructor_revenue(
+    max_staleness: int = Query(analytics.DEFAULT_MAX_STALENESS, ge=analytics.MIN_STALENESS),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    rows, refreshed_at = await db.run_sync(analytics.get_instructor_revenue, max_staleness)
+    return {"refreshed_at": refreshed_at, "items": rows}
+
+@router.get("/analytics/courses/{course_id}/gradebook", response_model=schemas.CourseGradebook)
+async def get_course_gradebook(course_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    result = await db.run_sync(gradebook.get_course_gradebook, course_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return result
+
+@router.get("/analytics/assignments/{assignment_id}/gradebook", response_model=schemas.AssignmentGradebook)
+async def get_assignment_gradebook(assignment_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    result = await db.run_sync(gradebook.get_assignment_gradebook, assignment_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    return result
+
+async def export_chunks(dataset: str, fmt: str, filters: dict):
+    # The request-scoped session may be closed before the body is sent, so the stream owns its session.
+    async with get_database().async_read_sessions() as db:
+        async for chunk in exports.stream_export_async(db, dataset, fmt, **filters):
+            yield chunk
+
+@router.get("/exports/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = "csv",
+    course_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    submission_status: Optional[str] = Query(None, alias="status"),
+):
+    filters = {"course_id": course_id, "since": since, "until": until, "status": submission_status}
+    try:
+        exports.check_format(format)
+        exports.export_statement(dataset, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        export_chunks(dataset, format, filters),
+        media_type=exports.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'},
+    )
+
+@router.post("/jobs", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(request: schemas.JobCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        jobs.check_api_job(request.kind, request.payload)
+        return await db.run_sync(jobs.enqueue, request.kind, request.payload, request.max_attempts, request.delay)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/jobs/{job_id}", response_model=schemas.JobResponse)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/health")
+async def health(db: AsyncSession = Depends(get_async_db)):
+    await db.execute(text("SELECT 1"))
+    return {"database": "ok", "pools": {name: pooling.pool_status(name) for name in ("primary", "primary_async")}}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,46 @@
+from dataclasses import dataclass, field
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@dataclass
+class Metric:
+    name: str
+    type: str
+    help: str
+    samples: list = field(default_factory=list)
+
+    def add(self, value, **labels):
+        self.samples.append((labels, value))
+        return self
+
+_collectors = []
+
+# A collector is a callable returning a list of Metric objects; it runs on every scrape.
+def register(collector):
+    if collector not in _collectors:
+        _collectors.append(collector)
+    return collector
+
+def collect() -> list[Metric]:
+    metrics = []
+    for collector in _collectors:
+        metrics.extend(collector())
+    return metrics
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+def render_prometheus(metrics: list[Metric] | None = None) -> str:
+    lines = []
+    for metric in collect() if metrics is None else metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for labels, value in metric.samples:
+            lines.append(f"{metric.name}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
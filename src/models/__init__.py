@@ -1,4 +1,10 @@
 from .base import Base
 from .user import User, UserRole
 from .course import Course, Module
-from .lms import Enrollment, Assignment, Submission, EnrollmentStatus
\ No newline at end of file
+from .lms import Enrollment, Assignment, Submission, SubmissionContent, EnrollmentStatus
+from .analytics import StudentScoreStats, CourseSalesStats, AnalyticsRefresh
+from .table_version import TableVersion, VERSIONED_TABLES
+from .job import Job, JobStatus
+from .search import SEARCH_CONFIG, DDL_MANAGED_INDEXES
+from .idempotency import IdempotencyKey
+from .partitioning import PARTITIONED_TABLES, is_partition
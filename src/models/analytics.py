@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from .base import Base
+
+class StudentScoreStats(Base):
+    __tablename__ = "student_score_stats"
+
+    student_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    submissions_count = Column(Integer, nullable=False, default=0)
+    graded_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(BigInteger, nullable=False, default=0)
+    best_score = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CourseSalesStats(Base):
+    __tablename__ = "course_sales_stats"
+
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True)
+    enrollments_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class AnalyticsRefresh(Base):
+    __tablename__ = "analytics_refreshes"
+
+    name = Column(String(50), primary_key=True)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from .base import Base
 
@@ -8,13 +9,21 @@ class Course(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
-    description = Column(Text)
-    price = Column(Integer, default=0, index=True)
-    instructor_id = Column(Integer, ForeignKey("users.id"))
+    # Text bodies are deferred: listings and joins never need them. Load plans that return them undefer.
+    description = deferred(Column(Text))
+    price = Column(Integer, default=0)
+    instructor_id = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Maintained by the courses_search_vector trigger (models/search.py); never written by the app.
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
+
+    __table_args__ = (
+        Index("ix_courses_price_id", "price", "id"),
+        Index("ix_courses_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     instructor = relationship("User", back_populates="courses_created")
-    modules = relationship("Module", back_populates="course", cascade="all, delete-orphan")
+    modules = relationship("Module", back_populates="course", cascade="all, delete-orphan", order_by="Module.order_index")
     enrollments = relationship("Enrollment", back_populates="course")
     assignments = relationship("Assignment", back_populates="course")
 
@@ -22,9 +31,10 @@ class Module(Base):
     __tablename__ = "modules"
 
     id = Column(Integer, primary_key=True, index=True)
-    course_id = Column(Integer, ForeignKey("courses.id"))
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
     title = Column(String(150))
-    content = Column(Text)
+    # Served by GET /modules/{id}/content only.
+    content = deferred(Column(Text))
     order_index = Column(Integer)
 
     course = relationship("Course", back_populates="modules")
\ No newline at end of file
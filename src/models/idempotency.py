@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from .base import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String(100), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # Hash of the request that first used the key; a retry with a different body is rejected.
+    fingerprint = Column(String(64), nullable=False)
+    resource_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
@@ -0,0 +1,34 @@
+import enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from .base import Base
+
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(100), nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    result = Column(JSONB, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Workers only ever scan runnable jobs, so the index stays small however many finished jobs pile up.
+        Index("ix_jobs_queued_run_at", "run_at", "id", postgresql_where=text("status = 'QUEUED'")),
+        Index("ix_jobs_running_locked_at", "locked_at", postgresql_where=text("status = 'RUNNING'")),
+    )
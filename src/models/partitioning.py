@@ -0,0 +1,24 @@
+import re
+from datetime import date
+from sqlalchemy import DDL, event
+from .lms import Submission, SubmissionContent
+
+# Range-partitioned by month on submitted_at; partitions.py creates the months ahead and archives old ones.
+PARTITIONED_TABLES = (Submission.__table__, SubmissionContent.__table__)
+PARTITION_NAME = re.compile(r"^(submissions|submission_contents)_(default|p\d{6})$")
+
+def partition_name(table_name: str, month: date) -> str:
+    return f"{table_name}_p{month:%Y%m}"
+
+def default_partition_name(table_name: str) -> str:
+    return f"{table_name}_default"
+
+def is_partition(table_name: str) -> bool:
+    # Partitions and archived partitions exist only in the database; migrations/env.py ignores them.
+    return PARTITION_NAME.match(table_name) is not None
+
+# Catches rows outside every monthly partition, so inserts never fail when maintenance falls behind.
+for _table in PARTITIONED_TABLES:
+    event.listen(_table, "after_create", DDL(
+        f"CREATE TABLE {default_partition_name(_table.name)} PARTITION OF {_table.name} DEFAULT"
+    ).execute_if(dialect="postgresql"))
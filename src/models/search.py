@@ -0,0 +1,74 @@
+from sqlalchemy import DDL, event
+from .base import Base
+from .course import Course, Module
+
+SEARCH_CONFIG = "english"
+
+# Title, description and module titles feed courses.search_vector, weighted A/B/C for ranking.
+COURSE_SEARCH_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION courses_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(
+            (SELECT string_agg(title, ' ' ORDER BY order_index) FROM modules WHERE course_id = NEW.id), ''
+        )), 'C');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+COURSE_SEARCH_TRIGGER = """
+CREATE TRIGGER courses_search_vector
+BEFORE INSERT OR UPDATE OF title, description ON courses
+FOR EACH ROW EXECUTE FUNCTION courses_search_vector_update()
+"""
+
+# Touching courses.title re-runs the trigger above, so module changes re-index their courses once per statement.
+MODULE_SEARCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION modules_refresh_course_search() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE courses SET title = title WHERE id IN (SELECT course_id FROM new_modules);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE courses SET title = title WHERE id IN (SELECT course_id FROM old_modules);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+MODULE_SEARCH_TRIGGERS = (
+    "CREATE TRIGGER modules_search_insert AFTER INSERT ON modules "
+    "REFERENCING NEW TABLE AS new_modules FOR EACH STATEMENT EXECUTE FUNCTION modules_refresh_course_search()",
+    "CREATE TRIGGER modules_search_update AFTER UPDATE ON modules "
+    "REFERENCING OLD TABLE AS old_modules NEW TABLE AS new_modules FOR EACH STATEMENT EXECUTE FUNCTION modules_refresh_course_search()",
+    "CREATE TRIGGER modules_search_delete AFTER DELETE ON modules "
+    "REFERENCING OLD TABLE AS old_modules FOR EACH STATEMENT EXECUTE FUNCTION modules_refresh_course_search()",
+)
+
+# pg_trgm ships with contrib, which not every Postgres install has, so the fuzzy-match index is
+# created only where the extension is available. Search falls back to exact terms without it.
+TRIGRAM_INDEX = "ix_courses_title_trgm"
+TRIGRAM_SETUP = f"""
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON courses USING gin (title gin_trgm_ops);
+    END IF;
+END
+$$
+"""
+
+# Indexes created by DDL above rather than declared on the models; migrations/env.py ignores them.
+DDL_MANAGED_INDEXES = (TRIGRAM_INDEX,)
+
+event.listen(Base.metadata, "before_create", DDL(COURSE_SEARCH_FUNCTION).execute_if(dialect="postgresql"))
+event.listen(Base.metadata, "before_create", DDL(MODULE_SEARCH_FUNCTION).execute_if(dialect="postgresql"))
+event.listen(Course.__table__, "after_create", DDL(COURSE_SEARCH_TRIGGER).execute_if(dialect="postgresql"))
+event.listen(Course.__table__, "after_create", DDL(TRIGRAM_SETUP).execute_if(dialect="postgresql"))
+for _trigger in MODULE_SEARCH_TRIGGERS:
+    event.listen(Module.__table__, "after_create", DDL(_trigger).execute_if(dialect="postgresql"))
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, BigInteger, SmallInteger, String, DateTime, DDL, event
+from sqlalchemy.sql import func
+from .base import Base
+from .user import User
+from .course import Course, Module
+from .lms import Assignment
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(63), primary_key=True)
+    slot = Column(SmallInteger, primary_key=True, default=0)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+# Tables whose writes bump table_versions; HTTP validators are derived from them.
+VERSIONED_TABLES = (User.__table__, Course.__table__, Module.__table__, Assignment.__table__)
+
+# A table's version is the sum over its slots. Each backend bumps the slot picked by its pid, so the row lock held
+# until commit only serializes writers that share a slot instead of every writer of the table.
+TABLE_VERSION_SLOTS = 16
+
+BUMP_TABLE_VERSION_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, slot, version, updated_at)
+    VALUES (TG_TABLE_NAME, mod(pg_backend_pid(), {TABLE_VERSION_SLOTS}), 1, clock_timestamp())
+    ON CONFLICT (table_name, slot) DO UPDATE
+    SET version = table_versions.version + 1, updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def version_trigger_ddl(table_name: str) -> str:
+    # Statement-level, so a bulk insert bumps the version once rather than per row.
+    return (
+        f"CREATE TRIGGER {table_name}_bump_version "
+        f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table_name} "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()"
+    )
+
+event.listen(Base.metadata, "before_create", DDL(BUMP_TABLE_VERSION_FUNCTION).execute_if(dialect="postgresql"))
+for _table in VERSIONED_TABLES:
+    event.listen(_table, "after_create", DDL(version_trigger_ddl(_table.name)).execute_if(dialect="postgresql"))
@@ -0,0 +1,137 @@
+import argparse
+import os
+import sys
+from datetime import date, datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from models import PARTITIONED_TABLES
+from models.partitioning import partition_name, default_partition_name
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("SUBMISSION_PARTITION_MONTHS_AHEAD", "3"))
+ARCHIVE_AFTER_MONTHS = int(os.getenv("SUBMISSION_ARCHIVE_AFTER_MONTHS", "24"))
+# DDL below waits for conflicting locks; a long analytics query must not queue every insert behind it.
+PARTITION_LOCK_TIMEOUT = os.getenv("SUBMISSION_PARTITION_LOCK_TIMEOUT", "5s")
+
+PARTITIONS_QUERY = text(
+    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+)
+FOREIGN_KEYS_QUERY = text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'")
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def bound(month: date) -> str:
+    # Explicit UTC, so the bounds do not depend on the session's TimeZone.
+    return f"{month.isoformat()} 00:00:00+00"
+
+def partition_months(db: Session, table_name: str) -> dict[date, str]:
+    months = {}
+    for name in db.scalars(PARTITIONS_QUERY, {"table": table_name}):
+        suffix = name.rsplit("_p", 1)[-1]
+        if suffix.isdigit():
+            months[date(int(suffix[:4]), int(suffix[4:]), 1)] = name
+    return months
+
+def stray_months(db: Session, table_name: str) -> set[date]:
+    # Months that ended up in the default partition because nobody created theirs in time.
+    rows = db.scalars(text(
+        f"SELECT DISTINCT date_trunc('month', submitted_at AT TIME ZONE 'UTC') FROM {default_partition_name(table_name)}"
+    ))
+    return {month.date() for month in rows}
+
+def create_partition(db: Session, table_name: str, month: date) -> str:
+    # Built detached and then attached: ATTACH only blocks writes to the default partition, where
+    # CREATE ... PARTITION OF would lock the whole table. Rows for the month already sitting in the
+    # default partition move over first, or the attach would fail its check.
+    name = partition_name(table_name, month)
+    default = default_partition_name(table_name)
+    lower, upper = bound(month), bound(add_months(month, 1))
+    db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    db.execute(text(f"CREATE TABLE {name} (LIKE {table_name} INCLUDING CONSTRAINTS)"))
+    db.execute(text(
+        f"WITH moved AS (DELETE FROM {default} WHERE submitted_at >= :lower AND submitted_at < :upper RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), {"lower": lower, "upper": upper})
+    db.execute(text(f"ALTER TABLE {table_name} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+    return name
+
+def retention_start(keep_months: int = ARCHIVE_AFTER_MONTHS, today: date | None = None) -> date:
+    return add_months(month_start(today or datetime.now(timezone.utc).date()), -keep_months)
+
+def ensure_partitions(db: Session, months_ahead: int = PARTITION_MONTHS_AHEAD, today: date | None = None,
+                      since: date | None = None) -> list[str]:
+    # `since` backfills the months before the current one, for loading historical data.
+    current = month_start(today or datetime.now(timezone.utc).date())
+    first = month_start(min(since, current)) if since else current
+    wanted = set()
+    while first <= add_months(current, months_ahead):
+        wanted.add(first)
+        first = add_months(first, 1)
+    # Both tables get the same months, so a month's submissions and contents are archived together.
+    for table in PARTITIONED_TABLES:
+        wanted |= stray_months(db, table.name)
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = partition_months(db, table.name)
+        for month in sorted(wanted - existing.keys()):
+            created.append(create_partition(db, table.name, month))
+    db.commit()
+    if created:
+        print(f"Created partitions: {', '.join(created)}")
+    return created
+
+def archive_partitions(db: Session, before: date, drop: bool = False) -> list[str]:
+    # Detaches every monthly partition that ends on or before `before`. The detached tables keep their data
+    # for pg_dump or cold storage; their foreign keys are dropped so users and assignments can still be
+    # deleted. Analytics and the summary refresh only see attached partitions from then on.
+    archived = []
+    for table in PARTITIONED_TABLES:
+        for month, name in sorted(partition_months(db, table.name).items()):
+            if add_months(month, 1) > before:
+                continue
+            db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+            db.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {name}"))
+            if drop:
+                db.execute(text(f"DROP TABLE {name}"))
+            else:
+                for constraint in db.scalars(FOREIGN_KEYS_QUERY, {"table": name}).all():
+                    db.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {constraint}"))
+                if "id" in table.c:
+                    # The default would tie the archive to the live table's id sequence.
+                    db.execute(text(f"ALTER TABLE {name} ALTER COLUMN id DROP DEFAULT"))
+            archived.append(name)
+    db.commit()
+    if archived:
+        print(f"{'Dropped' if drop else 'Archived'} partitions: {', '.join(archived)}")
+    return archived
+
+def main(argv=None):
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Create upcoming submission partitions or archive old ones.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    maintain = commands.add_parser("maintain", help="create partitions for the coming months")
+    maintain.add_argument("--ahead", type=int, default=PARTITION_MONTHS_AHEAD, help="months to create in advance")
+    archive = commands.add_parser("archive", help="detach partitions older than the retention window")
+    archive.add_argument("--keep-months", type=int, default=ARCHIVE_AFTER_MONTHS, help="months to keep attached")
+    archive.add_argument("--before", type=date.fromisoformat, help="archive months ending on or before this date")
+    archive.add_argument("--drop", action="store_true", help="drop the detached partitions instead of keeping them")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "maintain":
+            ensure_partitions(db, args.ahead)
+        else:
+            archive_partitions(db, args.before or retention_start(args.keep_months), args.drop)
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
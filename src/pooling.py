@@ -0,0 +1,137 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+import metrics
+
+class PoolStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def incr(self, counter: str):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def observe_wait(self, seconds: float):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+_stats: dict[str, PoolStats] = {}
+_engines = {}
+
+def stats_for(name: str) -> PoolStats:
+    if name not in _stats:
+        _stats[name] = PoolStats(name)
+    return _stats[name]
+
+# Pools are looked up by logging name so the stats survive engine.dispose(), which recreates the pool.
+class TimedCheckoutMixin:
+    def _do_get(self):
+        stats = stats_for(self._orig_logging_name)
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            stats.incr("timeouts")
+            raise
+        finally:
+            stats.observe_wait(time.perf_counter() - start)
+
+class InstrumentedQueuePool(TimedCheckoutMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncAdaptedQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+class InstrumentedNullPool(TimedCheckoutMixin, NullPool):
+    pass
+
+def instrument_engine(engine, name: str):
+    stats = stats_for(name)
+    _engines[name] = engine
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.incr("connects")
+
+    @event.listens_for(engine, "close")
+    def on_close(dbapi_connection, connection_record):
+        stats.incr("disconnects")
+
+    @event.listens_for(engine, "close_detached")
+    def on_close_detached(dbapi_connection):
+        stats.incr("disconnects")
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.incr("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr("invalidations")
+
+    return engine
+
+def pool_status(name: str) -> dict:
+    stats = stats_for(name)
+    pool = _engines[name].pool if name in _engines else None
+    status = {
+        "pool": type(pool).__name__ if pool is not None else None,
+        "size": None,
+        "checked_in": None,
+        "checked_out": None,
+        "overflow": None,
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(0, pool.overflow()),
+        )
+    status.update(
+        checkouts=stats.checkouts,
+        checkins=stats.checkins,
+        connects=stats.connects,
+        disconnects=stats.disconnects,
+        invalidations=stats.invalidations,
+        timeouts=stats.timeouts,
+        wait_seconds_total=round(stats.wait_seconds_total, 6),
+        wait_seconds_max=round(stats.wait_seconds_max, 6),
+    )
+    return status
+
+@metrics.register
+def collect_pool_metrics():
+    gauges = {
+        "size": metrics.Metric("lms_db_pool_size", "gauge", "Configured number of pooled connections."),
+        "checked_in": metrics.Metric("lms_db_pool_checked_in", "gauge", "Idle connections in the pool."),
+        "checked_out": metrics.Metric("lms_db_pool_checked_out", "gauge", "Connections currently checked out."),
+        "overflow": metrics.Metric("lms_db_pool_overflow", "gauge", "Connections open beyond pool_size."),
+        "wait_seconds_max": metrics.Metric("lms_db_pool_wait_seconds_max", "gauge", "Longest wait for a connection."),
+    }
+    counters = {
+        "checkouts": metrics.Metric("lms_db_pool_checkouts_total", "counter", "Connections handed out by the pool."),
+        "wait_seconds_total": metrics.Metric("lms_db_pool_wait_seconds_total", "counter", "Total time spent waiting for a connection."),
+        "connects": metrics.Metric("lms_db_pool_connects_total", "counter", "New DBAPI connections opened."),
+        "disconnects": metrics.Metric("lms_db_pool_disconnects_total", "counter", "DBAPI connections closed."),
+        "invalidations": metrics.Metric("lms_db_pool_invalidations_total", "counter", "Connections invalidated after errors."),
+        "timeouts": metrics.Metric("lms_db_pool_timeouts_total", "counter", "Checkouts that timed out on an exhausted pool."),
+    }
+    for name in sorted(_stats):
+        status = pool_status(name)
+        for key, metric in {**gauges, **counters}.items():
+            if status[key] is not None:
+                metric.add(status[key], engine=name)
+    return list(gauges.values()) + list(counters.values())
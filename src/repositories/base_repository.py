@@ -1,26 +1,141 @@
-from sqlalchemy.orm import Session
+import os
+from sqlalchemy import select, inspect, bindparam, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, raiseload, make_transient_to_detached
+import cache
 
 class BaseRepository:
+    # Named loader-option profiles, e.g. {"with_author": (joinedload(Post.author),)}.
+    load_plans = {}
+    # When enabled, any relationship not covered by a load plan raises instead of lazy loading.
+    strict_loading = os.getenv("STRICT_LOADING", "").lower() in ("1", "true", "yes")
+    # Key prefix for the read-through cache; None disables caching for the repository.
+    cache_namespace = None
+
     def __init__(self, model):
         self.model = model
+        self.statements = {}
+
+    def load_options(self, plan: str | None = None):
+        options = []
+        if plan is not None:
+            if plan not in self.load_plans:
+                raise ValueError(f"Unknown load plan '{plan}' for {self.model.__name__}")
+            options.extend(self.load_plans[plan])
+        if self.strict_loading:
+            options.append(raiseload("*", sql_only=True))
+        return options
+
+    def select(self, plan: str | None = None):
+        stmt = select(self.model).options(*self.load_options(plan))
+        # Tells enforce_strict_loading the options are already there, so a reused statement stays as it is.
+        return stmt.execution_options(strict_loading=True) if self.strict_loading else stmt
+
+    def statement(self, name: str, plan: str | None, build):
+        # Hot lookups are built once per load plan with bound parameters and reused. A reused statement
+        # skips construction and keeps its memoized cache key, so execution goes straight to the
+        # compiled SQL (and, on asyncpg, the connection's prepared statement).
+        key = (name, plan, self.strict_loading)
+        stmt = self.statements.get(key)
+        if stmt is None:
+            stmt = self.statements[key] = build(self.select(plan))
+        return stmt
+
+    def by_id_statement(self, plan: str | None = None):
+        return self.statement("by_id", plan, lambda stmt: stmt.where(self.model.id == bindparam("id")))
+
+    def cache_key(self, *parts) -> str:
+        return ":".join([self.cache_namespace, *map(str, parts)])
+
+    def cache_keys(self, obj) -> list[str]:
+        return [self.cache_key("id", obj.id)]
+
+    def snapshot(self, obj) -> dict:
+        state = inspect(obj)
+        return {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict}
+
+    def restore(self, db, data: dict):
+        # Re-attach cached column values as a persistent instance without emitting a SELECT.
+        obj = self.model(**data)
+        make_transient_to_detached(obj)
+        return getattr(db, "sync_session", db).merge(obj, load=False)
+
+    def cached(self, db, key: str, plan: str | None = None):
+        # Only plain rows are cached; load plans need their relationships loaded from the database.
+        if self.cache_namespace is None or plan is not None:
+            return None
+        data = cache.get_cache().get(key)
+        return None if data is None else self.restore(db, data)
+
+    def store(self, key: str, obj, plan: str | None = None):
+        if obj is not None and self.cache_namespace is not None and plan is None:
+            cache.get_cache().set(key, self.snapshot(obj))
+        return obj
 
-    def get_by_id(self, db: Session, id: int):
-        return db.query(self.model).filter(self.model.id == id).first()
+    def invalidate(self, obj):
+        if self.cache_namespace is not None and obj is not None:
+            cache.get_cache().delete(*self.cache_keys(obj))
 
-    def get_all(self, db: Session, skip: int = 0, limit: int = 100):
-        return db.query(self.model).offset(skip).limit(limit).all()
+    def get_by_id(self, db: Session, id: int, plan: str | None = None):
+        key = self.cache_key("id", id) if self.cache_namespace else None
+        obj = self.cached(db, key, plan)
+        if obj is None:
+            obj = self.store(key, db.scalars(self.by_id_statement(plan), {"id": id}).first(), plan)
+        return obj
+
+    def get_all(self, db: Session, skip: int = 0, limit: int = 100, plan: str | None = None):
+        return db.scalars(self.select(plan).offset(skip).limit(limit)).all()
 
     def create(self, db: Session, obj_in: dict):
         db_obj = self.model(**obj_in)
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        self.invalidate(db_obj)
         return db_obj
 
     def delete(self, db: Session, id: int):
-        obj = db.query(self.model).get(id)
+        obj = db.get(self.model, id)
         if obj:
             db.delete(obj)
             db.commit()
+            self.invalidate(obj)
             return True
-        return False
\ No newline at end of file
+        return False
+
+class AsyncBaseRepository(BaseRepository):
+    async def get_by_id(self, db: AsyncSession, id: int, plan: str | None = None):
+        key = self.cache_key("id", id) if self.cache_namespace else None
+        obj = self.cached(db, key, plan)
+        if obj is None:
+            obj = self.store(key, (await db.scalars(self.by_id_statement(plan), {"id": id})).first(), plan)
+        return obj
+
+    async def get_all(self, db: AsyncSession, skip: int = 0, limit: int = 100, plan: str | None = None):
+        return (await db.scalars(self.select(plan).offset(skip).limit(limit))).all()
+
+    async def create(self, db: AsyncSession, obj_in: dict):
+        db_obj = self.model(**obj_in)
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        self.invalidate(db_obj)
+        return db_obj
+
+    async def delete(self, db: AsyncSession, id: int):
+        obj = await db.get(self.model, id)
+        if obj:
+            await db.delete(obj)
+            await db.commit()
+            self.invalidate(obj)
+            return True
+        return False
+
+@event.listens_for(Session, "do_orm_execute")
+def enforce_strict_loading(state):
+    # Strict mode covers every ORM select in every session (async ones run on a sync Session too), not only
+    # the statements repositories build. Loads issued by loader strategies keep the options of their parent.
+    if not BaseRepository.strict_loading or not state.is_select or state.is_relationship_load or state.is_column_load:
+        return
+    if not state.execution_options.get("strict_loading"):
+        state.statement = state.statement.options(raiseload("*", sql_only=True))
@@ -1,12 +1,296 @@
-from sqlalchemy.orm import Session
-from models import Course
-from .base_repository import BaseRepository
+import base64
+import json
+import os
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import tuple_, select, bindparam, func, cast, literal, or_, text, Numeric
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload, undefer
+from models import Course, SEARCH_CONFIG
+from .base_repository import BaseRepository, AsyncBaseRepository
+import cache
+import routing
+
+CATALOG_SORTS = ("price_asc", "price_desc")
+
+# The sort is part of the cursor: a price_asc position replayed under price_desc would skip or repeat rows.
+def encode_cursor(price: int, id: int, sort: str = "price_asc") -> str:
+    raw = json.dumps([sort, price, id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str = "price_asc") -> tuple[int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, price, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        price, id = int(price), int(id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor was issued for sort '{cursor_sort}', not '{sort}'")
+    return price, id
+
+def encode_search_cursor(rank: Decimal, id: int) -> str:
+    raw = json.dumps([str(rank), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_search_cursor(cursor: str) -> tuple[Decimal, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return Decimal(rank), int(id)
+    except (ValueError, TypeError, InvalidOperation):
+        raise ValueError("Invalid cursor")
+
+TRIGRAM_CHECK = text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+# How long a pg_trgm check is trusted, so installing or dropping the extension is picked up without a restart.
+TRIGRAM_CHECK_SECONDS = float(os.getenv("SEARCH_TRIGRAM_CHECK_SECONDS", "300"))
+# Highlights are HTML: the instructor's text is escaped before ts_headline runs, so <mark> is the only markup.
+# The parser keeps each entity as one token, so a fragment never cuts one in half.
+HIGHLIGHT_TITLE = "StartSel=<mark>, StopSel=</mark>, HighlightAll=true"
+HIGHLIGHT_DESCRIPTION = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#x27;"))
+
+def html_escape(expression):
+    for char, entity in HTML_ESCAPES:
+        expression = func.replace(expression, char, entity)
+    return expression
 
 class CourseRepository(BaseRepository):
+    load_plans = {
+        "catalog_with_instructor": (joinedload(Course.instructor),),
+        "with_modules_and_assignments": (
+            undefer(Course.description),
+            joinedload(Course.instructor),
+            selectinload(Course.modules),
+            selectinload(Course.assignments),
+        ),
+    }
+    cache_namespace = "courses"
+
     def __init__(self):
         super().__init__(Course)
+        # Whether pg_trgm is installed; detected on the first search and rechecked every TRIGRAM_CHECK_SECONDS.
+        self.fuzzy_search = None
+        self.fuzzy_checked_at = None
+
+    def fuzzy_check_due(self) -> bool:
+        return self.fuzzy_checked_at is None or time.monotonic() - self.fuzzy_checked_at >= TRIGRAM_CHECK_SECONDS
+
+    def set_fuzzy_search(self, available) -> bool:
+        self.fuzzy_search = bool(available)
+        self.fuzzy_checked_at = time.monotonic()
+        return self.fuzzy_search
+
+    # Catalog pages are cached under a version token; a write swaps the token, which
+    # orphans every cached page at once instead of enumerating their keys.
+    def catalog_version(self) -> dict:
+        key = self.cache_key("catalog", "version")
+        version = cache.get_cache().get(key)
+        if version is None:
+            version = self.new_catalog_version()
+            cache.get_cache().set(key, version)
+        return version
+
+    @staticmethod
+    def new_catalog_version() -> dict:
+        return {"token": uuid.uuid4().hex, "created_at": time.time()}
+
+    def invalidate(self, obj):
+        super().invalidate(obj)
+        if self.cache_namespace is not None:
+            cache.get_cache().set(self.cache_key("catalog", "version"), self.new_catalog_version())
+
+    def catalog_cache_key(self, plan: str | None, *parts) -> tuple[str | None, dict | None]:
+        if self.cache_namespace is None or plan is not None:
+            return None, None
+        version = self.catalog_version()
+        return self.cache_key("catalog", version["token"], *parts), version
+
+    @staticmethod
+    def catalog_store_key(db, key: str | None, version: dict | None) -> str | None:
+        # A replica that lags by more than the token's age may not have the write that swapped it yet,
+        # and its rows would be served under the new token until they expire. Such reads are not cached.
+        lag = routing.served_lag(db)
+        if key is None or lag is None:
+            return key
+        return key if time.time() - version["created_at"] > lag else None
+
+    def cached_list(self, db, key: str | None, plan: str | None = None):
+        if key is None or plan is not None:
+            return None
+        data = cache.get_cache().get(key)
+        if data is None:
+            return None
+        return [self.restore(db, row) for row in data["rows"]], data["next_cursor"]
+
+    def store_list(self, key: str | None, rows, next_cursor=None, plan: str | None = None):
+        if key is not None and plan is None:
+            cache.get_cache().set(key, {"rows": [self.snapshot(row) for row in rows], "next_cursor": next_cursor})
+        return rows, next_cursor
+
+    def expensive_courses_statement(self, plan: str | None = None):
+        return self.statement("expensive", plan, lambda stmt: stmt.where(Course.price >= bindparam("min_price")))
+
+    def price_range_statement(self, min_price: int, max_price: int, plan: str | None = None):
+        return self.select(plan)\
+            .where(Course.price >= min_price, Course.price <= max_price)\
+            .order_by(Course.price, Course.id)
+
+    def catalog_page_statement(self, min_price: int, max_price: int, limit: int,
+                               cursor: str | None = None, sort: str = "price_asc", plan: str | None = None,
+                               columns: tuple[str, ...] | None = None):
+        if sort not in CATALOG_SORTS:
+            raise ValueError(f"Invalid sort. Use: {', '.join(CATALOG_SORTS)}")
+
+        # With columns, rows come back as plain tuples instead of hydrated Course objects.
+        stmt = self.select(plan) if columns is None else select(*(getattr(Course, name) for name in columns))
+        stmt = stmt.where(Course.price >= min_price, Course.price <= max_price)
+
+        key = tuple_(Course.price, Course.id)
+        if cursor:
+            after = decode_cursor(cursor, sort)
+            stmt = stmt.where(key < after if sort == "price_desc" else key > after)
+
+        if sort == "price_desc":
+            stmt = stmt.order_by(Course.price.desc(), Course.id.desc())
+        else:
+            stmt = stmt.order_by(Course.price, Course.id)
+
+        # One extra row tells us whether another page exists without a COUNT(*).
+        return stmt.limit(limit + 1)
+
+    @staticmethod
+    def catalog_page(rows, limit: int, sort: str = "price_asc"):
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last.price, last.id, sort)
+        return items, next_cursor
+
+    def cached_rows(self, key: str | None):
+        data = None if key is None else cache.get_cache().get(key)
+        return None if data is None else (data["rows"], data["next_cursor"])
+
+    def store_rows(self, key: str | None, rows, next_cursor=None):
+        rows = [row._asdict() for row in rows]
+        if key is not None:
+            cache.get_cache().set(key, {"rows": rows, "next_cursor": next_cursor})
+        return rows, next_cursor
+
+    def search_statement(self, q: str, limit: int, cursor: str | None = None, fuzzy: bool = False, plan: str | None = None):
+        query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        matches = [Course.search_vector.op("@@")(query)]
+        score = func.ts_rank_cd(Course.search_vector, query)
+        if fuzzy:
+            # word_similarity tolerates typos and partial words that full-text stemming misses.
+            matches.append(literal(q).op("<%")(Course.title))
+            score = score + func.word_similarity(q, Course.title)
+        # Rounded to a fixed-point value so the rank round-trips exactly through the cursor.
+        rank = func.round(cast(score, Numeric), 6)
+
+        page = select(Course.id, rank.label("rank")).where(or_(*matches))
+        if cursor:
+            page = page.where(tuple_(rank, Course.id) < decode_search_cursor(cursor))
+        page = page.order_by(rank.desc(), Course.id.desc()).limit(limit + 1).subquery()
+
+        # Headlines are the costly part, so they are only computed for the rows on this page.
+        return self.select(plan)\
+            .options(undefer(Course.description))\
+            .add_columns(
+                page.c.rank,
+                func.ts_headline(SEARCH_CONFIG, html_escape(Course.title), query, HIGHLIGHT_TITLE)
+                    .label("title_highlight"),
+                func.ts_headline(SEARCH_CONFIG, html_escape(func.coalesce(Course.description, "")), query,
+                                 HIGHLIGHT_DESCRIPTION).label("description_highlight"),
+            )\
+            .join(page, page.c.id == Course.id)\
+            .order_by(page.c.rank.desc(), Course.id.desc())
+
+    @staticmethod
+    def search_page(rows, limit: int):
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_search_cursor(last.rank, last[0].id)
+        return items, next_cursor
+
+    def search(self, db: Session, q: str, limit: int, cursor: str | None = None, plan: str | None = None):
+        if self.fuzzy_check_due():
+            self.set_fuzzy_search(db.scalar(TRIGRAM_CHECK))
+        stmt = self.search_statement(q, limit, cursor, self.fuzzy_search, plan)
+        return self.search_page(db.execute(stmt).all(), limit)
+
+    def get_expensive_courses(self, db: Session, min_price: int, plan: str | None = None):
+        return db.scalars(self.expensive_courses_statement(plan), {"min_price": min_price}).all()
+
+    def get_by_price_range(self, db: Session, min_price: int, max_price: int, plan: str | None = None):
+        key, version = self.catalog_cache_key(plan, "range", min_price, max_price)
+        cached = self.cached_list(db, key, plan)
+        if cached is not None:
+            return cached[0]
+        rows = db.scalars(self.price_range_statement(min_price, max_price, plan)).all()
+        return self.store_list(self.catalog_store_key(db, key, version), rows, plan=plan)[0]
+
+    def get_catalog_page(self, db: Session, min_price: int, max_price: int, limit: int,
+                         cursor: str | None = None, sort: str = "price_asc", plan: str | None = None):
+        key, version = self.catalog_cache_key(plan, "page", min_price, max_price, limit, cursor, sort)
+        cached = self.cached_list(db, key, plan)
+        if cached is not None:
+            return cached
+        stmt = self.catalog_page_statement(min_price, max_price, limit, cursor, sort, plan)
+        rows = db.scalars(stmt).all()
+        return self.store_list(self.catalog_store_key(db, key, version), *self.catalog_page(rows, limit, sort), plan=plan)
+
+    def get_catalog_rows(self, db: Session, min_price: int, max_price: int, limit: int, columns: tuple[str, ...],
+                         cursor: str | None = None, sort: str = "price_asc"):
+        key, version = self.catalog_cache_key(None, "rows", min_price, max_price, limit, cursor, sort, *columns)
+        cached = self.cached_rows(key)
+        if cached is not None:
+            return cached
+        stmt = self.catalog_page_statement(min_price, max_price, limit, cursor, sort, columns=columns)
+        rows = db.execute(stmt).all()
+        return self.store_rows(self.catalog_store_key(db, key, version), *self.catalog_page(rows, limit, sort))
+
+class AsyncCourseRepository(AsyncBaseRepository, CourseRepository):
+    async def search(self, db: AsyncSession, q: str, limit: int, cursor: str | None = None, plan: str | None = None):
+        if self.fuzzy_check_due():
+            self.set_fuzzy_search(await db.scalar(TRIGRAM_CHECK))
+        stmt = self.search_statement(q, limit, cursor, self.fuzzy_search, plan)
+        return self.search_page((await db.execute(stmt)).all(), limit)
+
+    async def get_expensive_courses(self, db: AsyncSession, min_price: int, plan: str | None = None):
+        return (await db.scalars(self.expensive_courses_statement(plan), {"min_price": min_price})).all()
+
+    async def get_by_price_range(self, db: AsyncSession, min_price: int, max_price: int, plan: str | None = None):
+        key, version = self.catalog_cache_key(plan, "range", min_price, max_price)
+        cached = self.cached_list(db, key, plan)
+        if cached is not None:
+            return cached[0]
+        rows = (await db.scalars(self.price_range_statement(min_price, max_price, plan))).all()
+        return self.store_list(self.catalog_store_key(db, key, version), rows, plan=plan)[0]
+
+    async def get_catalog_page(self, db: AsyncSession, min_price: int, max_price: int, limit: int,
+                               cursor: str | None = None, sort: str = "price_asc", plan: str | None = None):
+        key, version = self.catalog_cache_key(plan, "page", min_price, max_price, limit, cursor, sort)
+        cached = self.cached_list(db, key, plan)
+        if cached is not None:
+            return cached
+        stmt = self.catalog_page_statement(min_price, max_price, limit, cursor, sort, plan)
+        rows = (await db.scalars(stmt)).all()
+        return self.store_list(self.catalog_store_key(db, key, version), *self.catalog_page(rows, limit, sort), plan=plan)
 
-    def get_expensive_courses(self, db: Session, min_price: int):
-        return db.query(Course).filter(Course.price >= min_price).all()
+    async def get_catalog_rows(self, db: AsyncSession, min_price: int, max_price: int, limit: int, columns: tuple[str, ...],
+                               cursor: str | None = None, sort: str = "price_asc"):
+        key, version = self.catalog_cache_key(None, "rows", min_price, max_price, limit, cursor, sort, *columns)
+        cached = self.cached_rows(key)
+        if cached is not None:
+            return cached
+        stmt = self.catalog_page_statement(min_price, max_price, limit, cursor, sort, columns=columns)
+        rows = (await db.execute(stmt)).all()
+        return self.store_rows(self.catalog_store_key(db, key, version), *self.catalog_page(rows, limit, sort))
 
-course_repo = CourseRepository()
\ No newline at end of file
+course_repo = CourseRepository()
+async_course_repo = AsyncCourseRepository()
@@ -1,12 +1,50 @@
-from sqlalchemy.orm import Session
-from models import User
-from .base_repository import BaseRepository
+from sqlalchemy import bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from models import User, Enrollment
+from .base_repository import BaseRepository, AsyncBaseRepository
+import cache
 
 class UserRepository(BaseRepository):
+    load_plans = {
+        "with_enrollments": (selectinload(User.enrollments).joinedload(Enrollment.course),),
+    }
+    cache_namespace = "users"
+
     def __init__(self):
         super().__init__(User)
 
-    def get_by_email(self, db: Session, email: str):
-        return db.query(User).filter(User.email == email).first()
+    def cache_keys(self, obj) -> list[str]:
+        return super().cache_keys(obj) + [self.cache_key("email", obj.email)]
+
+    def cached_by_email(self, db, email: str, plan: str | None = None):
+        # The email entry only stores the id; the row itself lives under the id key.
+        if self.cache_namespace is None or plan is not None:
+            return None
+        user_id = cache.get_cache().get(self.cache_key("email", email))
+        return None if user_id is None else self.cached(db, self.cache_key("id", user_id))
+
+    def store_by_email(self, email: str, user, plan: str | None = None):
+        if user is not None and self.cache_namespace is not None and plan is None:
+            self.store(self.cache_key("id", user.id), user)
+            cache.get_cache().set(self.cache_key("email", email), user.id)
+        return user
+
+    def by_email_statement(self, plan: str | None = None):
+        return self.statement("by_email", plan, lambda stmt: stmt.where(User.email == bindparam("email")))
+
+    def get_by_email(self, db: Session, email: str, plan: str | None = None):
+        user = self.cached_by_email(db, email, plan)
+        if user is None:
+            user = self.store_by_email(email, db.scalars(self.by_email_statement(plan), {"email": email}).first(), plan)
+        return user
+
+class AsyncUserRepository(AsyncBaseRepository, UserRepository):
+    async def get_by_email(self, db: AsyncSession, email: str, plan: str | None = None):
+        user = self.cached_by_email(db, email, plan)
+        if user is None:
+            user = self.store_by_email(email, (await db.scalars(self.by_email_statement(plan), {"email": email})).first(), plan)
+        return user
 
-user_repo = UserRepository()
\ No newline at end of file
+user_repo = UserRepository()
+async_user_repo = AsyncUserRepository()
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import Select, CompoundSelect, TextClause
+import metrics
+
+# Replay delay of a Postgres standby. A standby that has replayed everything it received reports 0
+# even when the primary has been idle, and a primary (not in recovery) is never lagging.
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class ReplicaMonitor:
+    # Decides whether the replica may serve reads. The check runs on demand at most every
+    # check_seconds, so a lagging or unreachable replica costs one round-trip per interval, not per query.
+    def __init__(self, engine, name: str, max_lag_seconds: float = 5.0, check_seconds: float = 5.0):
+        self.engine = engine
+        self.name = name
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.available = False
+        self.lag_seconds = None
+        self.routed = {"replica": 0, "primary": 0, "fallback": 0}
+        _monitors[name] = self
+        # A failed statement on the replica takes it out of rotation until the next check.
+        event.listen(engine, "handle_error", self.on_error)
+
+    def measure_lag(self, connection) -> float:
+        if connection.dialect.name != "postgresql":
+            return 0.0
+        return float(connection.scalar(LAG_QUERY))
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                self.lag_seconds = self.measure_lag(connection)
+            self.available = self.lag_seconds <= self.max_lag_seconds
+        # asyncpg raises refused connections and connect timeouts as they are, not wrapped in a DBAPIError.
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError) as e:
+            print(f"Replica {self.name} unavailable: {e}")
+            self.lag_seconds = None
+            self.available = False
+
+    def usable(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            due = self.checked_at is None or now - self.checked_at >= self.check_seconds
+            if due:
+                self.checked_at = now
+        if due:
+            self.check()
+        return self.available
+
+    def lag_bound(self) -> float:
+        # Lag cannot grow faster than wall time, so the last measurement plus the time since it
+        # bounds how far behind the replica may be now.
+        with self.lock:
+            checked_at = self.checked_at
+        return (self.lag_seconds or 0.0) + (time.monotonic() - checked_at if checked_at is not None else 0.0)
+
+    def on_error(self, context):
+        if context.is_disconnect or context.connection is None:
+            self.available = False
+
+    def count(self, target: str):
+        with self.lock:
+            self.routed[target] += 1
+
+_monitors: dict[str, ReplicaMonitor] = {}
+
+def is_read_only(clause) -> bool:
+    if isinstance(clause, Select):
+        return clause._for_update_arg is None
+    if isinstance(clause, CompoundSelect):
+        return True
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() == "SELECT"
+    # DML, DDL and bare connection() calls without a statement.
+    return False
+
+class RoutingSession(Session):
+    # Reads go to the replica while it is healthy. The first write, flush or locking read pins the session
+    # to the primary for the rest of its life, so a request reads its own writes. Works as the
+    # sync_session_class of an AsyncSession too, given the engines' sync_engine.
+    def __init__(self, primary=None, replica=None, monitor: ReplicaMonitor | None = None, **kw):
+        super().__init__(**kw)
+        self.primary = primary
+        self.replica = replica
+        self.monitor = monitor
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.replica is None:
+            return self.primary
+        if self.info.get("pinned_to_primary"):
+            self.monitor.count("primary")
+            return self.primary
+        if self._flushing or not is_read_only(clause):
+            self.info["pinned_to_primary"] = True
+            self.monitor.count("primary")
+            return self.primary
+        if self.monitor.usable():
+            self.monitor.count("replica")
+            # Lets callers tell whether what they read may predate recent writes, see served_lag().
+            self.info["replica_lag"] = max(self.info.get("replica_lag", 0.0), self.monitor.lag_bound())
+            return self.replica
+        self.monitor.count("fallback")
+        return self.primary
+
+def pin_to_primary(db):
+    # For work that must see and lock the primary's state even though it starts with plain SELECTs.
+    db.info["pinned_to_primary"] = True
+
+def served_lag(db) -> float | None:
+    # How stale the replica reads of this session may be; None when all its reads hit the primary.
+    return db.info.get("replica_lag")
+
+@metrics.register
+def replica_metrics():
+    available = metrics.Metric("lms_db_replica_available", "gauge", "Whether the replica is serving reads.")
+    lag = metrics.Metric("lms_db_replica_lag_seconds", "gauge", "Replication lag seen by the last check.")
+    routed = metrics.Metric("lms_db_routed_total", "counter",
+                            "Statements routed by read sessions; fallback = replica skipped as lagging or down.")
+    for name, monitor in _monitors.items():
+        available.add(int(monitor.available), engine=name)
+        if monitor.lag_seconds is not None:
+            lag.add(monitor.lag_seconds, engine=name)
+        for target, count in monitor.routed.items():
+            routed.add(count, engine=name, target=target)
+    return [available, lag, routed]
@@ -0,0 +1,50 @@
+import sys
+from sqlalchemy import inspect, text
+from models import Base
+
+def is_covered(columns: tuple, indexes: list[tuple]) -> bool:
+    # An index covers a foreign key when the key's columns are its leading columns.
+    return any(set(index[:len(columns)]) == set(columns) for index in indexes)
+
+def find_unindexed_foreign_keys(engine, metadata=Base.metadata):
+    inspector = inspect(engine)
+    problems = []
+
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            problems.append({"table": table.name, "columns": [], "problem": "table missing in database"})
+            continue
+
+        indexes = [tuple(ix["column_names"]) for ix in inspector.get_indexes(table.name)]
+        indexes.append(tuple(inspector.get_pk_constraint(table.name)["constrained_columns"]))
+        indexes.extend(tuple(uc["column_names"]) for uc in inspector.get_unique_constraints(table.name))
+
+        foreign_keys = {tuple(c.name for c in fk.columns) for fk in table.foreign_key_constraints}
+        foreign_keys.update(tuple(fk["constrained_columns"]) for fk in inspector.get_foreign_keys(table.name))
+
+        for columns in sorted(foreign_keys):
+            if not is_covered(columns, indexes):
+                problems.append({"table": table.name, "columns": list(columns), "problem": "foreign key without index"})
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            invalid = conn.execute(text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+            )).scalars().all()
+        problems.extend({"table": None, "columns": [], "problem": f"invalid index {name}"} for name in invalid)
+
+    return problems
+
+def main():
+    from database import engine
+
+    problems = find_unindexed_foreign_keys(engine)
+    for problem in problems:
+        columns = ", ".join(problem["columns"])
+        print(f"{problem['table']}({columns}): {problem['problem']}")
+    if not problems:
+        print("Schema lint passed: every foreign key is indexed.")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class CourseBase(BaseModel):
@@ -7,8 +7,19 @@ class CourseBase(BaseModel):
     price: int
     description: Optional[str] = None
 
+class ModuleCreate(BaseModel):
+    title: str = Field(..., min_length=1, max_length=150)
+    content: Optional[str] = None
+
+class AssignmentCreate(BaseModel):
+    title: str = Field(..., min_length=1, max_length=150)
+    max_score: int = Field(100, ge=1)
+    due_date: Optional[datetime] = None
+
 class CourseCreate(CourseBase):
-    pass
+    instructor_id: int = 1
+    modules: List[ModuleCreate] = []
+    assignments: List[AssignmentCreate] = []
 
 class CourseResponse(CourseBase):
     id: int
@@ -17,6 +28,30 @@ class CourseResponse(CourseBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class CourseSearchResult(CourseResponse):
+    rank: float
+    title_highlight: str
+    description_highlight: Optional[str] = None
+
+class ModuleResponse(BaseModel):
+    id: int
+    title: Optional[str] = None
+    order_index: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class AssignmentResponse(BaseModel):
+    id: int
+    title: Optional[str] = None
+    max_score: Optional[int] = None
+    due_date: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class CourseDetailResponse(CourseResponse):
+    modules: List[ModuleResponse] = []
+    assignments: List[AssignmentResponse] = []
+
 class UserBase(BaseModel):
     email: str
     full_name: str
@@ -28,4 +63,135 @@ class UserResponse(UserBase):
     id: int
     is_active: bool
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class BulkEnrollmentRequest(BaseModel):
+    student_ids: List[Any]
+
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+    value: Optional[str] = None
+
+class BulkResult(BaseModel):
+    created: int
+    errors: List[BulkRowError]
+
+class BulkGradeRequest(BaseModel):
+    grades: List[Any]
+
+class GradeResult(BaseModel):
+    row: int
+    submission_id: int
+    score: int
+    letter_grade: str
+
+class BulkGradeResult(BaseModel):
+    graded: int
+    results: List[GradeResult]
+    errors: List[BulkRowError]
+
+class StudentPerformanceRow(BaseModel):
+    student_name: str
+    email: str
+    submitted_works_count: int
+    average_score: Optional[float] = None
+    best_score: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class InstructorRevenueRow(BaseModel):
+    instructor_name: str
+    courses_created: int
+    total_enrollments: int
+    total_revenue: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class StudentPerformanceReport(BaseModel):
+    refreshed_at: datetime
+    items: List[StudentPerformanceRow]
+
+class InstructorRevenueReport(BaseModel):
+    refreshed_at: datetime
+    items: List[InstructorRevenueRow]
+
+class GradeDistribution(BaseModel):
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[int] = None
+    max: Optional[int] = None
+    percentiles: Dict[str, float]
+    histogram: List[int]
+    letter_grades: Dict[str, int]
+    outliers: List[int]
+
+class AssignmentGradebook(GradeDistribution):
+    assignment_id: int
+
+class CourseGradebook(BaseModel):
+    course_id: int
+    overall: GradeDistribution
+    assignments: List[AssignmentGradebook]
+
+class DashboardCourse(BaseModel):
+    course_id: int
+    title: str
+    status: Optional[str] = None
+    enrolled_at: Optional[datetime] = None
+    assignments_count: int
+    submitted_count: int
+    graded_count: int
+    progress: float
+    average_percent: Optional[float] = None
+
+class DashboardAssignment(BaseModel):
+    assignment_id: int
+    course_id: int
+    course_title: str
+    title: Optional[str] = None
+    max_score: Optional[int] = None
+    due_date: datetime
+
+class DashboardScore(BaseModel):
+    submission_id: int
+    assignment_id: int
+    course_id: int
+    title: Optional[str] = None
+    score: int
+    max_score: Optional[int] = None
+    percent: int
+    letter_grade: str
+    submitted_at: Optional[datetime] = None
+
+class StudentDashboard(BaseModel):
+    user_id: int
+    courses: List[DashboardCourse]
+    upcoming: List[DashboardAssignment]
+    recent_scores: List[DashboardScore]
+
+class JobCreate(BaseModel):
+    kind: str
+    payload: Dict[str, Any] = {}
+    max_attempts: Optional[int] = None
+    delay: int = Field(0, ge=0)
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    last_error: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def status_value(cls, value):
+        return getattr(value, "value", value)
@@ -1,9 +1,30 @@
-from sqlalchemy.orm import Session
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Iterable
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func, desc
-from models import User, Course, Module, UserRole, Enrollment, Assignment, Submission
+from sqlalchemy import select, insert, update, values, column, Integer, func, desc
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import User, Course, Module, UserRole, Enrollment, EnrollmentStatus, Assignment, Submission
 from repositories.user_repository import user_repo
 from repositories.course_repository import course_repo
+import analytics
+import idempotency
+import dashboard
+from utils import calculate_letter_grades, percentage
+
+CATALOG_DEFAULT_PAGE_SIZE = int(os.getenv("CATALOG_DEFAULT_PAGE_SIZE", "50"))
+CATALOG_MAX_PAGE_SIZE = int(os.getenv("CATALOG_MAX_PAGE_SIZE", "200"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+SEARCH_DEFAULT_PAGE_SIZE = int(os.getenv("SEARCH_DEFAULT_PAGE_SIZE", "20"))
+COURSE_IDEMPOTENCY_SCOPE = "courses.create"
+
+def chunked(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 def create_user(db: Session, full_name: str, email: str, role: UserRole):
     return user_repo.create(db, {
@@ -12,58 +33,253 @@ def create_user(db: Session, full_name: str, email: str, role: UserRole):
         "role": role
     })
 
-def create_course_with_modules(db: Session, instructor_id: int, title: str, price: int, module_titles: list[str]):
+def module_rows(course_id: int, modules: Iterable) -> list[dict]:
+    rows = []
+    for index, module in enumerate(modules, start=1):
+        if isinstance(module, str):
+            module = {"title": module}
+        rows.append({
+            "course_id": course_id,
+            "title": module["title"],
+            "order_index": index,
+            "content": module.get("content") or f"Content for {module['title']}",
+        })
+    return rows
+
+def assignment_rows(course_id: int, assignments: Iterable[dict]) -> list[dict]:
+    return [
+        {
+            "course_id": course_id,
+            "title": assignment["title"],
+            "max_score": assignment.get("max_score", 100),
+            "due_date": assignment.get("due_date"),
+        }
+        for assignment in assignments
+    ]
+
+def insert_course(db: Session, instructor_id: int, title: str, price: int, modules: Iterable = (),
+                  description: str | None = None, assignments: Iterable[dict] = ()):
+    # One INSERT ... RETURNING per table, whatever the number of modules and assignments.
+    course = db.scalars(
+        insert(Course).values(title=title, description=description, price=price, instructor_id=instructor_id)
+        .returning(Course)
+    ).one()
+    # RETURNING skips the deferred description; the value is the one just inserted.
+    set_committed_value(course, "description", description)
+    children = {"modules": [], "assignments": []}
+    for name, model, rows in (("modules", Module, module_rows(course.id, modules)),
+                              ("assignments", Assignment, assignment_rows(course.id, assignments))):
+        if rows:
+            children[name] = db.scalars(insert(model).returning(model, sort_by_parameter_order=True), rows).all()
+    # The new collections are known exactly, so mark them loaded instead of letting them lazy load.
+    for name, objects in children.items():
+        set_committed_value(course, name, objects)
+    return course
+
+def create_course(db: Session, instructor_id: int, title: str, price: int, modules: Iterable = (),
+                  description: str | None = None, assignments: Iterable[dict] = (), idempotency_key: str | None = None):
+    # Returns (course, created); created is False when idempotency_key replays an earlier request.
+    modules, assignments = list(modules), list(assignments)
     try:
-        new_course = Course(title=title, price=price, instructor_id=instructor_id)
-        db.add(new_course)
-        db.flush() 
-
-        for index, mod_title in enumerate(module_titles, start=1):
-            new_module = Module(
-                title=mod_title,
-                course_id=new_course.id,
-                order_index=index,
-                content=f"Content for {mod_title}"
-            )
-            db.add(new_module)
+        if idempotency_key is not None:
+            digest = idempotency.fingerprint([instructor_id, title, price, description, modules, assignments])
+            previous_id = idempotency.claim(db, COURSE_IDEMPOTENCY_SCOPE, idempotency_key, digest)
+            if previous_id is not None:
+                return course_repo.get_by_id(db, previous_id, "with_modules_and_assignments"), False
 
+        new_course = insert_course(db, instructor_id, title, price, modules, description, assignments)
+        if idempotency_key is not None:
+            idempotency.record(db, COURSE_IDEMPOTENCY_SCOPE, idempotency_key, new_course.id)
         db.commit()
+        course_repo.invalidate(new_course)
         print(f"Course '{title}' created successfully.")
-        return new_course
+        return new_course, True
 
+    except ValueError:
+        db.rollback()
+        raise
     except SQLAlchemyError as e:
         db.rollback()
         print(f"Error creating course: {e}")
-        return None
+        return None, False
+
+def create_course_with_modules(db: Session, instructor_id: int, title: str, price: int, module_titles: list[str]):
+    return create_course(db, instructor_id, title, price, module_titles)[0]
 
 def enroll_student(db: Session, student_id: int, course_id: int):
     try:
         enrollment = Enrollment(user_id=student_id, course_id=course_id)
         db.add(enrollment)
+        analytics.record_enrollments(db, course_id)
         db.commit()
+        dashboard.invalidate(student_id)
         print(f"Student {student_id} enrolled in course {course_id}")
         return enrollment
     except SQLAlchemyError as e:
         db.rollback()
         print(f"Error enrolling student: {e}")
 
+class InvalidRow:
+    # Stands in for an input row that could not be parsed, so it is rejected with its row number
+    # like any other bad row instead of aborting the import.
+    def __init__(self, error: str):
+        self.error = error
+
+    def __str__(self):
+        return self.error
+
+def user_row_values(row: dict) -> dict:
+    if isinstance(row, InvalidRow):
+        raise ValueError(row.error)
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    full_name = str(row.get("full_name") or "").strip()
+    email = str(row.get("email") or "").strip()
+    if not full_name:
+        raise ValueError("full_name is required")
+    if not email:
+        raise ValueError("email is required")
+    try:
+        role = UserRole(row.get("role") or UserRole.STUDENT.value)
+    except ValueError:
+        raise ValueError("Invalid role. Use: student, instructor, admin")
+    return {"full_name": full_name, "email": email, "role": role, "is_active": True}
+
+def bulk_create_users(db: Session, rows: Iterable[dict], chunk_size: int = BULK_CHUNK_SIZE):
+    result = {"created": 0, "errors": []}
+    seen_emails = set()
+    for chunk in chunked(enumerate(rows), chunk_size):
+        import_user_chunk(db, chunk, seen_emails, result)
+    print(f"Bulk user import: {result['created']} created, {len(result['errors'])} rejected.")
+    return result
+
+def import_user_chunk(db: Session, chunk: list[tuple[int, dict]], seen_emails: set, result: dict):
+    errors = result["errors"]
+    pending = []
+    for index, row in chunk:
+        try:
+            values = user_row_values(row)
+        except ValueError as e:
+            errors.append({"row": index, "error": str(e)})
+            continue
+        if values["email"] in seen_emails:
+            errors.append({"row": index, "error": "Duplicate email in input", "value": values["email"]})
+            continue
+        seen_emails.add(values["email"])
+        pending.append((index, values))
+
+    if not pending:
+        return
+
+    try:
+        stmt = pg_insert(User)\
+            .values([values for _, values in pending])\
+            .on_conflict_do_nothing(index_elements=[User.email])\
+            .returning(User.email)
+        inserted = set(db.scalars(stmt))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Error importing users: {e}")
+        errors.extend({"row": index, "error": "Database error", "value": values["email"]} for index, values in pending)
+        return
+
+    result["created"] += len(inserted)
+    errors.extend(
+        {"row": index, "error": "Email already registered", "value": values["email"]}
+        for index, values in pending if values["email"] not in inserted
+    )
+
+def bulk_enroll_students(db: Session, course_id: int, student_ids: Iterable[int], chunk_size: int = BULK_CHUNK_SIZE):
+    if db.get(Course, course_id) is None:
+        return None
+
+    created = 0
+    errors = []
+    seen_ids = set()
+
+    for chunk in chunked(enumerate(student_ids), chunk_size):
+        pending = []
+        for index, student_id in chunk:
+            if isinstance(student_id, InvalidRow):
+                errors.append({"row": index, "error": student_id.error})
+                continue
+            try:
+                student_id = int(student_id)
+            except (TypeError, ValueError):
+                errors.append({"row": index, "error": "student_id must be an integer", "value": str(student_id)})
+                continue
+            if student_id in seen_ids:
+                errors.append({"row": index, "error": "Duplicate student in input", "value": str(student_id)})
+                continue
+            seen_ids.add(student_id)
+            pending.append((index, student_id))
+
+        if not pending:
+            continue
+
+        ids = [student_id for _, student_id in pending]
+        try:
+            existing_users = set(db.scalars(select(User.id).where(User.id.in_(ids))))
+
+            to_insert = []
+            for index, student_id in pending:
+                if student_id not in existing_users:
+                    errors.append({"row": index, "error": "User not found", "value": str(student_id)})
+                else:
+                    to_insert.append((index, student_id))
+
+            # The unique index decides who is already enrolled, so a concurrent request enrolling the same
+            # students cannot slip in between a check and the insert.
+            enrolled = set()
+            if to_insert:
+                stmt = pg_insert(Enrollment).values([
+                    {"user_id": student_id, "course_id": course_id, "status": EnrollmentStatus.ACTIVE}
+                    for _, student_id in to_insert
+                ])
+                enrolled = set(db.scalars(
+                    stmt.on_conflict_do_nothing(index_elements=[Enrollment.user_id, Enrollment.course_id])
+                    .returning(Enrollment.user_id)
+                ))
+                if enrolled:
+                    analytics.record_enrollments(db, course_id, len(enrolled))
+            db.commit()
+            errors.extend({"row": index, "error": "Already enrolled", "value": str(student_id)}
+                          for index, student_id in to_insert if student_id not in enrolled)
+            dashboard.invalidate(*enrolled)
+            created += len(enrolled)
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Error enrolling students: {e}")
+            errors.extend({"row": index, "error": "Database error", "value": str(student_id)} for index, student_id in pending)
+
+    print(f"Bulk enrollment into course {course_id}: {created} enrolled, {len(errors)} rejected.")
+    return {"created": created, "errors": errors}
+
 def create_assignment(db: Session, course_id: int, title: str, max_score: int):
     assignment = Assignment(course_id=course_id, title=title, max_score=max_score)
     db.add(assignment)
     db.commit()
+    dashboard.invalidate_all()
     db.refresh(assignment)
     return assignment
 
 def submit_homework(db: Session, assignment_id: int, student_id: int, content: str):
     submission = Submission(assignment_id=assignment_id, student_id=student_id, content=content)
     db.add(submission)
+    analytics.record_submission(db, student_id)
     db.commit()
+    dashboard.invalidate(student_id)
     db.refresh(submission)
     return submission
 
 def grade_submission(db: Session, submission_id: int, score: int):
     try:
-        submission = db.query(Submission).filter(Submission.id == submission_id).first()
+        submission = db.scalars(
+            select(Submission)
+            .options(joinedload(Submission.assignment))
+            .where(Submission.id == submission_id)
+        ).first()
         if not submission:
             print(f"Submission {submission_id} not found.")
             return None
@@ -73,8 +289,11 @@ def grade_submission(db: Session, submission_id: int, score: int):
             print(f"Error: Score {score} is invalid. Max allowed: {assignment.max_score}")
             return None
 
+        old_score = submission.score
         submission.score = score
+        analytics.record_grade(db, submission.student_id, old_score, score)
         db.commit()
+        dashboard.invalidate(submission.student_id)
         print(f"Submission {submission_id} graded. Score: {score}/{assignment.max_score}")
         return submission
 
@@ -83,6 +302,82 @@ def grade_submission(db: Session, submission_id: int, score: int):
         print(f"Error grading submission: {e}")
         return None
 
+def whole_number(value) -> int:
+    # int() would truncate 95.7 and accept True or "95"; a grade row has to say exactly what it means.
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise ValueError(f"{value!r} is not an integer")
+    return int(value)
+
+def grade_row_values(row) -> tuple[int, int]:
+    try:
+        if isinstance(row, dict):
+            submission_id, score = row.get("submission_id"), row.get("score")
+        else:
+            submission_id, score = row
+        return whole_number(submission_id), whole_number(score)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("submission_id and score must be integers")
+
+def bulk_grade_submissions(db: Session, assignment_id: int, grades: Iterable):
+    assignment = db.get(Assignment, assignment_id)
+    if assignment is None:
+        return None
+
+    errors = []
+    pending = {}
+    for index, row in enumerate(grades):
+        try:
+            submission_id, score = grade_row_values(row)
+        except ValueError as e:
+            errors.append({"row": index, "error": str(e), "value": str(row)})
+            continue
+        if score < 0 or score > assignment.max_score:
+            errors.append({"row": index, "error": f"Score must be between 0 and {assignment.max_score}", "value": str(score)})
+        elif submission_id in pending:
+            errors.append({"row": index, "error": "Duplicate submission in input", "value": str(submission_id)})
+        else:
+            pending[submission_id] = (index, score)
+
+    try:
+        existing = dict(db.execute(
+            select(Submission.id, Submission.student_id)
+            .where(Submission.assignment_id == assignment_id, Submission.id.in_(list(pending)))
+        ).all()) if pending else {}
+
+        for submission_id, (index, score) in list(pending.items()):
+            if submission_id not in existing:
+                errors.append({"row": index, "error": "Submission not found for this assignment", "value": str(submission_id)})
+                del pending[submission_id]
+
+        if pending:
+            # One UPDATE ... FROM (VALUES ...) for the whole batch instead of a round-trip per grade.
+            new_scores = values(column("id", Integer), column("score", Integer), name="new_scores")\
+                .data([(submission_id, score) for submission_id, (_, score) in pending.items()])
+            db.execute(
+                update(Submission)
+                .where(Submission.id == new_scores.c.id)
+                .values(score=new_scores.c.score)
+                .execution_options(synchronize_session=False)
+            )
+            analytics.refresh_students(db, sorted(set(existing[submission_id] for submission_id in pending)))
+        db.commit()
+        dashboard.invalidate(*set(existing[submission_id] for submission_id in pending))
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Error grading submissions: {e}")
+        errors.extend({"row": index, "error": "Database error", "value": str(submission_id)}
+                      for submission_id, (index, _) in pending.items())
+        return {"graded": 0, "results": [], "errors": sorted(errors, key=lambda e: e["row"])}
+
+    letters = calculate_letter_grades(percentage(score, assignment.max_score) for _, score in pending.values())
+    results = [
+        {"row": index, "submission_id": submission_id, "score": score, "letter_grade": letter}
+        for (submission_id, (index, score)), letter in zip(pending.items(), letters)
+    ]
+
+    print(f"Bulk grading for assignment {assignment_id}: {len(results)} graded, {len(errors)} rejected.")
+    return {"graded": len(results), "results": results, "errors": sorted(errors, key=lambda e: e["row"])}
+
 def soft_delete_user(db: Session, user_id: int):
     try:
         user = user_repo.get_by_id(db, user_id)
@@ -92,6 +387,7 @@ def soft_delete_user(db: Session, user_id: int):
         
         user.is_active = False
         db.commit()
+        user_repo.invalidate(user)
         print(f"User {user_id} deactivated.")
         return True
     except SQLAlchemyError as e:
@@ -112,26 +408,72 @@ def hard_delete_module(db: Session, module_id: int):
         db.rollback()
         return False
 
-def get_courses_by_price_range(db: Session, min_price: int, max_price: int):
-    return course_repo.get_expensive_courses(db, min_price)
+def get_course(db: Session, course_id: int, plan: str | None = "with_modules_and_assignments"):
+    return course_repo.get_by_id(db, course_id, plan)
+
+def course_modules_statement(course_id: int):
+    # Metadata only; module bodies are deferred and served by GET /modules/{id}/content.
+    return select(Module.id, Module.title, Module.order_index)\
+        .where(Module.course_id == course_id)\
+        .order_by(Module.order_index, Module.id)
+
+def get_course_modules(db: Session, course_id: int):
+    rows = db.execute(course_modules_statement(course_id)).all()
+    if not rows and db.get(Course, course_id) is None:
+        return None
+    return rows
+
+def get_courses_by_price_range(db: Session, min_price: int, max_price: int, plan: str | None = None):
+    return course_repo.get_by_price_range(db, min_price, max_price, plan)
+
+def catalog_page_size(min_price: int, max_price: int, limit: int | None) -> int:
+    if min_price > max_price:
+        raise ValueError("min_price must not be greater than max_price")
+    return min(limit or CATALOG_DEFAULT_PAGE_SIZE, CATALOG_MAX_PAGE_SIZE)
+
+def get_course_catalog_page(db: Session, min_price: int, max_price: int, limit: int | None = None,
+                            cursor: str | None = None, sort: str = "price_asc", plan: str | None = None):
+    limit = catalog_page_size(min_price, max_price, limit)
+    return course_repo.get_catalog_page(db, min_price, max_price, limit, cursor, sort, plan)
 
-def get_student_average_scores(db: Session):
-    return db.query(
+def get_course_catalog_rows(db: Session, min_price: int, max_price: int, columns: tuple[str, ...],
+                            limit: int | None = None, cursor: str | None = None, sort: str = "price_asc"):
+    limit = catalog_page_size(min_price, max_price, limit)
+    return course_repo.get_catalog_rows(db, min_price, max_price, limit, columns, cursor, sort)
+
+def search_page_size(q: str, limit: int | None) -> int:
+    if not q.strip():
+        raise ValueError("Search query must not be empty")
+    return min(limit or SEARCH_DEFAULT_PAGE_SIZE, CATALOG_MAX_PAGE_SIZE)
+
+def search_courses(db: Session, q: str, limit: int | None = None, cursor: str | None = None):
+    return course_repo.search(db, q, search_page_size(q, limit), cursor)
+
+def student_average_scores_statement(since: datetime | None = None):
+    stmt = select(
         User.full_name,
         func.avg(Submission.score).label("average_score"),
         func.count(Submission.id).label("submissions_count")
     ).join(Submission, User.id == Submission.student_id)\
      .group_by(User.id)\
      .having(func.count(Submission.id) > 0)\
-     .order_by(desc("average_score"))\
-     .all()
+     .order_by(desc("average_score"))
+    # A bound on submitted_at lets the planner skip the monthly partitions before it.
+    if since is not None:
+        stmt = stmt.where(Submission.submitted_at >= since)
+    return stmt
 
-def get_instructor_revenue(db: Session):
-    return db.query(
+def instructor_revenue_statement():
+    return select(
         User.full_name,
         func.count(Enrollment.id).label("total_sales"),
         func.sum(Course.price).label("total_revenue")
     ).join(Course, User.id == Course.instructor_id)\
      .join(Enrollment, Course.id == Enrollment.course_id)\
-     .group_by(User.id)\
-     .all()
\ No newline at end of file
+     .group_by(User.id)
+
+def get_student_average_scores(db: Session, since: datetime | None = None):
+    return db.execute(student_average_scores_statement(since)).all()
+
+def get_instructor_revenue(db: Session):
+    return db.execute(instructor_revenue_statement()).all()
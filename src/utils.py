@@ -1,3 +1,5 @@
+from bisect import bisect_right
+
 def calculate_letter_grade(score: int) -> str:
     if score < 0 or score > 100:
         raise ValueError("Score must be between 0 and 100")
@@ -13,5 +15,19 @@ def calculate_letter_grade(score: int) -> str:
     else:
         return "F"
 
+LETTER_GRADE_CUTOFFS = (60, 70, 80, 90)
+LETTER_GRADES = "FDCBA"
+
+def calculate_letter_grades(scores) -> list[str]:
+    scores = list(scores)
+    if any(score < 0 or score > 100 for score in scores):
+        raise ValueError("Score must be between 0 and 100")
+    return [LETTER_GRADES[bisect_right(LETTER_GRADE_CUTOFFS, score)] for score in scores]
+
+def percentage(score: int, max_score: int) -> int:
+    if max_score <= 0:
+        return 100
+    return score * 100 // max_score
+
 def format_full_name(first_name: str, last_name: str) -> str:
     return f"{first_name.strip().title()} {last_name.strip().title()}"
\ No newline at end of file
@@ -0,0 +1,67 @@
+import argparse
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from database import SessionLocal, engine
+import jobs
+
+def reset_engine():
+    # Pooled connections inherited from the parent process must not be reused after fork.
+    engine.dispose(close=False)
+
+def make_executor(mode: str, concurrency: int):
+    if mode == "process":
+        return ProcessPoolExecutor(max_workers=concurrency, initializer=reset_engine)
+    return ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run queued background jobs.")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("JOB_CONCURRENCY", "4")))
+    parser.add_argument("--mode", choices=("thread", "process"), default=os.getenv("JOB_POOL_MODE", "thread"))
+    parser.add_argument("--poll-interval", type=float, default=float(os.getenv("JOB_POLL_INTERVAL", "1")))
+    parser.add_argument("--once", action="store_true", help="run whatever is runnable now, then exit")
+    args = parser.parse_args(argv)
+
+    stopping = False
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        print("Worker stopping after running jobs finish...")
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    worker = jobs.worker_name()
+    running = set()
+    db = SessionLocal()
+    print(f"Worker {worker} started ({args.mode} pool, concurrency {args.concurrency}).")
+    with make_executor(args.mode, args.concurrency) as executor:
+        try:
+            last_requeue = 0.0
+            while not stopping:
+                if time.monotonic() - last_requeue > 60:
+                    jobs.requeue_stale(db)
+                    last_requeue = time.monotonic()
+
+                free = args.concurrency - len(running)
+                claimed = jobs.claim(db, worker, free) if free > 0 else []
+                running.update(executor.submit(jobs.run_job, job_id) for job_id in claimed)
+
+                if args.once and not running:
+                    break
+                if running:
+                    done, _ = wait(running, timeout=args.poll_interval, return_when=FIRST_COMPLETED)
+                    running.difference_update(done)
+                    for future in done:
+                        if future.exception() is not None:
+                            print(f"Error running job: {future.exception()}")
+                elif not claimed:
+                    time.sleep(args.poll_interval)
+        finally:
+            wait(running)
+            db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,11 +3,26 @@ import os
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
 from models import Base, User, Course, Enrollment, Module, Assignment, Submission
-from database import SQLALCHEMY_DATABASE_URL
+from database import SQLALCHEMY_DATABASE_URL, ASYNC_DATABASE_URL
+from repositories.base_repository import BaseRepository
+import cache
+
+@pytest.fixture(autouse=True)
+def strict_loading(monkeypatch):
+    monkeypatch.setattr(BaseRepository, "strict_loading", True)
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    # Every test recreates the schema, so ids from a previous test must not be served from cache.
+    previous = cache.get_cache()
+    yield cache.set_cache(cache.MemoryCache())
+    cache.set_cache(previous)
 
 @pytest.fixture(scope="function")
 def db_session():
@@ -20,4 +35,18 @@ def db_session():
     
     yield session
     
-    session.close()
\ No newline at end of file
+    session.close()
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="function")
+async def async_db_session(db_session):
+    engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    TestingAsyncSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async with TestingAsyncSessionLocal() as session:
+        yield session
+
+    await engine.dispose()
@@ -1,17 +1,29 @@
 import pytest
+from dataclasses import replace
 from fastapi.testclient import TestClient
 from src.main_api import app
-from src.database import get_db
+# main_api imports its siblings from src/ directly, so the dependencies it declares live in `database`,
+# not in `src.database`.
+import database
 
 @pytest.fixture
-def client(db_session):
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
-    
-    app.dependency_overrides[get_db] = override_get_db
+def api_database(db_session):
+    # The database db_session just rebuilt. Without a pool of its own no connection outlives
+    # the event loop of the TestClient that opened it.
+    return database.Database(replace(database.get_settings(), pool_mode="external"))
+
+@pytest.fixture
+def client(api_database):
+    async def override_get_async_db():
+        async with api_database.async_sessions() as db:
+            yield db
+
+    async def override_get_async_read_db():
+        async with api_database.async_read_sessions() as db:
+            yield db
+
+    app.dependency_overrides[database.get_async_db] = override_get_async_db
+    app.dependency_overrides[database.get_async_read_db] = override_get_async_read_db
     
     with TestClient(app) as test_client:
         yield test_client
@@ -58,4 +70,498 @@ def test_get_courses_list(client):
 
 def test_get_non_existent_user(client):
     response = client.get("/users/99999")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_get_courses_keyset_pagination(client, db_session):
+    import services
+    from models import UserRole
+
+    instructor = services.create_user(db_session, "Page Teacher", "page@test.com", UserRole.INSTRUCTOR)
+    for price in (100, 200, 200, 300, 5000):
+        services.create_course_with_modules(db_session, instructor.id, f"Course {price}", price, [])
+
+    first = client.get("/courses/", params={"min_price": 100, "max_price": 300, "limit": 2})
+    assert first.status_code == 200
+    assert [c["price"] for c in first.json()] == [100, 200]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get("/courses/", params={"min_price": 100, "max_price": 300, "limit": 2, "cursor": cursor})
+    assert [c["price"] for c in second.json()] == [200, 300]
+    assert "X-Next-Cursor" not in second.headers
+
+    desc = client.get("/courses/", params={"max_price": 300, "sort": "price_desc"})
+    assert [c["price"] for c in desc.json()] == [300, 200, 200, 100]
+
+    mismatched = client.get("/courses/", params={"min_price": 100, "max_price": 300, "sort": "price_desc", "cursor": cursor})
+    assert mismatched.status_code == 400
+
+def test_read_routes_fall_back_to_primary_when_replica_is_unreachable(client, api_database):
+    settings = replace(api_database.settings, replica_url="postgresql://postgres@127.0.0.1:1/lms_db",
+                       replica_async_url="postgresql+asyncpg://postgres@127.0.0.1:1/lms_db")
+    routed = database.Database(settings)
+
+    async def override_get_async_read_db():
+        async with routed.async_read_sessions() as db:
+            yield db
+
+    app.dependency_overrides[database.get_async_read_db] = override_get_async_read_db
+    response = client.get("/courses/")
+    assert response.status_code == 200
+    monitor = routed.async_read_sessions.kw["monitor"]
+    assert not monitor.available
+    assert monitor.routed["fallback"] >= 1
+
+def test_get_courses_invalid_cursor(client):
+    response = client.get("/courses/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_read_root_has_no_n_plus_one(client, db_session, api_database, monkeypatch):
+    import services
+    from sqlalchemy import event
+    from models import UserRole
+
+    monkeypatch.setattr(services, "CATALOG_DEFAULT_PAGE_SIZE", 2)
+    for i in range(3):
+        instructor = services.create_user(db_session, f"Teacher {i}", f"t{i}@n1.com", UserRole.INSTRUCTOR)
+        services.create_course_with_modules(db_session, instructor.id, f"Course {i}", 100 + i, [])
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(api_database.async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        response = client.get("/")
+    finally:
+        event.remove(api_database.async_engine.sync_engine, "before_cursor_execute", count)
+
+    assert response.status_code == 200
+    # The home page shows the first catalog page, not every course.
+    assert "Teacher 1" in response.text and "Teacher 2" not in response.text
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert len([s for s in selects if "table_versions" not in s]) == 1
+
+def test_get_course_detail(client, db_session):
+    import services
+    from models import UserRole
+
+    instructor = services.create_user(db_session, "Detail Teacher", "detail@test.com", UserRole.INSTRUCTOR)
+    course = services.create_course_with_modules(db_session, instructor.id, "Detail", 10, ["B", "A"])
+    services.create_assignment(db_session, course.id, "HW", 50)
+
+    response = client.get(f"/courses/{course.id}")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [m["title"] for m in data["modules"]] == ["B", "A"]
+    assert data["assignments"][0]["max_score"] == 50
+    assert client.get("/courses/99999").status_code == 404
+
+def test_metrics_expose_pool_usage(client):
+    assert client.get("/health").json()["database"] == "ok"
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'lms_db_pool_checkouts_total{engine="primary_async"}' in response.text
+    assert "lms_db_pool_wait_seconds_total" in response.text
+    assert "lms_db_pool_connects_total" in response.text
+    assert 'lms_cache_hits_total{backend="memory"}' in response.text
+
+def test_bulk_user_import_api(client):
+    response = client.post("/users/bulk", json=[
+        {"full_name": "Bulk One", "email": "one@bulk.com"},
+        {"full_name": "Bulk One Again", "email": "one@bulk.com"},
+    ])
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    assert response.json()["errors"] == [{"row": 1, "error": "Duplicate email in input", "value": "one@bulk.com"}]
+
+    lines = iter([b'{"full_name": "Line Two", "email": "two@bulk.com"}\n{"full_', b'name": \n', b'"nope"\n'])
+    response = client.post("/users/bulk", content=lines, headers={"content-type": "application/x-ndjson"})
+    assert response.json() == {"created": 1, "errors": [
+        {"row": 1, "error": "Invalid JSON: Expecting value", "value": None},
+        {"row": 2, "error": "Row must be an object", "value": None},
+    ]}
+    assert client.post("/courses/99999/enrollments/bulk", json={"student_ids": [1]}).status_code == 404
+
+def test_analytics_endpoints_report_staleness(client):
+    import analytics
+
+    assert client.get("/analytics/student-performance", params={"max_staleness": 0}).status_code == 422
+    response = client.get("/analytics/student-performance", params={"max_staleness": analytics.MIN_STALENESS})
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+    assert response.json()["refreshed_at"]
+
+    assert client.get("/analytics/instructor-revenue").status_code == 200
+
+def test_catalog_conditional_get(client):
+    first = client.get("/courses/")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("public")
+
+    cached = client.get("/courses/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    other_page = client.get("/courses/?limit=5", headers={"If-None-Match": etag})
+    assert other_page.status_code == 200
+
+    client.post("/users/", json={"email": "etag@test.com", "full_name": "ETag Teacher", "role": "instructor"})
+    assert client.get("/courses/", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/courses/", json={"title": "Fresh", "price": 10})
+    changed = client.get("/courses/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert [c["title"] for c in changed.json()] == ["Fresh"]
+
+def test_user_conditional_get(client):
+    user_id = client.post("/users/", json={"email": "cond@test.com", "full_name": "Cond"}).json()["id"]
+
+    first = client.get(f"/users/{user_id}")
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert client.get(f"/users/{user_id}", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    assert client.get(f"/users/{user_id}", headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+
+    html = client.get("/")
+    assert client.get("/", headers={"If-None-Match": html.headers["etag"]}).status_code == 304
+
+def test_export_enrollments_streams_csv_and_ndjson(client, db_session):
+    import json
+    import services
+    from models import UserRole
+
+    teacher = services.create_user(db_session, "Export Teacher", "export-t@test.com", UserRole.INSTRUCTOR)
+    course = services.create_course_with_modules(db_session, teacher.id, "Exported", 100, [])
+    other = services.create_course_with_modules(db_session, teacher.id, "Other", 100, [])
+    for i in range(3):
+        student = services.create_user(db_session, f"Exported {i}", f"export{i}@test.com", UserRole.STUDENT)
+        services.enroll_student(db_session, student.id, course.id if i < 2 else other.id)
+
+    csv_response = client.get("/exports/enrollments", params={"course_id": course.id})
+    assert csv_response.status_code == 200
+    assert csv_response.headers["content-type"].startswith("text/csv")
+    lines = csv_response.text.strip().splitlines()
+    assert lines[0] == "id,user_id,course_id,status,enrolled_at"
+    assert len(lines) == 3
+
+    ndjson = client.get("/exports/enrollments", params={"format": "ndjson", "status": "active"})
+    rows = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [row["status"] for row in rows] == ["active"] * 3
+
+    assert client.get("/exports/enrollments", params={"status": "lost"}).status_code == 400
+    assert client.get("/exports/passwords").status_code == 400
+
+def test_bulk_grading_api(client, db_session):
+    import services
+    from models import UserRole
+
+    teacher = services.create_user(db_session, "Api Grader", "apigrader@test.com", UserRole.INSTRUCTOR)
+    course = services.create_course_with_modules(db_session, teacher.id, "Api Graded", 100, [])
+    assignment = services.create_assignment(db_session, course.id, "Quiz", 100)
+    student = services.create_user(db_session, "Api Student", "apistudent@test.com", UserRole.STUDENT)
+    submission = services.submit_homework(db_session, assignment.id, student.id, "answers")
+
+    response = client.post(f"/assignments/{assignment.id}/grades", json={"grades": [
+        {"submission_id": submission.id, "score": 88},
+        {"submission_id": submission.id + 100, "score": 50},
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["results"] == [{"row": 0, "submission_id": submission.id, "score": 88, "letter_grade": "B"}]
+    assert body["errors"][0]["error"] == "Submission not found for this assignment"
+    assert client.post("/assignments/999/grades", json={"grades": []}).status_code == 404
+
+    # Rows that are not objects are reported one by one instead of failing the batch.
+    mixed = client.post(f"/assignments/{assignment.id}/grades", json={"grades": [
+        [submission.id, 90], None, "junk", [submission.id], {"submission_id": submission.id, "score": 91},
+    ]})
+    assert mixed.status_code == 200
+    assert [r["row"] for r in mixed.json()["results"]] == [0]
+    assert [e["row"] for e in mixed.json()["errors"]] == [1, 2, 3, 4]
+
+def test_gradebook_api(client, db_session):
+    import services
+    from models import UserRole
+
+    teacher = services.create_user(db_session, "Api Book", "apibook@test.com", UserRole.INSTRUCTOR)
+    course = services.create_course_with_modules(db_session, teacher.id, "Api Booked", 100, [])
+    assignment = services.create_assignment(db_session, course.id, "Lab", 20)
+    student = services.create_user(db_session, "Api Booker", "apibooker@test.com", UserRole.STUDENT)
+    services.grade_submission(db_session, services.submit_homework(db_session, assignment.id, student.id, "lab").id, 17)
+
+    course_book = client.get(f"/analytics/courses/{course.id}/gradebook").json()
+    assert course_book["overall"]["letter_grades"]["B"] == 1
+    assert course_book["assignments"][0]["assignment_id"] == assignment.id
+
+    assignment_book = client.get(f"/analytics/assignments/{assignment.id}/gradebook").json()
+    assert assignment_book["mean"] == 85.0
+    assert client.get("/analytics/courses/999/gradebook").status_code == 404
+
+def test_jobs_api(client, db_session):
+    import jobs
+
+    assert client.post("/jobs", json={"kind": "refresh_analytics", "delay": -60}).status_code == 422
+    rejected = client.post("/jobs", json={"kind": "drop_tables"})
+    assert rejected.status_code == 400
+    for kind, payload in (("archive_submission_partitions", {"drop": True}), ("refresh_analytics", {}),
+                          ("student_performance_report", {"max_staleness": 0})):
+        assert client.post("/jobs", json={"kind": kind, "payload": payload}).status_code == 400
+    assert client.post("/jobs", json={"kind": "student_performance_report"}).status_code == 202
+
+    response = client.post("/jobs", json={"kind": "create_user", "payload": {"full_name": "Queued", "email": "queued@test.com"}})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+
+    assert jobs.run_pending(db_session) == 2
+    finished = client.get(f"/jobs/{job['id']}").json()
+    assert finished["status"] == "succeeded"
+    assert client.get(f"/users/{finished['result']['user_id']}").json()["email"] == "queued@test.com"
+    assert client.get("/jobs/999").status_code == 404
+
+def test_request_instrumentation(client, monkeypatch, caplog):
+    import json
+    import logging
+    import instrumentation
+
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.INFO, logger="lms"):
+        response = client.get("/courses/", params={"max_price": 500})
+
+    assert response.status_code == 200
+    assert 'queries"' in response.headers["server-timing"]
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+    request_log = [json.loads(r.message) for r in caplog.records if r.name == "lms.requests"][-1]
+    assert request_log["route"] == "/courses/"
+    assert request_log["queries"] >= 2
+    slow = [json.loads(r.message) for r in caplog.records if r.name == "lms.slow_queries"]
+    catalog = [entry for entry in slow if "FROM courses" in entry["statement"]]
+    assert catalog and "Scan" in catalog[0]["plan"]
+
+    scrape = client.get("/metrics").text
+    assert 'lms_db_queries_total{engine="primary_async"}' in scrape
+    assert 'lms_http_requests_total{method="GET",route="/courses/",status="200"}' in scrape
+    assert "lms_orm_rows_loaded_total" in scrape
+
+def test_course_search_ranks_and_paginates(client, db_session):
+    import services
+    from models import UserRole, Module
+
+    teacher = services.create_user(db_session, "Search Teacher", "search@test.com", UserRole.INSTRUCTOR)
+    titled = services.create_course_with_modules(db_session, teacher.id, "Design Patterns in Python", 100, ["Basics"])
+    moduled = services.create_course_with_modules(db_session, teacher.id, "Software Architecture", 200, ["Pattern catalogue", "Layers"])
+    services.create_course_with_modules(db_session, teacher.id, "Cooking", 50, ["Knives"])
+
+    response = client.get("/courses/search", params={"q": "pattern"})
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["id"] for r in results] == [titled.id, moduled.id]
+    assert results[0]["title_highlight"] == "Design <mark>Patterns</mark> in Python"
+    assert results[0]["rank"] > results[1]["rank"]
+
+    first = client.get("/courses/search", params={"q": "pattern", "limit": 1})
+    assert [r["id"] for r in first.json()] == [titled.id]
+    second = client.get("/courses/search", params={"q": "pattern", "limit": 1, "cursor": first.headers["x-next-cursor"]})
+    assert [r["id"] for r in second.json()] == [moduled.id]
+    assert "x-next-cursor" not in second.headers
+
+    module = db_session.query(Module).filter_by(title="Knives").one()
+    module.title = "Pattern cutting"
+    db_session.commit()
+    assert len(client.get("/courses/search", params={"q": "pattern"}).json()) == 3
+
+    # Highlights are HTML; markup in the instructor's own text comes back escaped.
+    services.create_course(db_session, teacher.id, "<b>Regex</b> & Tricks", 10, [],
+                           description='Match <img src=x onerror="alert(1)"> with a regex')
+    hit = client.get("/courses/search", params={"q": "regex"}).json()[0]
+    assert hit["title_highlight"] == "&lt;b&gt;<mark>Regex</mark>&lt;/b&gt; &amp; Tricks"
+    description = hit["description_highlight"].replace("<mark>", "").replace("</mark>", "")
+    assert "<" not in description and '"' not in description
+    assert "onerror=&quot;alert(1)&quot;&gt; with a regex" in description
+
+    assert client.get("/courses/search", params={"q": "pattern", "cursor": "bogus"}).status_code == 400
+    assert client.get("/courses/search", params={"q": ""}).status_code == 422
+
+def test_catalog_fast_path_matches_response_model(client, db_session):
+    import services
+    import schemas
+    from models import UserRole
+
+    teacher = services.create_user(db_session, "Fast Teacher", "fast@test.com", UserRole.INSTRUCTOR)
+    for price in (10, 20):
+        services.create_course_with_modules(db_session, teacher.id, f"Fast {price}", price, [])
+
+    response = client.get("/courses/", params={"max_price": 20})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["etag"]
+
+    # Same payload the validated response_model path produces, down to the datetime format.
+    courses, _ = services.get_course_catalog_page(db_session, 0, 20)
+    assert response.json() == [schemas.CourseResponse.model_validate(c).model_dump(mode="json") for c in courses]
+
+def test_create_course_with_modules_is_idempotent(client, db_session):
+    import services
+    from models import UserRole
+
+    teacher = services.create_user(db_session, "Batch Teacher", "batch@test.com", UserRole.INSTRUCTOR)
+    payload = {
+        "title": "Batched",
+        "price": 120,
+        "instructor_id": teacher.id,
+        "modules": [{"title": "One"}, {"title": "Two", "content": "Second"}],
+        "assignments": [{"title": "Quiz", "max_score": 20}],
+    }
+
+    first = client.post("/courses/", json=payload, headers={"Idempotency-Key": "abc"})
+    assert first.status_code == 201
+    body = first.json()
+    assert [(m["title"], m["order_index"]) for m in body["modules"]] == [("One", 1), ("Two", 2)]
+    assert [(a["title"], a["max_score"]) for a in body["assignments"]] == [("Quiz", 20)]
+    assert "idempotent-replayed" not in first.headers
+
+    retry = client.post("/courses/", json=payload, headers={"Idempotency-Key": "abc"})
+    assert retry.status_code == 201
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json()["id"] == body["id"]
+    assert [m["id"] for m in retry.json()["modules"]] == [m["id"] for m in body["modules"]]
+
+    changed = client.post("/courses/", json={**payload, "price": 130}, headers={"Idempotency-Key": "abc"})
+    assert changed.status_code == 422
+    assert client.post("/courses/", json=payload).json()["id"] != body["id"]
+    assert client.post("/courses/", json={**payload, "instructor_id": 99999}).status_code == 400
+
+def test_student_dashboard_single_query_and_invalidation(client, db_session, api_database):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import event
+    import services
+    from models import UserRole
+
+    teacher = services.create_user(db_session, "Dash Teacher", "dash-teacher@test.com", UserRole.INSTRUCTOR)
+    student = services.create_user(db_session, "Dash Student", "dash@test.com", UserRole.STUDENT)
+    student_id = student.id
+    algebra = services.create_course_with_modules(db_session, teacher.id, "Algebra", 100, [])
+    history = services.create_course_with_modules(db_session, teacher.id, "History", 100, [])
+    services.enroll_student(db_session, student_id, algebra.id)
+    services.enroll_student(db_session, student_id, history.id)
+
+    soon = datetime.now(timezone.utc) + timedelta(days=1)
+    quiz = services.create_assignment(db_session, algebra.id, "Quiz", 20)
+    exam = services.create_assignment(db_session, algebra.id, "Exam", 100)
+    essay = services.create_assignment(db_session, history.id, "Essay", 50)
+    exam.due_date, essay.due_date = soon + timedelta(days=1), soon
+    db_session.commit()
+    graded = services.submit_homework(db_session, quiz.id, student_id, "answers")
+    services.grade_submission(db_session, graded.id, 15)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(api_database.async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        response = client.get(f"/users/{student_id}/dashboard")
+        cached = client.get(f"/users/{student_id}/dashboard")
+    finally:
+        event.remove(api_database.async_engine.sync_engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert cached.json() == response.json()
+    assert len(statements) == 1
+    body = response.json()
+    assert [(c["title"], c["assignments_count"], c["submitted_count"], c["progress"], c["average_percent"])
+            for c in body["courses"]] == [("Algebra", 2, 1, 50.0, 75.0), ("History", 1, 0, 0.0, None)]
+    assert [a["title"] for a in body["upcoming"]] == ["Essay", "Exam"]
+    assert [(s["title"], s["score"], s["percent"], s["letter_grade"]) for s in body["recent_scores"]] == [("Quiz", 15, 75, "C")]
+
+    services.submit_homework(db_session, essay.id, student_id, "essay")
+    assert [a["title"] for a in client.get(f"/users/{student_id}/dashboard").json()["upcoming"]] == ["Exam"]
+    services.create_assignment(db_session, history.id, "Reading", 10)
+    assert client.get(f"/users/{student_id}/dashboard").json()["courses"][1]["assignments_count"] == 2
+
+    assert client.get("/users/99999/dashboard").status_code == 404
+
+def test_module_and_submission_content_ranges(client, db_session, monkeypatch):
+    import contents
+    import services
+    from models import UserRole
+
+    instructor = services.create_user(db_session, "Content Teacher", "content@test.com", UserRole.INSTRUCTOR)
+    student = services.create_user(db_session, "Content Student", "reader@test.com", UserRole.STUDENT)
+    body = "Вступ: " + "x" * 40
+    created = client.post("/courses/", json={
+        "title": "Texts", "price": 10, "instructor_id": instructor.id, "description": "Long description",
+        "modules": [{"title": "Second", "content": body}, {"title": "First"}],
+    }).json()
+    assert created["description"] == "Long description"
+    assert client.get(f"/courses/{created['id']}").json()["description"] == "Long description"
+
+    modules = client.get(f"/courses/{created['id']}/modules").json()
+    assert [m["title"] for m in modules] == ["Second", "First"]
+    assert all("content" not in m for m in modules)
+    assert client.get("/courses/99999/modules").status_code == 404
+
+    url = f"/modules/{modules[0]['id']}/content"
+    size = len(body.encode())
+    full = client.get(url)
+    assert full.status_code == 200 and full.text == body
+    assert full.headers["accept-ranges"] == "bytes"
+
+    partial = client.get(url, headers={"Range": "bytes=0-6"})
+    assert partial.status_code == 206
+    assert partial.content == body.encode()[:7]
+    assert partial.headers["content-range"] == f"bytes 0-6/{size}"
+    assert client.get(url, headers={"Range": "bytes=-5"}).content == b"xxxxx"
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={size}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{size}"
+    assert client.get(f"/modules/{modules[1]['id']}/content").text == "Content for First"
+    assert client.get("/modules/99999/content").status_code == 404
+
+    # Above the chunk size the body is streamed in slices.
+    monkeypatch.setattr(contents, "CONTENT_CHUNK_SIZE", 8)
+    assert client.get(url).text == body
+    streamed = client.get(url, headers={"Range": "bytes=3-"})
+    assert streamed.status_code == 206 and streamed.content == body.encode()[3:]
+
+    assignment = services.create_assignment(db_session, created["id"], "Essay", 100)
+    submission = services.submit_homework(db_session, assignment.id, student.id, "My answer")
+    assert client.get(f"/submissions/{submission.id}/content").text == "My answer"
+    assert client.get("/submissions/99999/content").status_code == 404
+
+def test_admission_fails_open_when_the_shared_limiter_errors(client):
+    import admission
+
+    class BrokenRedis:
+        async def eval(self, *args):
+            raise ConnectionError("Redis is down")
+
+    previous = admission.get_controller()
+    limiter = admission.RedisRateLimiter(BrokenRedis())
+    admission.set_controller(admission.AdmissionController(admission.AdmissionSettings(client_rate=1, client_burst=1), limiter))
+    try:
+        assert [client.get("/courses/").status_code for _ in range(3)] == [200, 200, 200]
+        assert 'lms_admission_limiter_errors_total{backend="redis"} 3' in client.get("/metrics").text
+    finally:
+        admission.set_controller(previous)
+
+def test_admission_rate_limits_clients_and_exempts_health(client):
+    import admission
+
+    previous = admission.get_controller()
+    admission.set_controller(admission.AdmissionController(admission.AdmissionSettings(client_rate=0.01, client_burst=2)))
+    try:
+        assert [client.get("/courses/").status_code for _ in range(3)] == [200, 200, 429]
+        limited = client.get("/courses/")
+        assert limited.status_code == 429 and int(limited.headers["retry-after"]) > 1
+        assert client.get("/health").status_code == 200
+        scrape = client.get("/metrics").text
+        assert 'lms_admission_requests_total{outcome="rate_limited",priority="cheap"} 2' in scrape
+        assert 'lms_admission_in_flight{priority="cheap"} 0' in scrape
+    finally:
+        admission.set_controller(previous)
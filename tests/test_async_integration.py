@@ -0,0 +1,142 @@
+import pytest
+import async_services
+from models import UserRole, Course, Submission
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+pytestmark = pytest.mark.anyio
+
+async def test_create_course_flow(async_db_session):
+    instructor = await async_services.create_user(
+        async_db_session,
+        "Async Teacher",
+        "async_teacher@test.com",
+        UserRole.INSTRUCTOR
+    )
+
+    course = await async_services.create_course_with_modules(
+        async_db_session,
+        instructor.id,
+        "Async Course",
+        2000,
+        ["Mod 1", "Mod 2", "Mod 3"]
+    )
+
+    assert course.id is not None
+    assert course.created_at is not None
+
+    saved_course = (await async_db_session.scalars(
+        select(Course).options(selectinload(Course.modules)).where(Course.id == course.id)
+    )).one()
+    assert [m.title for m in saved_course.modules] == ["Mod 1", "Mod 2", "Mod 3"]
+
+async def test_grade_validation_error(async_db_session):
+    student = await async_services.create_user(async_db_session, "Async Student", "as@test.com", UserRole.STUDENT)
+    instructor = await async_services.create_user(async_db_session, "Async Strict", "ai@test.com", UserRole.INSTRUCTOR)
+    course = await async_services.create_course_with_modules(async_db_session, instructor.id, "Math", 100, ["M1"])
+
+    assignment = await async_services.create_assignment(async_db_session, course.id, "Test", 100)
+    submission = await async_services.submit_homework(async_db_session, assignment.id, student.id, "Work")
+
+    assert await async_services.grade_submission(async_db_session, submission.id, 200) is None
+    graded = await async_services.grade_submission(async_db_session, submission.id, 90)
+    assert graded.score == 90
+
+async def test_catalog_and_analytics(async_db_session):
+    instructor = await async_services.create_user(async_db_session, "Async Seller", "seller@test.com", UserRole.INSTRUCTOR)
+    student = await async_services.create_user(async_db_session, "Async Buyer", "buyer@test.com", UserRole.STUDENT)
+    for price in (100, 200, 300):
+        course = await async_services.create_course_with_modules(async_db_session, instructor.id, f"C{price}", price, [])
+    await async_services.enroll_student(async_db_session, student.id, course.id)
+
+    page, next_cursor = await async_services.get_course_catalog_page(async_db_session, 100, 250, limit=1)
+    assert [c.price for c in page] == [100]
+    page, next_cursor = await async_services.get_course_catalog_page(async_db_session, 100, 250, limit=1, cursor=next_cursor)
+    assert [c.price for c in page] == [200]
+    assert next_cursor is None
+
+    revenue = await async_services.get_instructor_revenue(async_db_session)
+    assert [(r.full_name, r.total_sales, r.total_revenue) for r in revenue] == [("Async Seller", 1, 300)]
+
+async def test_database_prewarm_fills_pool(db_session):
+    from config import DatabaseSettings
+    from database import Database
+    from dashboard import dashboard_statement
+
+    settings = DatabaseSettings.from_env({"DATABASE_URL": db_session.bind.url.render_as_string(hide_password=False), "DB_POOL_SIZE": "3"})
+    database = Database(settings)
+    try:
+        assert await database.prewarm(5, [select(Course).where(Course.id == 0), dashboard_statement(0)]) == 3
+        assert database.async_engine.pool.checkedin() == 3
+    finally:
+        await database.dispose()
+
+async def test_admission_prefers_cheap_requests_and_sheds_when_full():
+    import asyncio
+    from admission import AdmissionController, AdmissionSettings
+
+    controller = AdmissionController(AdmissionSettings(max_in_flight=2, heavy_share=0.5, max_queue=2, queue_timeout=5))
+    assert await controller.acquire(heavy=True)
+    assert await controller.acquire(heavy=False)
+
+    heavy = asyncio.ensure_future(controller.acquire(heavy=True))
+    cheap = asyncio.ensure_future(controller.acquire(heavy=False))
+    await asyncio.sleep(0)
+    assert controller.queued == 2
+    assert await controller.acquire(heavy=False) is False
+
+    # A freed slot goes to the cheap request that queued last; heavy ones are capped at heavy_limit.
+    controller.release(heavy=False)
+    assert await cheap is True and not heavy.done()
+    controller.release(heavy=True)
+    assert await heavy is True
+    assert controller.in_flight == {False: 1, True: 1}
+
+    controller.settings = AdmissionSettings(max_in_flight=2, max_queue=2, queue_timeout=0.01)
+    assert await controller.acquire(heavy=False) is False
+    counts = controller.stats.counts
+    assert (counts[("queued", "cheap")], counts[("shed_queue_full", "cheap")], counts[("shed_timeout", "cheap")]) == (2, 1, 1)
+
+async def test_shared_rate_limiter_does_not_block_the_event_loop():
+    import asyncio
+    import time
+    from admission import AdmissionController, AdmissionSettings, RedisRateLimiter
+
+    class SlowRedis:
+        async def eval(self, script, numkeys, key, rate, burst):
+            await asyncio.sleep(0.2)
+            return "0"
+
+    controller = AdmissionController(AdmissionSettings(client_rate=10, client_burst=10), RedisRateLimiter(SlowRedis()))
+    started = time.monotonic()
+    checks = [controller.check_rate(f"client-{i}", "/courses/") for i in range(5)]
+    assert await asyncio.gather(*checks) == [0.0] * 5
+    assert time.monotonic() - started < 0.5
+
+async def test_api_write_and_read_on_the_async_stack(async_db_session):
+    import httpx
+    import database
+    from main_api import create_app
+
+    app = create_app()
+    async def override_get_async_db():
+        yield async_db_session
+    app.dependency_overrides[database.get_async_db] = override_get_async_db
+    app.dependency_overrides[database.get_async_read_db] = override_get_async_db
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        teacher = (await client.post("/users/", json={"full_name": "Api Teacher", "email": "api_t@test.com",
+                                                      "role": "instructor"})).json()
+        created = await client.post("/courses/", json={"title": "Async Api", "price": 300, "instructor_id": teacher["id"],
+                                                       "modules": [{"title": "Intro"}, {"title": "Deep dive"}]})
+        assert created.status_code == 201
+        course_id = created.json()["id"]
+
+        detail = (await client.get(f"/courses/{course_id}")).json()
+        assert [m["title"] for m in detail["modules"]] == ["Intro", "Deep dive"]
+        modules = (await client.get(f"/courses/{course_id}/modules")).json()
+        assert [m["title"] for m in modules] == ["Intro", "Deep dive"]
+        assert [c["title"] for c in (await client.get("/courses/")).json()] == ["Async Api"]
+        assert (await client.get(f"/users/{teacher['id']}")).json()["email"] == "api_t@test.com"
+
+    assert (await async_db_session.scalars(select(Course.title))).all() == ["Async Api"]
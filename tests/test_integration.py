@@ -1,5 +1,7 @@
+import pytest
 import services
-from models import UserRole, Course, User, Assignment, Submission
+from sqlalchemy.orm import selectinload
+from models import UserRole, Course, User, Assignment, Submission, Enrollment
 
 def test_create_course_flow(db_session):
     instructor = services.create_user(
@@ -21,7 +23,7 @@ def test_create_course_flow(db_session):
     assert course.id is not None
     assert course.title == "Pytest Course"
     
-    saved_course = db_session.query(Course).filter_by(id=course.id).first()
+    saved_course = db_session.query(Course).options(selectinload(Course.modules)).filter_by(id=course.id).first()
     assert saved_course is not None
     assert len(saved_course.modules) == 3
     assert saved_course.modules[0].title == "Mod 1"
@@ -38,7 +40,9 @@ def test_enrollment_logic(db_session):
     assert enrollment.user_id == student.id
     assert enrollment.course_id == course.id
 
-    user_in_db = db_session.query(User).filter_by(id=student.id).first()
+    user_in_db = db_session.query(User)\
+        .options(selectinload(User.enrollments).joinedload(Enrollment.course))\
+        .filter_by(id=student.id).first()
     assert len(user_in_db.enrollments) == 1
     assert user_in_db.enrollments[0].course.title == "Course A"
 
@@ -55,4 +59,733 @@ def test_grade_validation_error(db_session):
     assert result is None
     
     saved_submission = db_session.get(Submission, submission.id)
-    assert saved_submission.score is None
\ No newline at end of file
+    assert saved_submission.score is None
+
+
+def test_price_range_respects_max_price(db_session):
+    instructor = services.create_user(db_session, "Range Teacher", "range@test.com", UserRole.INSTRUCTOR)
+    for price in (50, 1000, 1500, 2500):
+        services.create_course_with_modules(db_session, instructor.id, f"Course {price}", price, [])
+
+    courses = services.get_courses_by_price_range(db_session, 1000, 2000)
+
+    assert [c.price for c in courses] == [1000, 1500]
+
+def test_strict_loading_rejects_unplanned_lazy_load(db_session):
+    from sqlalchemy.exc import InvalidRequestError
+    from repositories.course_repository import course_repo
+
+    instructor_id = services.create_user(db_session, "Lazy Teacher", "lazy@test.com", UserRole.INSTRUCTOR).id
+    course_id = services.create_course_with_modules(db_session, instructor_id, "Lazy", 10, ["M1"]).id
+    db_session.expunge_all()
+
+    unplanned = course_repo.get_by_id(db_session, course_id)
+    with pytest.raises(InvalidRequestError):
+        unplanned.modules
+
+    db_session.expunge_all()
+    planned = course_repo.get_by_id(db_session, course_id, plan="with_modules_and_assignments")
+    assert [m.title for m in planned.modules] == ["M1"]
+    assert planned.instructor.full_name == "Lazy Teacher"
+
+    # Statements built outside the repositories are covered too.
+    db_session.expunge_all()
+    with pytest.raises(InvalidRequestError):
+        db_session.get(Course, course_id).modules
+    db_session.expunge_all()
+    with pytest.raises(InvalidRequestError):
+        db_session.query(Course).filter_by(id=course_id).one().instructor
+
+    assignment = services.create_assignment(db_session, course_id, "Strict", 10)
+    submission_id = services.submit_homework(db_session, assignment.id, instructor_id, "work").id
+    db_session.expunge_all()
+    assert services.grade_submission(db_session, submission_id, 7).score == 7
+
+def test_bulk_create_users_reports_rejected_rows(db_session):
+    services.create_user(db_session, "Existing", "existing@test.com", UserRole.STUDENT)
+
+    result = services.bulk_create_users(db_session, [
+        {"full_name": "A", "email": "a@bulk.com"},
+        {"full_name": "B", "email": "b@bulk.com", "role": "instructor"},
+        {"full_name": "Dup", "email": "a@bulk.com"},
+        {"full_name": "Old", "email": "existing@test.com"},
+        {"full_name": "Bad", "email": "bad@bulk.com", "role": "wizard"},
+        {"email": "noname@bulk.com"},
+    ], chunk_size=2)
+
+    assert result["created"] == 2
+    assert {e["row"]: e["error"] for e in result["errors"]} == {
+        2: "Duplicate email in input",
+        3: "Email already registered",
+        4: "Invalid role. Use: student, instructor, admin",
+        5: "full_name is required",
+    }
+    b = services.user_repo.get_by_email(db_session, "b@bulk.com")
+    assert b.role == UserRole.INSTRUCTOR and b.is_active is True
+
+def test_bulk_import_reports_unparseable_rows(db_session, tmp_path):
+    import import_data
+
+    path = tmp_path / "users.jsonl"
+    path.write_text('{"full_name": "A", "email": "a@jsonl.com"}\n{"full_name": \n["not", "an", "object"]\n'
+                    '{"full_name": "B", "email": "b@jsonl.com"}\n', encoding="utf-8")
+    result = services.bulk_create_users(db_session, import_data.read_rows(str(path)))
+
+    assert result["created"] == 2
+    assert result["errors"] == [
+        {"row": 1, "error": "Invalid JSON: Expecting value"},
+        {"row": 2, "error": "Row must be an object"},
+    ]
+
+def test_bulk_enroll_students(db_session):
+    from sqlalchemy import select, func
+    from models import CourseSalesStats
+
+    instructor = services.create_user(db_session, "Bulk Teacher", "bt@test.com", UserRole.INSTRUCTOR)
+    course = services.create_course_with_modules(db_session, instructor.id, "Cohort", 100, [])
+    students = [services.create_user(db_session, f"S{i}", f"s{i}@cohort.com", UserRole.STUDENT) for i in range(3)]
+    services.enroll_student(db_session, students[0].id, course.id)
+
+    ids = [s.id for s in students]
+    result = services.bulk_enroll_students(db_session, course.id, ids + [ids[1], 99999], chunk_size=2)
+
+    assert result["created"] == 2
+    assert sorted(e["error"] for e in result["errors"]) == ["Already enrolled", "Duplicate student in input", "User not found"]
+    assert services.bulk_enroll_students(db_session, 99999, ids) is None
+
+    # A second request for the same students, as if it had raced the first, enrolls nobody twice.
+    again = services.bulk_enroll_students(db_session, course.id, ids)
+    assert again["created"] == 0
+    assert [e["error"] for e in again["errors"]] == ["Already enrolled"] * 3
+    assert db_session.scalar(select(func.count(Enrollment.id)).where(Enrollment.course_id == course.id)) == 3
+    assert db_session.get(CourseSalesStats, course.id).enrollments_count == 3
+
+def test_schema_lint_flags_unindexed_foreign_keys(db_session):
+    from sqlalchemy import text
+    from schema_lint import find_unindexed_foreign_keys
+
+    engine = db_session.get_bind()
+    assert find_unindexed_foreign_keys(engine) == []
+
+    # user_id also leads ix_enrollments_user_course, course_id has no other index.
+    db_session.execute(text("DROP INDEX ix_enrollments_user_id"))
+    db_session.execute(text("DROP INDEX ix_enrollments_course_id"))
+    db_session.commit()
+
+    assert find_unindexed_foreign_keys(engine) == [
+        {"table": "enrollments", "columns": ["course_id"], "problem": "foreign key without index"}
+    ]
+
+DOCS_STUDENT_PERFORMANCE_SQL = """
+SELECT u.full_name AS student_name, u.email, COUNT(s.id) AS submitted_works_count,
+       ROUND(AVG(s.score), 2) AS average_score, MAX(s.score) AS best_score
+FROM users u
+JOIN submissions s ON u.id = s.student_id
+WHERE u.role = 'STUDENT'
+GROUP BY u.id, u.full_name, u.email
+HAVING COUNT(s.id) > 0
+ORDER BY average_score DESC
+"""
+
+DOCS_INSTRUCTOR_REVENUE_SQL = """
+SELECT u.full_name AS instructor_name, COUNT(DISTINCT c.id) AS courses_created,
+       COUNT(e.id) AS total_enrollments, SUM(c.price) AS total_revenue
+FROM users u
+JOIN courses c ON u.id = c.instructor_id
+JOIN enrollments e ON c.id = e.course_id
+WHERE u.role = 'INSTRUCTOR'
+GROUP BY u.id, u.full_name
+ORDER BY total_revenue DESC
+"""
+
+def test_analytics_summaries_match_documented_queries(db_session):
+    import analytics
+    from sqlalchemy import text
+
+    analytics.refresh_all(db_session)
+    teacher = services.create_user(db_session, "Summary Teacher", "sum_t@test.com", UserRole.INSTRUCTOR)
+    other = services.create_user(db_session, "Other Teacher", "sum_o@test.com", UserRole.INSTRUCTOR)
+    courses = [
+        services.create_course_with_modules(db_session, teacher.id, "Cheap", 100, []),
+        services.create_course_with_modules(db_session, teacher.id, "Pricey", 900, []),
+        services.create_course_with_modules(db_session, other.id, "Unsold", 500, []),
+    ]
+    students = [services.create_user(db_session, f"Sum S{i}", f"sum_s{i}@test.com", UserRole.STUDENT) for i in range(3)]
+    services.enroll_student(db_session, students[0].id, courses[0].id)
+    services.bulk_enroll_students(db_session, courses[1].id, [s.id for s in students])
+
+    assignment = services.create_assignment(db_session, courses[0].id, "HW", 100)
+    subs = [services.submit_homework(db_session, assignment.id, s.id, "x") for s in students]
+    extra = services.submit_homework(db_session, assignment.id, students[0].id, "y")
+    services.grade_submission(db_session, subs[0].id, 90)
+    services.grade_submission(db_session, extra.id, 70)
+    services.grade_submission(db_session, subs[1].id, 60)
+    services.grade_submission(db_session, subs[1].id, 80)
+    services.grade_submission(db_session, subs[0].id, 50)
+
+    expected_students = [tuple(r) for r in db_session.execute(text(DOCS_STUDENT_PERFORMANCE_SQL))]
+    expected_revenue = [tuple(r) for r in db_session.execute(text(DOCS_INSTRUCTOR_REVENUE_SQL))]
+
+    students_rows, _ = analytics.get_student_performance(db_session)
+    revenue_rows, _ = analytics.get_instructor_revenue(db_session)
+    assert [tuple(r) for r in students_rows] == expected_students
+    assert [tuple(r) for r in revenue_rows] == expected_revenue
+    assert expected_revenue == [("Summary Teacher", 2, 4, 2800)]
+
+    analytics.refresh_all(db_session)
+    assert [tuple(r) for r in analytics.get_student_performance(db_session)[0]] == expected_students
+
+def test_analytics_refresh_runs_once_at_a_time(db_session):
+    import analytics
+    from sqlalchemy import select, func
+    from sqlalchemy.orm import Session
+
+    analytics.refresh_all(db_session)
+    refreshed_at = analytics.get_refreshed_at(db_session)
+    db_session.commit()
+
+    other = Session(db_session.get_bind())
+    try:
+        other.execute(select(func.pg_advisory_xact_lock(analytics.REFRESH_LOCK_ID)))
+        assert analytics.refresh_all(db_session) is False
+        # A stale reader does not wait for the running rebuild, it gets the current rows.
+        assert analytics.ensure_fresh(db_session, max_staleness=0) == refreshed_at
+        db_session.rollback()
+    finally:
+        other.close()
+
+    assert analytics.refresh_all(db_session, max_staleness=3600) is False
+    assert analytics.refresh_all(db_session) is True
+
+def test_analytics_refresh_locks_on_the_primary(db_session):
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    import analytics
+    from routing import RoutingSession, ReplicaMonitor
+
+    analytics.refresh_all(db_session)
+    db_session.commit()
+    primary = db_session.get_bind()
+    replica = create_engine(primary.url)
+    monitor = ReplicaMonitor(replica, "analytics_replica", check_seconds=60)
+    ReadSession = sessionmaker(class_=RoutingSession, primary=primary, replica=replica, monitor=monitor)
+
+    statements = {"primary": [], "replica": []}
+    listeners = [(engine, lambda *args, name=name: statements[name].append(args[2]))
+                 for engine, name in ((primary, "primary"), (replica, "replica"))]
+    for engine, listener in listeners:
+        event.listen(engine, "before_cursor_execute", listener)
+    try:
+        with ReadSession() as db:
+            analytics.ensure_fresh(db, max_staleness=0)
+    finally:
+        for engine, listener in listeners:
+            event.remove(engine, "before_cursor_execute", listener)
+        replica.dispose()
+
+    assert any("advisory" in s for s in statements["primary"])
+    assert not any("advisory" in s for s in statements["replica"])
+    assert any("analytics_refresh" in s for s in statements["replica"])
+
+def test_repository_cache_hits_and_invalidation(db_session):
+    from sqlalchemy import event
+    import cache
+
+    user = services.create_user(db_session, "Cached", "cached@test.com", UserRole.STUDENT)
+    user_id = user.id
+    db_session.expunge_all()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+    try:
+        first = services.user_repo.get_by_email(db_session, "cached@test.com")
+        db_session.expunge_all()
+        second = services.user_repo.get_by_email(db_session, "cached@test.com")
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+
+    assert first.id == second.id == user_id
+    assert len(statements) == 1
+    assert cache.get_cache().stats.hits == 2
+
+    assert services.soft_delete_user(db_session, user_id) is True
+    db_session.expunge_all()
+    assert services.user_repo.get_by_id(db_session, user_id).is_active is False
+
+def test_repository_lookups_reuse_parameterized_statements(db_session):
+    from repositories.user_repository import UserRepository
+    from repositories.course_repository import CourseRepository
+
+    users, courses = UserRepository(), CourseRepository()
+    users.cache_namespace = courses.cache_namespace = None
+    instructor = services.create_user(db_session, "Stmt Teacher", "stmt@test.com", UserRole.INSTRUCTOR)
+    services.create_course_with_modules(db_session, instructor.id, "Cheap", 100, [])
+    services.create_course_with_modules(db_session, instructor.id, "Pricey", 900, [])
+    instructor_id = instructor.id
+    db_session.expunge_all()
+
+    assert users.get_by_email(db_session, "stmt@test.com").id == instructor_id
+    assert users.get_by_email(db_session, "missing@test.com") is None
+    assert users.get_by_id(db_session, instructor_id).email == "stmt@test.com"
+    assert [c.title for c in courses.get_expensive_courses(db_session, 500)] == ["Pricey"]
+    assert {c.title for c in courses.get_expensive_courses(db_session, 0)} == {"Cheap", "Pricey"}
+    assert users.by_id_statement() is users.by_id_statement()
+    assert users.by_id_statement() is not users.by_id_statement("with_enrollments")
+    # strict_loading is part of the key, so the options of one mode never leak into the other.
+    assert set(users.statements) == {("by_email", None, True), ("by_id", None, True), ("by_id", "with_enrollments", True)}
+
+def test_course_catalog_cache_invalidated_by_new_course(db_session):
+    instructor = services.create_user(db_session, "Cat Teacher", "cat@test.com", UserRole.INSTRUCTOR)
+    services.create_course_with_modules(db_session, instructor.id, "First", 100, [])
+
+    assert [c.title for c in services.get_courses_by_price_range(db_session, 0, 1000)] == ["First"]
+    services.create_course_with_modules(db_session, instructor.id, "Second", 200, [])
+    assert [c.title for c in services.get_courses_by_price_range(db_session, 0, 1000)] == ["First", "Second"]
+
+def test_catalog_cache_skips_replica_reads_older_than_the_token(db_session):
+    import cache
+    from repositories.course_repository import course_repo
+
+    instructor = services.create_user(db_session, "Lag Teacher", "lag@test.com", UserRole.INSTRUCTOR)
+    services.create_course_with_modules(db_session, instructor.id, "Fresh", 100, [])
+    # As if read from a replica up to a minute behind: it may not have the course that swapped the token.
+    db_session.info["replica_lag"] = 60.0
+
+    sets = cache.get_cache().stats.sets
+    assert [c.title for c in services.get_courses_by_price_range(db_session, 0, 1000)] == ["Fresh"]
+    assert cache.get_cache().stats.sets == sets
+
+    version = course_repo.catalog_version()
+    version["created_at"] -= 120
+    cache.get_cache().set(course_repo.cache_key("catalog", "version"), version)
+    services.get_courses_by_price_range(db_session, 0, 1000)
+    assert cache.get_cache().stats.sets == sets + 2
+
+def test_search_rechecks_trigram_support(db_session, monkeypatch):
+    from repositories import course_repository
+    from repositories.course_repository import CourseRepository
+
+    repo = CourseRepository()
+    repo.cache_namespace = None
+    checks = []
+    monkeypatch.setattr(repo, "set_fuzzy_search", lambda available: checks.append(available) or
+                        CourseRepository.set_fuzzy_search(repo, available))
+
+    repo.search(db_session, "python", 10)
+    repo.search(db_session, "python", 10)
+    assert len(checks) == 1
+    monkeypatch.setattr(course_repository, "TRIGRAM_CHECK_SECONDS", 0)
+    repo.search(db_session, "python", 10)
+    assert len(checks) == 2
+
+def test_stream_export_fetches_in_batches(db_session, monkeypatch):
+    import exports
+
+    teacher = services.create_user(db_session, "Grader", "grader@test.com", UserRole.INSTRUCTOR)
+    course = services.create_course_with_modules(db_session, teacher.id, "Graded", 100, [])
+    assignment = services.create_assignment(db_session, course.id, "HW", 10)
+    for i in range(5):
+        student = services.create_user(db_session, f"S{i}", f"s{i}@grades.com", UserRole.STUDENT)
+        submission = services.submit_homework(db_session, assignment.id, student.id, "answer")
+        if i % 2 == 0:
+            services.grade_submission(db_session, submission.id, i)
+
+    monkeypatch.setattr(exports, "EXPORT_BATCH_SIZE", 2)
+    chunks = list(exports.stream_export(db_session, "grades", "csv", course_id=course.id))
+
+    assert chunks[0].startswith("submission_id,student_id,student_email")
+    assert len(chunks) == 1 + 2
+    assert "".join(chunks).count("grades.com") == 3
+
+def test_bulk_grade_submissions(db_session):
+    from sqlalchemy import event
+    from models import StudentScoreStats, Submission
+
+    teacher = services.create_user(db_session, "Bulk Grader", "bulkgrader@test.com", UserRole.INSTRUCTOR)
+    course = services.create_course_with_modules(db_session, teacher.id, "Bulk Graded", 100, [])
+    assignment = services.create_assignment(db_session, course.id, "Essay", 50)
+    other = services.create_assignment(db_session, course.id, "Other", 50)
+    students = [services.create_user(db_session, f"B{i}", f"b{i}@grade.com", UserRole.STUDENT) for i in range(3)]
+    submissions = [services.submit_homework(db_session, assignment.id, s.id, "essay") for s in students]
+    foreign = services.submit_homework(db_session, other.id, students[0].id, "other")
+    services.grade_submission(db_session, submissions[2].id, 50)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+    try:
+        result = services.bulk_grade_submissions(db_session, assignment.id, [
+            {"submission_id": submissions[0].id, "score": 45},
+            (submissions[1].id, 29),
+            {"submission_id": submissions[2].id, "score": 30},
+            {"submission_id": submissions[0].id, "score": 1},
+            {"submission_id": foreign.id, "score": 10},
+            {"submission_id": submissions[1].id, "score": 51},
+            {"submission_id": "x", "score": 1},
+            (submissions[2].id,),
+            None,
+            {"submission_id": submissions[2].id, "score": 30.5},
+            {"submission_id": submissions[2].id, "score": True},
+            {"submission_id": str(submissions[2].id), "score": 30},
+        ])
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+
+    assert result["graded"] == 3
+    assert [(r["row"], r["letter_grade"]) for r in result["results"]] == [(0, "A"), (1, "F"), (2, "D")]
+    assert [e["row"] for e in result["errors"]] == [3, 4, 5, 6, 7, 8, 9, 10, 11]
+    assert {e["error"] for e in result["errors"][3:]} == {"submission_id and score must be integers"}
+    assert len([s for s in statements if s.lstrip().upper().startswith("UPDATE")]) == 1
+
+    db_session.expire_all()
+    assert [db_session.get(Submission, s.id).score for s in submissions] == [45, 29, 30]
+    stats = db_session.get(StudentScoreStats, students[2].id)
+    assert (stats.graded_count, stats.best_score) == (1, 30)
+    assert services.bulk_grade_submissions(db_session, 999, []) is None
+
+def test_course_gradebook_groups_by_assignment(db_session, monkeypatch):
+    from sqlalchemy import update
+    import gradebook
+
+    teacher = services.create_user(db_session, "Book Keeper", "book@test.com", UserRole.INSTRUCTOR)
+    course = services.create_course_with_modules(db_session, teacher.id, "Booked", 100, [])
+    quiz = services.create_assignment(db_session, course.id, "Quiz", 10)
+    exam = services.create_assignment(db_session, course.id, "Exam", 100)
+    grades = {quiz.id: [10, 9, 6, None], exam.id: [55, 95]}
+    for assignment_id, scores in grades.items():
+        for i, score in enumerate(scores):
+            student = services.create_user(db_session, f"G{assignment_id}-{i}", f"g{assignment_id}-{i}@book.com", UserRole.STUDENT)
+            submission = services.submit_homework(db_session, assignment_id, student.id, "work")
+            if score is not None:
+                services.grade_submission(db_session, submission.id, score)
+
+    # Graded before its max score was cleared; it has no percentage and is left out.
+    ungraded = services.create_assignment(db_session, course.id, "Essay", 10)
+    student = services.create_user(db_session, "No Max", "nomax@book.com", UserRole.STUDENT)
+    essay = services.submit_homework(db_session, ungraded.id, student.id, "essay")
+    services.grade_submission(db_session, essay.id, 7)
+    db_session.execute(update(Assignment).where(Assignment.id == ungraded.id).values(max_score=None))
+    db_session.commit()
+
+    monkeypatch.setattr(gradebook, "GRADEBOOK_CHUNK_SIZE", 2)
+    book = gradebook.get_course_gradebook(db_session, course.id)
+
+    assert book["overall"]["count"] == 5
+    assert ungraded.id not in [a["assignment_id"] for a in book["assignments"]]
+    assert gradebook.get_assignment_gradebook(db_session, ungraded.id)["count"] == 0
+    assert book["overall"]["letter_grades"] == {"A": 3, "B": 0, "C": 0, "D": 1, "F": 1}
+    by_assignment = {a["assignment_id"]: a for a in book["assignments"]}
+    assert by_assignment[quiz.id]["count"] == 3
+    assert by_assignment[quiz.id]["mean"] == round((100 + 90 + 60) / 3, 2)
+    assert by_assignment[exam.id]["percentiles"]["p50"] == 75.0
+    assert gradebook.get_assignment_gradebook(db_session, exam.id)["max"] == 95
+    assert gradebook.get_course_gradebook(db_session, 999) is None
+
+def test_job_claim_skips_locked_rows(db_session):
+    from sqlalchemy.orm import sessionmaker
+    import jobs
+
+    first = jobs.enqueue(db_session, "refresh_analytics")
+    second = jobs.enqueue(db_session, "refresh_analytics")
+
+    other = sessionmaker(bind=db_session.get_bind())()
+    try:
+        locked = db_session.scalars(jobs.claim_statement("worker-a", 1)).all()
+        skipped = other.scalars(jobs.claim_statement("worker-b", 2)).all()
+        assert locked == [first.id]
+        assert skipped == [second.id]
+        db_session.commit()
+        other.commit()
+        assert jobs.claim(db_session, "worker-c", 5) == []
+    finally:
+        other.close()
+
+def test_running_job_heartbeat_keeps_it_from_being_requeued(db_session, monkeypatch):
+    import time
+    from sqlalchemy import update, func, select
+    from sqlalchemy.orm import sessionmaker
+    from models import Job, JobStatus
+    import jobs
+
+    Sessions = sessionmaker(bind=db_session.get_bind())
+    seen = []
+    def slow(db):
+        time.sleep(0.3)
+        with Sessions() as other:
+            seen.append(jobs.requeue_stale(other, stale_seconds=1))
+    monkeypatch.setitem(jobs.HANDLERS, "slow", slow)
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 0.1)
+
+    running = jobs.enqueue(db_session, "slow")
+    lost = jobs.enqueue(db_session, "slow")
+    assert jobs.claim(db_session, "worker-a", 2) == [running.id, lost.id]
+    # Both claims look old; only the job that is actually running gets its heartbeat refreshed.
+    db_session.execute(update(Job).values(locked_at=func.now() - func.make_interval(0, 0, 0, 0, 0, 0, 5)))
+    db_session.commit()
+
+    assert jobs.run_job(running.id, Sessions)
+    assert seen == [1]
+    db_session.expire_all()
+    assert running.status == JobStatus.SUCCEEDED
+    assert lost.status == JobStatus.QUEUED
+    assert lost.last_error == "Worker lost; requeued"
+    assert lost.run_at > db_session.scalar(select(func.now()))
+
+def test_stale_jobs_back_off_and_fail_when_exhausted(db_session):
+    from sqlalchemy import update, func, select
+    from models import Job, JobStatus
+    import jobs
+
+    retried = jobs.enqueue(db_session, "purge_idempotency_keys", max_attempts=3)
+    exhausted = jobs.enqueue(db_session, "purge_idempotency_keys", max_attempts=1)
+    assert jobs.claim(db_session, "worker-a", 2) == [retried.id, exhausted.id]
+    db_session.execute(update(Job).values(locked_at=func.now() - func.make_interval(0, 0, 0, 0, 0, 0, 600)))
+    db_session.commit()
+
+    assert jobs.requeue_stale(db_session, stale_seconds=60) == 2
+    db_session.expire_all()
+    assert retried.status == JobStatus.QUEUED
+    delay = db_session.scalar(select(func.extract("epoch", Job.run_at - func.now())).where(Job.id == retried.id))
+    assert jobs.backoff(1) - 5 < delay <= jobs.backoff(1)
+    assert jobs.claim(db_session, "worker-b") == []
+    assert exhausted.status == JobStatus.FAILED
+    assert exhausted.locked_by is None and exhausted.finished_at is not None
+    assert jobs.requeue_stale(db_session, stale_seconds=60) == 0
+
+def test_late_finish_does_not_overwrite_the_new_owner(db_session):
+    from sqlalchemy import update, func
+    from models import Job, JobStatus
+    import jobs
+
+    job = jobs.enqueue(db_session, "purge_idempotency_keys")
+    assert jobs.claim(db_session, "worker-a") == [job.id]
+    db_session.execute(update(Job).values(locked_at=func.now() - func.make_interval(0, 0, 0, 0, 0, 0, 600)))
+    db_session.commit()
+    jobs.requeue_stale(db_session, stale_seconds=60)
+    db_session.execute(update(Job).values(run_at=func.now()))
+    db_session.commit()
+    assert jobs.claim(db_session, "worker-b") == [job.id]
+
+    assert not jobs.finish(db_session, job.id, "worker-a", status=JobStatus.SUCCEEDED, finished_at=func.now())
+    db_session.expire_all()
+    assert (job.status, job.locked_by, job.finished_at) == (JobStatus.RUNNING, "worker-b", None)
+    assert jobs.finish(db_session, job.id, "worker-b", status=JobStatus.SUCCEEDED, finished_at=func.now())
+    db_session.expire_all()
+    assert (job.status, job.locked_by) == (JobStatus.SUCCEEDED, None)
+
+def test_job_runs_service_and_retries_with_backoff(db_session, monkeypatch):
+    import jobs
+    from sqlalchemy import func
+    from models import JobStatus
+
+    instructor = services.create_user(db_session, "Job Teacher", "job@test.com", UserRole.INSTRUCTOR)
+    created = jobs.enqueue(db_session, "create_course_with_modules", {
+        "instructor_id": instructor.id, "title": "Queued Course", "price": 10, "module_titles": ["One", "Two"],
+    })
+
+    calls = []
+    def flaky(db):
+        calls.append(1)
+        raise RuntimeError("boom")
+    monkeypatch.setitem(jobs.HANDLERS, "flaky", flaky)
+    failing = jobs.enqueue(db_session, "flaky", max_attempts=2)
+
+    assert jobs.run_pending(db_session) == 2
+    db_session.expire_all()
+    assert created.status == JobStatus.SUCCEEDED
+    course = services.get_course(db_session, created.result["course_id"])
+    assert [m.title for m in course.modules] == ["One", "Two"]
+
+    assert failing.status == JobStatus.QUEUED
+    assert failing.attempts == 1
+    assert "RuntimeError: boom" in failing.last_error
+    assert (failing.run_at - failing.created_at).total_seconds() >= jobs.backoff(1) - 1
+
+    failing.run_at = func.now()
+    db_session.commit()
+    assert jobs.run_pending(db_session) == 1
+    db_session.expire_all()
+    assert failing.status == JobStatus.FAILED
+    assert failing.finished_at is not None
+    assert len(calls) == 2
+
+    with pytest.raises(ValueError):
+        jobs.enqueue(db_session, "create_course_with_modules", {"title": "Missing fields"})
+
+def test_sync_engine_slow_query_explain(db_session, monkeypatch, caplog):
+    import json
+    import logging
+    import instrumentation
+    from database import SessionLocal
+
+    services.create_user(db_session, "Explained", "explain@test.com", UserRole.STUDENT)
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    stats = instrumentation.start_request()
+    db = SessionLocal()
+    try:
+        with caplog.at_level(logging.WARNING, logger="lms.slow_queries"):
+            assert services.user_repo.get_by_email(db, "explain@test.com") is not None
+    finally:
+        db.close()
+        instrumentation.current_request.set(None)
+
+    assert stats.query_count == 1
+    assert stats.rows_loaded == 1
+    logged = json.loads(caplog.records[-1].message)
+    assert logged["engine"] == "primary"
+    assert "users" in logged["plan"]
+
+    # A failing EXPLAIN is rolled back to its savepoint and leaves the caller's transaction usable.
+    db = SessionLocal()
+    try:
+        db.add(User(full_name="Kept", email="kept@test.com", role=UserRole.STUDENT))
+        db.flush()
+        connection = db.connection()
+        assert instrumentation.explain(connection, "SELECT missing_column FROM users", {}).startswith("EXPLAIN failed")
+        db.commit()
+    finally:
+        db.close()
+    assert services.user_repo.get_by_email(db_session, "kept@test.com") is not None
+
+def test_concurrent_idempotent_course_creation(db_session):
+    import threading
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import sessionmaker
+    import idempotency
+
+    teacher = services.create_user(db_session, "Retry Teacher", "retry@test.com", UserRole.INSTRUCTOR)
+    teacher_id = teacher.id
+    digest = idempotency.fingerprint([teacher_id, "Retried", 10, None, ["Intro"], []])
+    assert idempotency.claim(db_session, services.COURSE_IDEMPOTENCY_SCOPE, "retry-1", digest) is None
+
+    # The retry blocks on the claimed key until the first request's transaction ends.
+    other = sessionmaker(bind=db_session.get_bind())()
+    results = []
+    retry = threading.Thread(target=lambda: results.append(
+        services.create_course(other, teacher_id, "Retried", 10, ["Intro"], idempotency_key="retry-1")
+    ))
+    try:
+        retry.start()
+        retry.join(0.5)
+        assert retry.is_alive()
+
+        course = services.insert_course(db_session, teacher_id, "Retried", 10, ["Intro"])
+        idempotency.record(db_session, services.COURSE_IDEMPOTENCY_SCOPE, "retry-1", course.id)
+        db_session.commit()
+        retry.join(5)
+
+        replayed, created = results[0]
+        assert not created
+        assert replayed.id == course.id
+        assert [m.title for m in replayed.modules] == ["Intro"]
+        assert db_session.scalar(select(func.count(Course.id))) == 1
+    finally:
+        other.close()
+
+def test_table_version_bumps_do_not_serialize_writers(db_session):
+    from sqlalchemy import func, select, text
+    from sqlalchemy.orm import sessionmaker
+    from http_cache import versions_statement
+    from models.table_version import TABLE_VERSION_SLOTS
+
+    def version():
+        return dict((name, v) for name, v, _ in db_session.execute(versions_statement(("users",))).all()).get("users", 0)
+
+    before = version()
+    db_session.commit()
+
+    sessions = sessionmaker(bind=db_session.get_bind())
+    first, second = sessions(), sessions()
+    try:
+        slots = {s.scalar(select(func.pg_backend_pid())) % TABLE_VERSION_SLOTS for s in (first, second)}
+        if len(slots) == 1:
+            pytest.skip("both connections map to the same version slot")
+
+        # The first writer keeps its version row locked until it commits; the second one does not wait for it.
+        first.execute(text("UPDATE users SET full_name = full_name"))
+        second.execute(text("SET LOCAL lock_timeout = '1s'"))
+        second.execute(text("UPDATE users SET full_name = full_name"))
+        second.commit()
+        first.commit()
+    finally:
+        first.close()
+        second.close()
+
+    assert version() == before + 2
+
+def test_read_session_routes_reads_to_healthy_replica(tmp_path):
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import sessionmaker
+    from routing import RoutingSession, ReplicaMonitor, served_lag
+
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine, name in ((primary, "On Primary"), (replica, "On Replica")):
+        User.__table__.create(engine)
+        with engine.begin() as connection:
+            connection.execute(User.__table__.insert(), {"full_name": name, "email": "r@test.com", "role": "STUDENT"})
+
+    monitor = ReplicaMonitor(replica, "test_replica", max_lag_seconds=1.0, check_seconds=60)
+    ReadSession = sessionmaker(class_=RoutingSession, primary=primary, replica=replica, monitor=monitor)
+    names = select(User.full_name)
+
+    with ReadSession() as db:
+        assert served_lag(db) is None
+        assert db.scalar(names) == "On Replica"
+        assert 0 <= served_lag(db) < 1
+        db.add(User(full_name="Writer", email="w@test.com", role=UserRole.STUDENT))
+        db.flush()
+        # Pinned after the write, so the session reads what it just wrote.
+        assert db.scalars(names.order_by(User.id)).all() == ["On Primary", "Writer"]
+        db.rollback()
+        assert db.scalar(names) == "On Primary"
+
+    monitor.measure_lag = lambda connection: 30.0
+    monitor.checked_at = None
+    with ReadSession() as db:
+        assert db.scalar(names) == "On Primary"
+    assert monitor.routed == {"replica": 1, "primary": 4, "fallback": 1}
+    assert not monitor.available
+    primary.dispose()
+    replica.dispose()
+
+def test_submission_partitions_prune_and_archive(db_session):
+    from datetime import date, datetime, timezone
+    from sqlalchemy import func, select, text
+    import partitions
+
+    student = services.create_user(db_session, "Archived Student", "archived@test.com", UserRole.STUDENT)
+    teacher = services.create_user(db_session, "Archive Teacher", "archiver@test.com", UserRole.INSTRUCTOR)
+    course = services.create_course_with_modules(db_session, teacher.id, "History", 100, ["M1"])
+    assignment = services.create_assignment(db_session, course.id, "Essay", 100)
+    db_session.add(Submission(assignment_id=assignment.id, student_id=student.id, content="Old answer", score=40,
+                              submitted_at=datetime(2024, 1, 15, tzinfo=timezone.utc)))
+    db_session.commit()
+    recent = services.submit_homework(db_session, assignment.id, student.id, "Recent answer")
+
+    try:
+        # The January 2024 rows sat in the default partitions and move into their own month.
+        created = partitions.ensure_partitions(db_session, months_ahead=1)
+        assert {"submissions_p202401", "submission_contents_p202401"} <= set(created)
+        assert db_session.scalar(text("SELECT count(*) FROM submissions_default")) == 0
+        assert db_session.scalar(text("SELECT count(*) FROM submission_contents_p202401")) == 1
+        assert partitions.ensure_partitions(db_session, months_ahead=1) == []
+
+        since = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        compiled = services.student_average_scores_statement(since).compile(dialect=db_session.bind.dialect)
+        plan = "\n".join(db_session.connection().exec_driver_sql("EXPLAIN " + str(compiled), compiled.params).scalars())
+        assert "submissions_p202401" not in plan
+        assert [row.submissions_count for row in services.get_student_average_scores(db_session, since)] == [1]
+
+        archived = partitions.archive_partitions(db_session, date(2024, 2, 1))
+        assert archived == ["submissions_p202401", "submission_contents_p202401"]
+        assert db_session.scalar(select(func.count(Submission.id))) == 1
+        assert db_session.scalar(text(
+            "SELECT count(*) FROM pg_constraint WHERE conrelid = 'submissions_p202401'::regclass AND contype = 'f'"
+        )) == 0
+        assert db_session.get(Submission, recent.id).content == "Recent answer"
+    finally:
+        db_session.rollback()
+        db_session.execute(text("DROP TABLE IF EXISTS submissions_p202401, submission_contents_p202401"))
+        db_session.commit()
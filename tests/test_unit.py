@@ -1,6 +1,7 @@
+import os
 import pytest
 from pydantic import ValidationError
-from src.utils import calculate_letter_grade, format_full_name
+from src.utils import calculate_letter_grade, calculate_letter_grades, percentage, format_full_name
 from src.schemas import UserCreate
 
 def test_calculate_letter_grade_valid():
@@ -34,4 +35,259 @@ def test_user_create_schema_missing_field():
 
 def test_user_create_schema_invalid_types():
     with pytest.raises(ValidationError):
-        UserCreate(email="test@example.com", full_name=12345)
\ No newline at end of file
+        UserCreate(email="test@example.com", full_name=12345)
+
+def test_database_settings_split_connection_budget():
+    from src.config import DatabaseSettings
+
+    settings = DatabaseSettings.from_env({
+        "DATABASE_URL": "postgresql://u:p@db:5432/lms",
+        "DB_MAX_CONNECTIONS": "60",
+        "WEB_CONCURRENCY": "4",
+    })
+
+    assert settings.async_url == "postgresql+asyncpg://u:p@db:5432/lms"
+    assert (settings.pool_size, settings.max_overflow) == (10, 5)
+
+    explicit = DatabaseSettings.from_env({
+        "DATABASE_URL": "postgresql://db/lms",
+        "DB_POOL_SIZE": "3",
+        "DB_MAX_CONNECTIONS": "60",
+        "DB_POOL_MODE": "external",
+    })
+    assert (explicit.pool_size, explicit.max_overflow) == (3, 57)
+    assert explicit.pool_mode == "external"
+
+def test_database_settings_rejects_unknown_pool_mode():
+    from src.config import DatabaseSettings
+
+    with pytest.raises(ValueError):
+        DatabaseSettings.from_env({"DATABASE_URL": "postgresql://db/lms", "DB_POOL_MODE": "bouncy"})
+
+def test_memory_cache_lru_and_ttl():
+    from src.cache import MemoryCache
+
+    lru = MemoryCache(max_entries=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert (lru.stats.hits, lru.stats.misses, lru.stats.evictions) == (3, 1, 1)
+
+    expired = MemoryCache(ttl=0)
+    expired.set("a", 1, ttl=-1)
+    assert expired.get("a") is None
+    assert expired.stats.evictions == 1
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def scan_iter(self, match):
+        return [key for key in self.data if key.startswith(match.rstrip("*"))]
+
+    # Stands in for the rate limiter's Lua script, on a clock the test controls. Awaitable, like redis.asyncio.
+    now = 0.0
+
+    async def eval(self, script, numkeys, key, rate, burst):
+        from src.admission import gcra
+        tat, retry_after = gcra(self.data.get(key), self.now, rate, burst)
+        if not retry_after:
+            self.data[key] = tat
+        return str(retry_after)
+
+def test_redis_cache_round_trips_values():
+    import json
+    from datetime import date, datetime, timezone
+    from decimal import Decimal
+    from src.cache import RedisCache, CACHED_ENUMS
+
+    client = FakeRedis()
+    backend = RedisCache(client, prefix="test:")
+    row = {"id": 1, "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc), "due": date(2026, 2, 1),
+           "average": Decimal("91.50"), "role": CACHED_ENUMS["UserRole"]("student"), "tags": ["a"]}
+    backend.set("users:id:1", row)
+
+    # Stored as JSON, never as a pickle.
+    assert json.loads(client.data["test:users:id:1"])["id"] == 1
+    assert backend.get("users:id:1") == row
+    backend.delete("users:id:1")
+    assert backend.get("users:id:1") is None
+    assert (backend.stats.hits, backend.stats.misses, backend.stats.invalidations) == (1, 1, 1)
+
+def test_cache_backend_is_built_on_first_use(monkeypatch):
+    from src import cache
+
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setenv("CACHE_BACKEND", "none")
+    backend = cache.get_cache()
+    assert backend.name == "none"
+    assert cache.get_cache() is backend
+
+def test_http_validators_match_weak_etags_and_dates():
+    from datetime import datetime, timezone
+    from src.http_cache import build_validators
+
+    stamp = datetime(2026, 3, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    validators = build_validators(("courses",), [("courses", 3, stamp)], "/courses/")
+
+    assert validators == build_validators(("courses",), [("courses", 3, stamp)], "/courses/")
+    assert validators != build_validators(("courses",), [("courses", 4, stamp)], "/courses/")
+    assert validators.matches(f'"x", {validators.etag.removeprefix("W/")}')
+    assert not validators.matches('"x"')
+    assert validators.matches(None, "Sun, 01 Mar 2026 12:00:00 GMT")
+    assert not validators.matches(None, "Sun, 01 Mar 2026 11:59:59 GMT")
+    assert validators.headers("no-store")["Last-Modified"] == "Sun, 01 Mar 2026 12:00:00 GMT"
+    assert build_validators(("users",), []).last_modified is None
+
+def test_calculate_letter_grades_matches_scalar():
+    scores = list(range(101))
+    assert calculate_letter_grades(scores) == [calculate_letter_grade(score) for score in scores]
+    assert percentage(45, 50) == 90
+    assert percentage(0, 0) == 100
+    with pytest.raises(ValueError):
+        calculate_letter_grades([50, 101])
+
+def test_gradebook_distribution_is_vectorized_equivalent():
+    import numpy as np
+    from src.gradebook import distribution, letter_indexes, percentages
+    from src.utils import LETTER_GRADES
+
+    percent = np.arange(101)
+    assert [LETTER_GRADES[i] for i in letter_indexes(percent)] == [calculate_letter_grade(p) for p in range(101)]
+    assert percentages(np.array([45, 7, 0]), np.array([50, 10, 0])).tolist() == [90, 70, 100]
+
+    scores = np.array([70, 72, 75, 78, 80, 5])
+    stats = distribution(np.arange(1, 7), scores)
+    assert stats["count"] == 6
+    assert stats["min"] == 5 and stats["max"] == 80
+    assert stats["letter_grades"] == {"A": 0, "B": 1, "C": 4, "D": 0, "F": 1}
+    assert stats["outliers"] == [6]
+    assert sum(stats["histogram"]) == 6
+    assert distribution(np.array([]), np.array([]))["mean"] is None
+
+def test_course_search_statement_uses_trigram_only_when_enabled():
+    from sqlalchemy.dialects import postgresql
+    from src.repositories.course_repository import CourseRepository, encode_search_cursor, decode_search_cursor
+    from decimal import Decimal
+
+    repo = CourseRepository()
+    fuzzy = str(repo.search_statement("pyton", 10, fuzzy=True).compile(dialect=postgresql.dialect()))
+    exact = str(repo.search_statement("pyton", 10, fuzzy=False).compile(dialect=postgresql.dialect()))
+
+    assert "<%" in fuzzy and "word_similarity" in fuzzy
+    assert "<%" not in exact
+    assert "ts_headline" in exact
+    assert decode_search_cursor(encode_search_cursor(Decimal("0.123456"), 7)) == (Decimal("0.123456"), 7)
+
+def test_fast_json_encodes_like_pydantic(monkeypatch):
+    import json
+    from datetime import datetime, timezone
+    from decimal import Decimal
+    from src import responses
+    from src.models import UserRole
+
+    content = {"at": datetime(2026, 1, 2, 3, 4, 5, 6000, tzinfo=timezone.utc), "score": Decimal("87.50"),
+               "role": UserRole.STUDENT, "name": "Zoë", 1: None}
+    expected = {"at": "2026-01-02T03:04:05.006000Z", "score": 87.5, "role": UserRole.STUDENT.value, "name": "Zoë", "1": None}
+    assert json.loads(responses.dumps(content)) == expected
+
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(responses.dumps(content)) == expected
+    with pytest.raises(TypeError):
+        responses.dumps({"value": object()})
+
+def test_json_row_parser_streams_arrays_and_lines():
+    from src.import_data import JsonRowParser
+
+    def parse(body: str, chunk_size: int):
+        parser, data, rows = JsonRowParser(), body.encode(), []
+        for start in range(0, len(data), chunk_size):
+            rows += parser.feed(data[start:start + chunk_size])
+        return [row if isinstance(row, (dict, list, int)) else f"error: {row}" for row in rows + parser.close()]
+
+    for chunk_size in (1, 7, 4096):
+        assert parse('[{"name": "Zoë"}, 12, {"a": [1]} ]', chunk_size) == [{"name": "Zoë"}, 12, {"a": [1]}]
+        assert parse('{"a": 1}\n\nnot json\n[2]\n{"b": 2}', chunk_size) == \
+            [{"a": 1}, "error: Invalid JSON: Expecting value", [2], {"b": 2}]
+        assert parse('[{"a": 1}, {"b": }, {"c": 3}]', chunk_size) == [{"a": 1}, "error: Invalid JSON: Expecting value"]
+        assert parse("[]", chunk_size) == parse("", chunk_size) == []
+
+def test_database_settings_replica_is_opt_in():
+    from src.config import DatabaseSettings
+
+    assert DatabaseSettings.from_env({"DATABASE_URL": "postgresql://db/lms"}).replica() is None
+
+    settings = DatabaseSettings.from_env({
+        "DATABASE_URL": "postgresql://db/lms",
+        "DATABASE_REPLICA_URL": "postgresql://replica/lms",
+        "DB_REPLICA_MAX_LAG_SECONDS": "0.5",
+        "DB_POOL_SIZE": "3",
+    })
+    replica = settings.replica()
+    assert replica.url == "postgresql://replica/lms"
+    assert replica.async_url == "postgresql+asyncpg://replica/lms"
+    assert replica.pool_size == 3
+    assert replica.replica() is None
+    assert settings.replica_max_lag_seconds == 0.5
+
+def test_database_module_builds_engines_lazily():
+    import subprocess
+    import sys
+    code = (
+        "import database, main_api; "
+        "assert database._database is None and main_api._app is None; "
+        "from config import DatabaseSettings; "
+        "assert DatabaseSettings.from_env({'DATABASE_URL': 'postgresql://db/lms', "
+        "'DB_PREWARM_CONNECTIONS': '4'}).prewarm_connections == 4"
+    )
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    subprocess.run([sys.executable, "-c", code], cwd=src, check=True)
+
+def test_token_bucket_limiters_allow_burst_then_refill():
+    import asyncio
+    from src.admission import MemoryRateLimiter, RedisRateLimiter
+
+    def acquire(limiter, *args, **kwargs):
+        return asyncio.run(limiter.acquire(*args, **kwargs))
+
+    memory = MemoryRateLimiter()
+    assert [acquire(memory, "client:a", 2, 3, now=10.0) for _ in range(4)] == [0, 0, 0, 0.5]
+    assert acquire(memory, "client:b", 2, 3, now=10.0) == 0
+    assert acquire(memory, "client:a", 2, 3, now=10.5) == 0
+    assert acquire(memory, "client:a", 2, 3, now=10.5) == 0.5
+
+    fake = FakeRedis()
+    shared = RedisRateLimiter(fake, prefix="rate:")
+    assert [acquire(shared, "route:/exports", 1, 2) for _ in range(3)] == [0, 0, 1.0]
+    fake.now = 1.0
+    assert acquire(shared, "route:/exports", 1, 2) == 0
+    assert list(fake.data) == ["rate:route:/exports"]
+
+def test_admission_settings_follow_db_pool():
+    from src.config import DatabaseSettings
+    from src.admission import AdmissionSettings
+
+    database = DatabaseSettings.from_env({"DATABASE_URL": "postgresql://db/lms", "DB_POOL_SIZE": "4", "DB_MAX_OVERFLOW": "2"})
+    settings = AdmissionSettings.from_env(database, {})
+    assert (settings.max_in_flight, settings.heavy_limit, settings.client_rate, settings.route_limits) == (6, 3, 0.0, ())
+
+    settings = AdmissionSettings.from_env(database, {
+        "ADMISSION_MAX_IN_FLIGHT": "10",
+        "ADMISSION_CLIENT_RATE": "5",
+        "ADMISSION_ROUTE_LIMITS": "/analytics=10:20, /exports=0.5",
+    })
+    assert (settings.max_in_flight, settings.client_burst) == (10, 10)
+    assert settings.route_limits == (("/analytics", 10.0, 20), ("/exports", 0.5, 1))